@@ -0,0 +1,81 @@
+"""
+Backtest replay speed: events/sec and simulated seconds per wall-clock second.
+
+A simple quoting bot joins the best bid and ask every few simulated seconds
+on a synthetic market. The replay runs twice and must produce the same fills
+and PnL path both times.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_backtest
+"""
+
+import argparse
+import time
+from time import perf_counter
+
+from imcity_backtest import Backtest, synthetic_market
+from imcity_template import BaseBot, OrderBook, OrderRequest, Side, Trade
+
+
+class JoinTheTouch(BaseBot):
+    def __init__(self, requote: float):
+        super().__init__("http://backtest", "bench", "bench")
+        self.requote = requote
+        self._quoted: dict[str, float] = {}
+
+    def on_orderbook(self, orderbook: OrderBook):
+        # time.time() is the replay clock during a backtest
+        now = time.time()
+        if now - self._quoted.get(orderbook.product, 0.0) < self.requote:
+            return
+        if not orderbook.buy_orders or not orderbook.sell_orders:
+            return
+        self._quoted[orderbook.product] = now
+        self.cancel_all_orders(orderbook.product)
+        for side, price in (
+            (Side.BUY, orderbook.buy_orders[0].price),
+            (Side.SELL, orderbook.sell_orders[0].price),
+        ):
+            self.send_order(OrderRequest(orderbook.product, price, side, 2))
+
+    def on_trades(self, trades: list[Trade]):
+        pass
+
+
+def replay(args) -> tuple[float, Backtest]:
+    market = list(
+        synthetic_market(
+            {f"P{i}": 1000 + 100 * i for i in range(args.products)},
+            duration=args.duration,
+            seed=args.seed,
+        )
+    )
+    backtest = Backtest(JoinTheTouch(args.requote))
+    start = perf_counter()
+    backtest.run(market)
+    return perf_counter() - start, backtest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=3600.0)
+    parser.add_argument("--requote", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    elapsed, first = replay(args)
+    _, second = replay(args)
+    assert first.result.fills == second.result.fills, "fills differ between runs"
+    assert first.result.pnl == second.result.pnl, "PnL path differs between runs"
+
+    result = first.result
+    print(f"{result.events:,} events in {elapsed:.2f}s")
+    print(f"{result.events / elapsed:,.0f} events/sec")
+    print(f"{args.duration / elapsed:,.0f} simulated seconds per second")
+    print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cost of the DepthBook analytics on deep books, and of building the view.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_depth
+"""
+
+import argparse
+import random
+from time import perf_counter
+
+from imcity_book import LocalOrderBook
+from imcity_depth import DepthBook
+from imcity_types import Side, parse_orderbook
+
+
+def make_payload(depth: int, rng: random.Random) -> dict:
+    def levels(base: int, step: int) -> list[dict]:
+        return [
+            {
+                "price": base + step * i,
+                "volume": rng.randint(1, 50),
+                "userOrderVolume": rng.choice((0, 0, 0, 1)),
+            }
+            for i in range(depth)
+        ]
+
+    return {
+        "product": "1_Eisbach",
+        "tickSize": 1,
+        "buy": levels(1000, -1),
+        "sell": levels(1001, 1),
+    }
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'depth':>6} {'operation':<22} {'us/call':>10}")
+    for depth in (10, 100, 1000):
+        payload = make_payload(depth, rng)
+        orderbook = parse_orderbook(payload)
+        local = LocalOrderBook(payload["product"], payload["tickSize"])
+        local.apply_snapshot(payload)
+        view = DepthBook.from_payload(payload)
+        lots = sum(level["volume"] for level in payload["sell"]) // 2
+
+        cases = (
+            ("from_payload", lambda: DepthBook.from_payload(payload)),
+            ("from_orderbook", lambda: DepthBook.from_orderbook(orderbook)),
+            ("from_local_book", lambda: DepthBook.from_local_book(local)),
+            ("cumulative_depth", lambda: view.cumulative_depth(Side.BUY)),
+            ("vwap (half the book)", lambda: view.vwap(Side.BUY, lots)),
+            ("microprice", view.microprice),
+            ("imbalance (5 levels)", lambda: view.imbalance(5)),
+            ("own_share", lambda: view.own_share(Side.SELL)),
+        )
+        for name, fn in cases:
+            print(f"{depth:>6} {name:<22} {per_call_us(fn, args.iterations):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+End-to-end load test of BaseBot against the local mock exchange.
+
+The market event rate is stepped up while a bot reacts to every move of the
+best bid with a replace of a passive order. For each step it reports the
+market events the exchange actually replayed per second, the books that
+reached the bot, how many of them it handled and how many the dispatcher
+coalesced, the exchange's unsent stream backlog and the tick-to-order
+latency measured by the exchange.
+
+The sustainable rate is the highest step at which the exchange kept the
+requested rate, the stream kept up and the p99 tick-to-order latency stayed
+within the budget. Coalesced books are not failures: the handler always
+acts on the freshest book.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_exchange
+"""
+
+import argparse
+from time import sleep
+
+import numpy as np
+
+from imcity_exchange import MockExchange
+from imcity_template import BaseBot, OrderBook, OrderRequest, Side, Trade
+
+
+class Requoter(BaseBot):
+    handled = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._best_bids: dict[str, float] = {}
+
+    def on_orderbook(self, orderbook: OrderBook):
+        self.handled += 1
+        if not orderbook.buy_orders:
+            return
+        # our own orders republish the book, only requote on a market move
+        best_bid = orderbook.buy_orders[0].price
+        if self._best_bids.get(orderbook.product) == best_bid:
+            return
+        self._best_bids[orderbook.product] = best_bid
+        stale = [order.id for order in self.oms.orders(orderbook.product)]
+        self.submit_order(OrderRequest(orderbook.product, best_bid - 20, Side.BUY, 1))
+        self.cancel_orders(stale)
+
+    def on_trades(self, trades: list[Trade]):
+        pass
+
+
+def run_step(exchange: MockExchange, bot: Requoter, rate: float, seconds: float):
+    exchange.rate = rate
+    replayed = exchange.events_replayed
+    received = bot.dispatcher.books_published
+    coalesced = bot.dispatcher.books_coalesced
+    handled = bot.handled
+    latencies = len(exchange.tick_to_order_ns)
+    sleep(seconds)
+
+    tick_to_order = np.array(exchange.tick_to_order_ns[latencies:] or [np.nan]) / 1e6
+    return {
+        "replayed": (exchange.events_replayed - replayed) / seconds,
+        "received": bot.dispatcher.books_published - received,
+        "handled": bot.handled - handled,
+        "coalesced": bot.dispatcher.books_coalesced - coalesced,
+        "backlog": exchange.stats()["backlog"],
+        "p50": np.percentile(tick_to_order, 50),
+        "p99": np.percentile(tick_to_order, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rates", type=float, nargs="+", default=[50, 100, 200, 500, 1000, 2000]
+    )
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--budget", type=float, default=50.0, help="p99 ms")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    exchange = MockExchange(
+        rate=args.rates[0], latency=args.latency, jitter=args.jitter, seed=3
+    )
+    url = exchange.start()
+    bot = Requoter(
+        url,
+        "bench",
+        "bench",
+        pool_size=8,
+        rate_limit=None,
+        dispatch_workers=args.workers,
+    )
+    bot.start()
+    sleep(0.5)
+
+    print(
+        f"{'rate':>6} {'replayed':>9} {'received':>9} {'handled':>8}"
+        f" {'coalesced':>10} {'backlog':>8} {'t2o p50':>9} {'t2o p99':>9}"
+    )
+    sustainable = None
+    for rate in args.rates:
+        step = run_step(exchange, bot, rate, args.seconds)
+        print(
+            f"{rate:>6.0f} {step['replayed']:>9.0f} {step['received']:>9}"
+            f" {step['handled']:>8} {step['coalesced']:>10} {step['backlog']:>8}"
+            f" {step['p50']:>7.2f}ms {step['p99']:>7.2f}ms"
+        )
+        if (
+            step["replayed"] >= 0.95 * rate
+            and step["backlog"] < rate * 0.1
+            and step["p99"] <= args.budget
+        ):
+            sustainable = rate
+
+    bot.stop()
+    exchange.stop()
+    print(f"sustainable: {sustainable or 'none'} events/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Fair values: incremental updates against full settlement refreshes.
+
+Sources are served offline as in bench_refresh. After a full refresh loaded
+into a FairValueService:
+
+- polling every source again finds nothing new (the fetch cache hands back
+  the same pages) and recomputes nothing
+- a new water level reading is published; only the nodes depending on it are
+  recomputed, and every settlement must equal a full refresh of the graph
+  with that reading
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fair_value
+"""
+
+import argparse
+import io
+import tempfile
+from contextlib import ExitStack, redirect_stdout
+from time import perf_counter
+from unittest import mock
+
+import pandas as pd
+
+import estimates.past_data_scraper as scraper
+from benchmarks.bench_refresh import offline
+from estimates import refresh
+from estimates.fair_value import FairValueService
+from estimates.timeseries import TimeSeriesStore
+
+
+def with_reading(series: pd.Series, change: float) -> pd.Series:
+    timestamp = series.index[-1] + pd.Timedelta(minutes=15)
+    return pd.concat([series, pd.Series([series.iloc[-1] + change], index=[timestamp])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hnd", type=float, default=0.3, help="seconds")
+    parser.add_argument("--timeanddate", type=float, default=0.4, help="seconds")
+    parser.add_argument("--open-meteo", type=float, default=0.2, help="seconds")
+    parser.add_argument("--change", type=float, default=3, help="of the new reading")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, ExitStack() as stack:
+        stack.enter_context(
+            mock.patch.object(scraper, "STORE", TimeSeriesStore(directory))
+        )
+        # the predictions print their inputs
+        stack.enter_context(redirect_stdout(io.StringIO()))
+        session = offline(stack, args)
+
+        graph = refresh.settlement_graph()
+        full = graph.run()
+        service = FairValueService(graph)
+        service.load(full)
+        notified = []
+        service.subscribe(notified.append)
+
+        requests = session.requests
+        start = perf_counter()
+        unchanged = service.poll()
+        poll_elapsed = perf_counter() - start
+        poll_requests = session.requests - requests
+
+        reading = with_reading(service.value("waterlevel").value, args.change)
+        start = perf_counter()
+        changed = service.publish("waterlevel", reading)
+        publish_elapsed = perf_counter() - start
+
+        # the same graph with the new reading as its water level, refreshed in full
+        expected_graph = refresh.settlement_graph()
+        expected_graph.nodes["waterlevel"] = refresh.Node("waterlevel", lambda: reading)
+        start = perf_counter()
+        expected = expected_graph.run()
+        full_elapsed = perf_counter() - start
+
+    if full.errors or expected.errors:
+        raise SystemExit(f"Refresh failed: {full.errors or expected.errors}")
+    assert not unchanged, f"unchanged sources recomputed {unchanged}"
+    assert changed == notified, "subscribers missed updates"
+    for product in refresh.SETTLEMENT_PRODUCTS:
+        value = service.value(product).value
+        assert value == expected.values[product], f"{product}: {value} != full refresh"
+
+    names = [fair_value.name for fair_value in changed]
+    print(
+        f"poll, nothing new:   {poll_elapsed * 1e3:>8.1f}ms, {poll_requests} requests"
+    )
+    print(
+        f"new water level:     {publish_elapsed * 1e3:>8.1f}ms, changed {', '.join(names)}"
+    )
+    print(
+        f"full refresh:        {full_elapsed * 1e3:>8.1f}ms, all {len(graph.nodes)} nodes"
+    )
+    print("incremental settlements match the full refresh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+HTML table backends of estimates.html_tables: parity and speed.
+
+Every available backend must produce exactly what the BeautifulSoup
+reference produces: the same DataFrames from the scrapers' parsers on the
+saved pages in tests/fixtures, and the same rows from `table_rows` on
+variants of those pages that stress the tokenizer (upper case tags, comments
+and scripts holding table markup, quoted `>` in attributes, entities and
+inline markup in cells). Then each parser is timed per backend.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_html_tables
+"""
+
+import argparse
+from timeit import repeat
+
+import pandas as pd
+
+import estimates.past_data_scraper as scraper
+from estimates.html_tables import BACKENDS, DEFAULT_BACKEND, lxml, table_rows
+from tests.pages import (
+    FIXTURES,
+    HND,
+    PARSERS,
+    REFERENCE,
+    WEATHER,
+    page,
+    variants,
+)
+
+
+def available() -> list[str]:
+    return [name for name in BACKENDS if name != "lxml" or lxml]
+
+
+def check_parity(backends: list[str]) -> None:
+    for function, fixture in PARSERS.items():
+        parse = getattr(scraper, function)
+        fetched = page(fixture)
+        expected = parse(fetched, backend=REFERENCE)
+        for backend in backends:
+            pd.testing.assert_frame_equal(parse(fetched, backend=backend), expected)
+
+        arguments = WEATHER if "weather" in fixture else HND
+        html = (FIXTURES / fixture).read_text(encoding="utf-8")
+        for variant, text in variants(html).items():
+            expected = table_rows(text, *arguments, backend=REFERENCE)
+            for backend in backends:
+                rows = table_rows(text, *arguments, backend=backend)
+                assert rows == expected, f"{backend} differs on {fixture}, {variant}"
+        print(f"{fixture}: {', '.join(backends)} match {REFERENCE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    backends = [name for name in available() if name != REFERENCE]
+    check_parity(backends)
+
+    print(f"default backend: {DEFAULT_BACKEND}")
+    print(f"{'parser':<18} " + " ".join(f"{name:>10}" for name in available()))
+    for function, fixture in PARSERS.items():
+        parse = getattr(scraper, function)
+        fetched = page(fixture)
+        times = {
+            backend: min(
+                repeat(lambda: parse(fetched, backend=backend), number=args.number)
+            )
+            / args.number
+            for backend in available()
+        }
+        print(
+            f"{function:<18} "
+            + " ".join(f"{times[name] * 1e3:>8.2f}ms" for name in available())
+            + f"  {times[REFERENCE] / times[DEFAULT_BACKEND]:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
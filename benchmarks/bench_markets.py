@@ -0,0 +1,89 @@
+"""
+Settlement formulas of estimates.markets: parity and batch speed.
+
+The loop implementations the markets used before they were vectorized, kept
+in tests/market_references.py, are the reference. Every scalar function must
+settle random inputs exactly like its reference, every row of a (scenarios,
+intervals) batch exactly like the scalar function on that row, and one batch
+call is timed against calling the reference once per scenario.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_markets
+    python -m benchmarks.bench_markets --scenarios 10000 --intervals 48
+"""
+
+import argparse
+from timeit import repeat
+
+import numpy as np
+import pandas as pd
+
+from tests.market_references import (
+    batches,
+    check_parity,
+    reference_1,
+    reference_2,
+    reference_3,
+    reference_4,
+    reference_5,
+    reference_6,
+    reference_7,
+    scenarios,
+)
+
+
+def references(data: dict) -> dict:
+    # the reference settling every scenario one at a time
+    flow, level = data["flow"].tolist(), data["level"].tolist()
+    temp, hum = data["temp"].tolist(), data["hum"].tolist()
+    temp3, hum3 = data["temp3"].tolist(), data["hum3"].tolist()
+    arr, dep = data["arr"].tolist(), data["dep"].tolist()
+    arr_series, dep_series = [pd.Series(a) for a in arr], [pd.Series(d) for d in dep]
+    metric = data["metric"].tolist()
+    rows = range(len(flow))
+    return {
+        "market_1": lambda: [reference_1(flow[i][-1], level[i][-1]) for i in rows],
+        "market_2": lambda: [reference_2(flow[i], level[i]) for i in rows],
+        "market_3": lambda: [reference_3(temp[i], hum[i]) for i in rows],
+        "market_4": lambda: [reference_4(temp3[i], hum3[i]) for i in rows],
+        "market_5": lambda: [reference_5(arr_series[i], dep_series[i]) for i in rows],
+        "market_6": lambda: [reference_6(arr[i], dep[i]) for i in rows],
+        "market_7": lambda: [
+            reference_7(flow[i][-1], level[i][-1], temp[i][-1], hum[i][-1], metric[i])
+            for i in rows
+        ],
+    }
+
+
+def best(fn, number: int) -> float:
+    return min(repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--intervals", type=int, default=96)
+    parser.add_argument("--parity-scenarios", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    check_parity(scenarios(rng, args.parity_scenarios, args.intervals))
+    print(f"parity: {args.parity_scenarios} scenarios x {args.intervals} intervals")
+
+    data = scenarios(rng, args.scenarios, args.intervals)
+    loops = references(data)
+    print(f"{args.scenarios} scenarios x {args.intervals} intervals")
+    print(f"{'market':<10} {'reference':>12} {'batch':>12} {'speedup':>8}")
+    for name, (batch_fn, _, batch_args) in batches(data).items():
+        loop_time = best(loops[name], 1)
+        batch_time = best(lambda: batch_fn(*batch_args), 10)
+        print(
+            f"{name:<10} {loop_time * 1e3:>10.2f}ms {batch_time * 1e3:>10.3f}ms"
+            f" {loop_time / batch_time:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+`send_mass_orders` fan-out: bounded worker pool vs one thread per order.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_mass_orders
+"""
+
+import argparse
+from statistics import median
+from threading import Thread
+from time import perf_counter
+
+from benchmarks.bench_send_order import BenchBot
+from benchmarks.stand_in import start_stand_in
+from imcity_types import OrderRequest, Side
+
+
+class ThreadPerOrderBenchBot(BenchBot):
+    """
+    The previous implementation: a new Thread per order, results in completion order
+    """
+
+    def send_mass_orders(self, order_requests, callback=None):
+        responses = []
+
+        def worker(order_request, response_list):
+            response = self.send_order(order_request)
+            response_list.append(response)
+
+        threads = []
+        for order_request in order_requests:
+            thread = Thread(target=worker, args=(order_request, responses))
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return responses
+
+
+def measure(bot: BenchBot, batch: int, repeats: int) -> float:
+    orders = [
+        OrderRequest(product="1_Eisbach", price=3000 + i, side=Side.BUY, volume=1)
+        for i in range(batch)
+    ]
+    bot.auth_token
+    bot.send_mass_orders(orders)  # warm up
+
+    samples = []
+    for _ in range(repeats):
+        start = perf_counter()
+        bot.send_mass_orders(orders)
+        samples.append((perf_counter() - start) * 1000)
+    return median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    server, url = start_stand_in()
+    try:
+        bots = {
+            "thread-per-order": ThreadPerOrderBenchBot(
+                url, "bench", "bench", pool_size=args.pool_size, rate_limit=None
+            ),
+            "worker-pool": BenchBot(
+                url, "bench", "bench", pool_size=args.pool_size, rate_limit=None
+            ),
+        }
+        print(f"{'batch':>6} " + " ".join(f"{name:>18}" for name in bots))
+        for batch in (1, 10, 100):
+            timings = [measure(bot, batch, args.repeats) for bot in bots.values()]
+            print(f"{batch:>6} " + " ".join(f"{t:>16.2f}ms" for t in timings))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Monte Carlo settlement distributions: consistency and speed.
+
+The model is built from the hnd.bayern.de pages in tests/fixtures, the
+airport schedule and a synthetic forecast whose half-hour bins are partly
+still ahead. Checks:
+
+- a seeded run gives the same distributions in process and on the engine's
+  worker pool
+- with no time left in the window every distribution collapses onto the
+  safety net's point estimate
+
+Then the paths are timed in process and on the pool, without the pool's
+start-up, which is reported separately.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_monte_carlo
+    python -m benchmarks.bench_monte_carlo --paths 1000000 --workers 8
+"""
+
+import argparse
+import io
+from contextlib import redirect_stdout
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+import estimates.past_data_scraper as scraper
+from estimates import safety_net
+from estimates.monte_carlo import CHUNK_SIZE, PATHS, MonteCarloEngine, simulate
+from tests.pages import page
+
+
+def parsed(function, fixture: str) -> pd.Series:
+    return function(page(fixture))["data"]
+
+
+def forecast(ahead: int) -> pd.DataFrame:
+    # 48 half-hour bins, the last `ahead` of them after now
+    now = pd.Timestamp.now(tz="Europe/Berlin").floor("30min")
+    index = pd.date_range(
+        end=now + pd.Timedelta(minutes=30 * ahead), periods=48, freq="30min"
+    )
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "temperature_2m": 40 + rng.normal(0, 2, 48),
+            "relative_humidity_2m": 80 + rng.normal(0, 5, 48),
+        },
+        index=index,
+    )
+
+
+def inputs(stunden: int) -> dict:
+    return {
+        "waterflow": parsed(scraper.parse_waterflow, "hnd_waterflow.html"),
+        "waterlevel": parsed(scraper.parse_waterlevel, "hnd_waterlevel.html"),
+        "weather": forecast(ahead=2 * (24 - stunden)),
+        "arr": safety_net.predict_arrivals(),
+        "dep": safety_net.predict_departures(),
+        "stunden": stunden,
+    }
+
+
+def check_collapse() -> None:
+    data = inputs(stunden=24)
+    model = safety_net.settlement_model(**data)
+    distributions = simulate(model, paths=1000, seed=0)
+    with redirect_stdout(io.StringIO()):
+        expected = {
+            "1_Eisbach": safety_net.predict_market_1(
+                data["waterflow"], data["waterlevel"], 24
+            ),
+            "5_Flights": safety_net.predict_market_5(data["arr"], data["dep"]),
+            "6_Airport": safety_net.predict_market_6(data["arr"], data["dep"]),
+            "7_ETF": safety_net.predict_market_7(
+                data["waterflow"], data["waterlevel"], data["weather"], None, 24
+            ),
+        }
+    for product, value in expected.items():
+        distribution = distributions[product]
+        # the mean of equal floats can be off by rounding
+        assert distribution.stdev < 1e-9, f"{product} still varies: {distribution}"
+        assert np.isclose(
+            distribution.mean, value, rtol=1e-12
+        ), f"{product}: {distribution.mean} != {value}"
+    print("no time left: distributions collapse onto the point estimates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paths", type=int, default=PATHS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--hours", type=int, default=6, help="elapsed in the window")
+    args = parser.parse_args()
+
+    check_collapse()
+    model = safety_net.settlement_model(**inputs(args.hours))
+
+    start = perf_counter()
+    expected = simulate(model, args.paths, seed=1, chunk_size=args.chunk_size)
+    serial = perf_counter() - start
+
+    with MonteCarloEngine(args.workers, args.chunk_size) as engine:
+        start = perf_counter()
+        engine.run(model, paths=engine.workers * args.chunk_size)
+        warm_up = perf_counter() - start
+
+        start = perf_counter()
+        distributions = engine.run(model, args.paths, seed=1)
+        pooled = perf_counter() - start
+
+    for product, distribution in distributions.items():
+        assert np.array_equal(
+            distribution.percentiles, expected[product].percentiles
+        ), f"{product} differs between in process and pooled runs"
+        assert distribution.mean == expected[product].mean, product
+    print("seeded runs match in process and pooled")
+
+    print(f"\n{args.paths:,} paths, {args.hours} hours into the window")
+    for product, distribution in distributions.items():
+        print(f"{product:<16} {distribution}")
+    print(f"\nin process:        {serial:.2f}s")
+    print(f"pool start-up:     {warm_up:.2f}s ({engine.workers} workers)")
+    print(f"pooled:            {pooled:.2f}s, {serial / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Order book update throughput: incremental LocalOrderBook vs full rebuild.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_orderbook
+"""
+
+import argparse
+import random
+from time import perf_counter
+
+from imcity_book import BookManager, LocalOrderBook
+from imcity_types import Side, parse_orderbook
+
+
+def make_payload(depth: int, rng: random.Random) -> dict:
+    return {
+        "product": "1_Eisbach",
+        "tickSize": 1,
+        "buy": [
+            {"price": 1000 - i, "volume": rng.randint(1, 50), "userOrderVolume": 0}
+            for i in range(depth)
+        ],
+        "sell": [
+            {"price": 1001 + i, "volume": rng.randint(1, 50), "userOrderVolume": 0}
+            for i in range(depth)
+        ],
+    }
+
+
+def make_updates(depth: int, count: int, rng: random.Random) -> list[tuple]:
+    """
+    Random level updates; roughly one in five removes a level
+    """
+    updates = []
+    for _ in range(count):
+        side = rng.choice((Side.BUY, Side.SELL))
+        offset = rng.randrange(depth)
+        price = 1000 - offset if side == Side.BUY else 1001 + offset
+        volume = 0 if rng.random() < 0.2 else rng.randint(1, 50)
+        updates.append((side, float(price), volume))
+    return updates
+
+
+def make_payload_stream(depth: int, updates: list[tuple]) -> list[dict]:
+    """
+    Full book payloads as the stream would deliver them: each one differs from
+    the previous by a single level update
+    """
+    levels = {Side.BUY: {}, Side.SELL: {}}
+    for level in make_payload(depth, random.Random(0))["buy"]:
+        levels[Side.BUY][level["price"]] = level["volume"]
+    for level in make_payload(depth, random.Random(0))["sell"]:
+        levels[Side.SELL][level["price"]] = level["volume"]
+
+    payloads = []
+    for side, price, volume in updates:
+        if volume:
+            levels[side][price] = volume
+        else:
+            levels[side].pop(price, None)
+        payloads.append(
+            {
+                "product": "1_Eisbach",
+                "tickSize": 1,
+                "buy": [
+                    {"price": p, "volume": v, "userOrderVolume": 0}
+                    for p, v in levels[Side.BUY].items()
+                ],
+                "sell": [
+                    {"price": p, "volume": v, "userOrderVolume": 0}
+                    for p, v in levels[Side.SELL].items()
+                ],
+            }
+        )
+    return payloads
+
+
+def bench_incremental(depth: int, updates: list[tuple], snapshot: bool) -> float:
+    book = LocalOrderBook("1_Eisbach", 1)
+    book.apply_snapshot(make_payload(depth, random.Random(0)))
+    update_level = book.update_level
+
+    start = perf_counter()
+    for side, price, volume in updates:
+        update_level(side, price, volume)
+        if snapshot:
+            book.snapshot()
+    return len(updates) / (perf_counter() - start)
+
+
+def bench_snapshot_diff(payloads: list[dict]) -> float:
+    books = BookManager()
+    start = perf_counter()
+    for payload in payloads:
+        books.apply(payload)
+    return len(payloads) / (perf_counter() - start)
+
+
+def bench_full_rebuild(payloads: list[dict]) -> float:
+    start = perf_counter()
+    for payload in payloads:
+        parse_orderbook(payload)
+    return len(payloads) / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=20_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(
+        f"{'depth':>6} {'incremental':>14} {'+snapshot':>14} {'diff':>14} {'rebuild':>14}"
+    )
+    for depth in args.depths:
+        updates = make_updates(depth, args.updates, rng)
+        n_payloads = max(50, args.updates // depth)
+        payloads = make_payload_stream(depth, updates[:n_payloads])
+
+        print(
+            f"{depth:>6} "
+            f"{bench_incremental(depth, updates, snapshot=False):>14,.0f} "
+            f"{bench_incremental(depth, updates, snapshot=True):>14,.0f} "
+            f"{bench_snapshot_diff(payloads):>14,.0f} "
+            f"{bench_full_rebuild(payloads):>14,.0f}"
+        )
+    print("(updates/sec; diff and rebuild consume one full book payload per update)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Settlement refresh: the dependency graph against the serial predictions.
+
+Sources are served offline with a simulated network latency per host: the
+hnd.bayern.de and timeanddate.com pages from tests/fixtures through the
+scrapers' fetch cache, and a synthetic Open-Meteo forecast. The serial path
+calls every prediction without inputs, the way the bot used to; the graph
+fetches each source once and runs independent nodes concurrently. Both must
+produce the same settlements.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_refresh
+"""
+
+import argparse
+import io
+import tempfile
+from contextlib import ExitStack, redirect_stdout
+from time import perf_counter, sleep
+from unittest import mock
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+
+import estimates.past_data_scraper as scraper
+from estimates import refresh, safety_net, weather_forecast
+from estimates.fetch_cache import FetchCache
+from estimates.timeseries import TimeSeriesStore
+from tests.pages import page
+
+FIXTURES = {
+    scraper.WATERFLOW_URL: "hnd_waterflow.html",
+    scraper.WATERLEVEL_URL: "hnd_waterlevel.html",
+    scraper.WEATHER_URL: "timeanddate_weather.html",
+}
+
+
+class FixtureSession:
+    def __init__(self, latency: dict[str, float]):
+        self.latency = latency
+        self.requests = 0
+
+    def get(self, url, headers=None, timeout=None) -> requests.Response:
+        self.requests += 1
+        sleep(self.latency.get(urlsplit(url).hostname, 0.0))
+        return page(FIXTURES[url])
+
+
+def forecast(latency: float):
+    index = pd.date_range(
+        "2025-11-22 10:30", periods=48, freq="30min", tz="Europe/Berlin"
+    )
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "temperature_2m": 40 + rng.normal(0, 2, 48),
+            "relative_humidity_2m": 80 + rng.normal(0, 5, 48),
+        },
+        index=index,
+    )
+
+    def get_raw_data():
+        sleep(latency)
+        return frame.copy()
+
+    return get_raw_data
+
+
+def serial() -> dict[str, int]:
+    return {
+        "1_Eisbach": int(safety_net.predict_market_1()),
+        "2_Eisbach_Call": int(safety_net.predict_market_2()),
+        "3_Weather": int(weather_forecast.get_3_weather_prediction()),
+        "5_Flights": int(safety_net.predict_market_5()),
+        "6_Airport": int(safety_net.predict_market_6()),
+        "7_ETF": int(safety_net.predict_market_7()),
+    }
+
+
+def offline(stack: ExitStack, args) -> FixtureSession:
+    """
+    Patches the sources for one refresh with a fresh fetch cache
+    """
+    session = FixtureSession(
+        {"www.hnd.bayern.de": args.hnd, "www.timeanddate.com": args.timeanddate}
+    )
+    get_raw_data = forecast(args.open_meteo)
+    stack.enter_context(
+        mock.patch.object(scraper, "FETCH_CACHE", FetchCache(session=session))
+    )
+    stack.enter_context(
+        mock.patch.object(weather_forecast, "get_raw_data", get_raw_data)
+    )
+    stack.enter_context(mock.patch.object(safety_net, "get_raw_data", get_raw_data))
+    # pin the hour so both paths see the same settlement window
+    stack.enter_context(mock.patch.object(safety_net, "elapsed_hours", lambda: 12))
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hnd", type=float, default=0.3, help="seconds")
+    parser.add_argument("--timeanddate", type=float, default=0.4, help="seconds")
+    parser.add_argument("--open-meteo", type=float, default=0.2, help="seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the predictions print their inputs
+        with mock.patch.object(
+            scraper, "STORE", TimeSeriesStore(directory)
+        ), redirect_stdout(io.StringIO()):
+            with ExitStack() as stack:
+                session = offline(stack, args)
+                start = perf_counter()
+                expected = serial()
+                serial_elapsed = perf_counter() - start
+                serial_requests = session.requests
+
+            with ExitStack() as stack:
+                session = offline(stack, args)
+                result = refresh.settlement_graph().run()
+                graph_requests = session.requests
+
+    if result.errors:
+        raise SystemExit(f"Refresh failed: {result.errors}")
+    settlements = {
+        product: int(result.values[product]) for product in refresh.SETTLEMENT_PRODUCTS
+    }
+    assert settlements == expected, f"{settlements} != {expected}"
+
+    print(result.report())
+    print(f"serial: {serial_elapsed * 1e3:,.0f}ms, {serial_requests} requests")
+    print(f"graph:  {result.elapsed * 1e3:,.0f}ms, {graph_requests} requests")
+    print(f"speedup: {serial_elapsed / result.elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Latency of `BaseBot.send_order` with and without the pooled keep-alive session.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_send_order
+"""
+
+import argparse
+from time import perf_counter
+
+import requests
+
+from benchmarks.stand_in import start_stand_in
+from imcity_template import BaseBot, OrderRequest, Side
+
+
+class BenchBot(BaseBot):
+    def on_orderbook(self, orderbook):
+        pass
+
+    def on_trades(self, trades):
+        pass
+
+
+class UnpooledBenchBot(BenchBot):
+    """
+    Reproduces the old behaviour: module-level requests calls, one connection per call
+    """
+
+    def _request(self, method, url, priority=None, key=None, timeout=None, **kwargs):
+        return requests.request(method, url, **kwargs)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(bot: BaseBot, iterations: int) -> list[float]:
+    order = OrderRequest(product="1_Eisbach", price=3000, side=Side.BUY, volume=1)
+    bot.auth_token  # authenticate outside of the timed loop
+    bot.send_order(order)  # warm up
+
+    samples = []
+    for _ in range(iterations):
+        start = perf_counter()
+        bot.send_order(order)
+        samples.append((perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    server, url = start_stand_in()
+    try:
+        for name, bot_class in (("before", UnpooledBenchBot), ("after", BenchBot)):
+            bot = bot_class(url, "bench", "bench", rate_limit=None)
+            samples = measure(bot, args.iterations)
+            print(
+                f"{name:>6}: p50={percentile(samples, 50):.3f}ms "
+                f"p99={percentile(samples, 99):.3f}ms n={len(samples)}"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
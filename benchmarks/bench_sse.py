@@ -0,0 +1,143 @@
+"""
+SSE parser throughput in events/sec, the built-in SSEParser vs sseclient-py.
+
+A market stream is recorded up front (order book and trade events with ids
+and heartbeat comments) and parsed twice: from memory, to isolate the
+parser, and streamed from the local stand-in server, the way SSEThread reads
+it. Both parsers must produce the same events.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sse
+"""
+
+import argparse
+import json
+import random
+from time import perf_counter
+
+import requests
+
+from benchmarks.stand_in import start_stand_in
+from imcity_sse import SSEParser, iter_chunks
+
+try:
+    import sseclient
+except ImportError:
+    sseclient = None
+
+
+def record_stream(events: int, depth: int, rng: random.Random) -> bytes:
+    parts = []
+    for i in range(events):
+        if i % 50 == 0:
+            parts.append(": heartbeat\n\n")
+        if i % 10 == 9:
+            event = "trade"
+            data = [
+                {
+                    "timestamp": "2025-11-22T10:00:00Z",
+                    "product": "1_Eisbach",
+                    "buyer": "a",
+                    "seller": "b",
+                    "volume": rng.randint(1, 10),
+                    "price": 1000 + rng.randint(-5, 5),
+                }
+            ]
+        else:
+            event = "order"
+            data = {
+                "product": "1_Eisbach",
+                "tickSize": 1,
+                "buy": [
+                    {
+                        "price": 1000 - j,
+                        "volume": rng.randint(1, 50),
+                        "userOrderVolume": 0,
+                    }
+                    for j in range(depth)
+                ],
+                "sell": [
+                    {
+                        "price": 1001 + j,
+                        "volume": rng.randint(1, 50),
+                        "userOrderVolume": 0,
+                    }
+                    for j in range(depth)
+                ],
+            }
+        parts.append(f"id: {i}\nevent: {event}\ndata: {json.dumps(data)}\n\n")
+    return "".join(parts).encode()
+
+
+def split_chunks(body: bytes, size: int) -> list[bytes]:
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+def parse_builtin(chunks) -> list[tuple[str, str]]:
+    return [(event.event, event.data) for event in SSEParser().events(chunks)]
+
+
+def parse_sseclient(chunks) -> list[tuple[str, str]]:
+    return [(event.event, event.data) for event in sseclient.SSEClient(chunks).events()]
+
+
+def stream_builtin(url: str) -> list[tuple[str, str]]:
+    with requests.get(url, stream=True, timeout=30) as response:
+        return parse_builtin(iter_chunks(response))
+
+
+def stream_sseclient(url: str) -> list[tuple[str, str]]:
+    with requests.get(url, stream=True, timeout=30) as response:
+        return parse_sseclient(response)
+
+
+def events_per_sec(parse, source, repeat: int) -> tuple[float, list]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        events = parse(source)
+        best = min(best, perf_counter() - start)
+    return len(events) / best, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--chunk", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    body = record_stream(args.events, args.depth, random.Random(12))
+    chunks = split_chunks(body, args.chunk)
+    server, url = start_stand_in()
+    server.stream_body = body
+    stream_url = f"{url}/api/market/stream"
+
+    # 7-byte chunks split lines and field names at arbitrary points
+    expected = parse_builtin(split_chunks(body, 7))
+    assert len(expected) == args.events
+
+    print(
+        f"{args.events} events, {len(body) / args.events:.0f} bytes/event (events/sec)"
+    )
+    print(f"{'source':<10} {'built-in':>12} {'sseclient':>12}")
+    for name, parse_new, parse_old, source in (
+        ("memory", parse_builtin, parse_sseclient, chunks),
+        ("stand-in", stream_builtin, stream_sseclient, stream_url),
+    ):
+        new_rate, new_events = events_per_sec(parse_new, source, args.repeat)
+        assert new_events == expected, f"built-in parser disagrees ({name})"
+        old = "n/a"
+        if sseclient is not None:
+            old_rate, old_events = events_per_sec(parse_old, source, args.repeat)
+            assert old_events == expected, f"sseclient disagrees ({name})"
+            old = f"{old_rate:,.0f}"
+        print(f"{name:<10} {new_rate:>12,.0f} {old:>12}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Memory and decode cost of the market data types, slotted vs the previous
+dict-backed dataclasses.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_types
+"""
+
+import argparse
+import json
+import random
+import sys
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Any
+
+from imcity_types import Order, Trade, decode_orderbook, orjson
+
+
+class LegacyMapping(Mapping):
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__annotations__)
+
+    def __len__(self) -> int:
+        return len(self.__annotations__)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def keys(self):
+        return self.__annotations__.keys()
+
+    def values(self):
+        return [getattr(self, k) for k in self.keys()]
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.keys()]
+
+
+@dataclass(frozen=True)
+class LegacyTrade(LegacyMapping):
+    timestamp: str
+    product: str
+    buyer: str
+    seller: str
+    volume: int
+    price: float
+
+
+@dataclass(frozen=True)
+class LegacyOrder(LegacyMapping):
+    price: float
+    volume: int
+    own_volume: int
+
+
+@dataclass(frozen=True)
+class LegacyOrderBook(LegacyMapping):
+    product: str
+    tick_size: float
+    buy_orders: list
+    sell_orders: list
+
+
+def legacy_decode_orderbook(raw: str) -> LegacyOrderBook:
+    orderbook = json.loads(raw)
+    buy_orders = sorted(
+        [
+            {
+                "price": float(order["price"]),
+                "volume": order["volume"],
+                "own_volume": order["userOrderVolume"],
+            }
+            for order in orderbook["buy"]
+        ],
+        key=lambda d: -d["price"],
+    )
+    sell_orders = sorted(
+        [
+            {
+                "price": float(order["price"]),
+                "volume": order["volume"],
+                "own_volume": order["userOrderVolume"],
+            }
+            for order in orderbook["sell"]
+        ],
+        key=lambda d: d["price"],
+    )
+    return LegacyOrderBook(
+        orderbook["product"],
+        orderbook["tickSize"],
+        list(map(lambda order: LegacyOrder(**order), buy_orders)),
+        list(map(lambda order: LegacyOrder(**order), sell_orders)),
+    )
+
+
+def object_size(obj) -> int:
+    """
+    Shallow size of the instance plus its attribute dict, if it has one
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def make_levels(base: int, step: int, depth: int, rng: random.Random) -> list[dict]:
+    levels = [
+        {"price": base + step * i, "volume": rng.randint(1, 50), "userOrderVolume": 0}
+        for i in range(depth)
+    ]
+    rng.shuffle(levels)
+    return levels
+
+
+def make_raw_book(depth: int, rng: random.Random) -> str:
+    return json.dumps(
+        {
+            "product": "1_Eisbach",
+            "tickSize": 1,
+            "buy": make_levels(1000, -1, depth, rng),
+            "sell": make_levels(1001, 1, depth, rng),
+        }
+    )
+
+
+def decode_rate(decode, payloads: list[str]) -> float:
+    start = perf_counter()
+    for payload in payloads:
+        decode(payload)
+    return len(payloads) / (perf_counter() - start)
+
+
+def items_rate(obj, iterations: int) -> float:
+    start = perf_counter()
+    for _ in range(iterations):
+        obj.items()
+        obj.values()
+    return iterations / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=20)
+    args = parser.parse_args()
+
+    trade = ("2025-11-22T10:00:00Z", "1_Eisbach", "a", "b", 2, 3000.0)
+    print("bytes per object (instance + __dict__)")
+    for name, legacy, current in (
+        ("Order", LegacyOrder(3000.0, 2, 0), Order(3000.0, 2, 0)),
+        ("Trade", LegacyTrade(*trade), Trade(*trade)),
+    ):
+        print(
+            f"  {name:<6} legacy={object_size(legacy):>4} slotted={object_size(current):>4}"
+        )
+
+    print("items()+values() calls/sec")
+    print(
+        f"  Order  legacy={items_rate(LegacyOrder(3000.0, 2, 0), 100_000):>12,.0f} "
+        f"slotted={items_rate(Order(3000.0, 2, 0), 100_000):>12,.0f}"
+    )
+
+    rng = random.Random(7)
+    payloads = [make_raw_book(args.depth, rng) for _ in range(args.books)]
+    backend = "orjson" if orjson else "json"
+    print(f"order book decode, depth {args.depth} per side (books/sec)")
+    print(
+        f"  legacy            {decode_rate(legacy_decode_orderbook, payloads):>12,.0f}"
+    )
+    print(
+        f"  direct ({backend:<6})   {decode_rate(decode_orderbook, payloads):>12,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+Benchmark suite for the hot paths, with a stable JSON output format and a
+comparison mode for gating changes on regressions.
+
+Cases cover the market data path (SSEThread order book handling at several
+depths, market data type construction), the client (RoboTrader.trade per
+tick and send_mass_orders fan-out, both over an in-process exchange instead
+of HTTP), the settlement functions in estimates.markets, and the HTML table
+parsers in estimates.past_data_scraper on the saved pages in
+tests/fixtures as well as a cached scraper call.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --filter sse --filter types
+    python -m benchmarks.run --baseline main.json --output branch.json
+    python -m benchmarks.run --compare main.json branch.json
+
+Output format (schema 1), times in seconds per operation:
+
+    {"schema": 1, "created": ..., "commit": ..., "python": ..., "platform": ...,
+     "results": {case: {"unit": "s", "rounds": ..., "number": ...,
+                        "min": ..., "median": ..., "mean": ..., "stdev": ...}}}
+
+With --compare or --baseline, a case regresses when its median is more than
+--threshold slower than the baseline median and even its fastest round is
+slower than the baseline median. Any regression makes the exit status 1.
+"""
+
+import argparse
+import io
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import wait
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from types import ModuleType
+from typing import Any, Callable, ContextManager
+from unittest import mock
+
+import pandas as pd
+
+from benchmarks.bench_orderbook import make_payload_stream, make_updates
+from imcity_backtest import SimulatedAdapter
+from imcity_matching import ExchangeAPI, MatchingEngine
+from imcity_template import BaseBot, SSEThread
+from imcity_types import Order, OrderBook, OrderRequest, OrderResponse, Side, Trade
+from tests.pages import page
+
+SCHEMA = 1
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[], ContextManager[Callable[[], Any]]]
+
+
+CASES: dict[str, Case] = {}
+
+
+def case(name: str):
+    """
+    Registers a generator that sets up a case, yields the callable to time
+    and cleans up after it
+    """
+
+    def register(setup):
+        CASES[name] = Case(name, contextmanager(setup))
+        return setup
+
+    return register
+
+
+class SimulatedBot(BaseBot):
+    def on_orderbook(self, orderbook):
+        pass
+
+    def on_trades(self, trades):
+        pass
+
+
+def connect_simulated(bot: BaseBot, products: list[str]) -> BaseBot:
+    """
+    Routes the bot's session to an in-process exchange
+    """
+    api = ExchangeAPI(MatchingEngine({product: 1 for product in products}))
+    adapter = SimulatedAdapter(api)
+    bot._session.mount("http://", adapter)
+    bot._session.trust_env = False
+    return bot
+
+
+# --- market data path -------------------------------------------------------
+
+
+def _sse_case(depth: int):
+    def setup():
+        updates = make_updates(depth, 200, random.Random(depth))
+        payloads = make_payload_stream(depth, updates)
+        thread = SSEThread("", "", lambda book: None, lambda trades: None)
+        handle = thread._handle_orderbook_change
+        stream = iter(())
+
+        def step():
+            nonlocal stream
+            payload = next(stream, None)
+            if payload is None:
+                stream = iter(payloads)
+                payload = next(stream)
+            handle(payload)
+
+        yield step
+
+    case(f"sse.handle_orderbook_change[depth={depth}]")(setup)
+
+
+for _depth in (10, 100, 1000):
+    _sse_case(_depth)
+
+
+@case("types.order")
+def bench_order():
+    yield lambda: Order(1000.0, 5, 0)
+
+
+@case("types.trade")
+def bench_trade():
+    yield lambda: Trade("2025-11-22T10:00:00Z", "1_Eisbach", "a", "b", 3, 1000.0)
+
+
+@case("types.order_request")
+def bench_order_request():
+    yield lambda: OrderRequest("1_Eisbach", 1000, Side.BUY, 2)
+
+
+@case("types.order_response")
+def bench_order_response():
+    payload = {
+        "id": "1",
+        "status": "ACTIVE",
+        "product": "1_Eisbach",
+        "side": "BUY",
+        "price": 1000,
+        "volume": 2,
+        "filled": 0,
+        "user": "bench",
+        "timestamp": "2025-11-22T10:00:00Z",
+        "targetUser": None,
+        "message": None,
+    }
+    yield lambda: OrderResponse(**payload)
+
+
+@case("types.orderbook[depth=10]")
+def bench_orderbook():
+    bids = tuple(Order(1000.0 - i, 5, 0) for i in range(10))
+    asks = tuple(Order(1001.0 + i, 5, 0) for i in range(10))
+    yield lambda: OrderBook("1_Eisbach", 1.0, bids, asks)
+
+
+# --- client -----------------------------------------------------------------
+
+
+def _import_bot_offline() -> ModuleType:
+    """
+    Imports bot.py and fills in its expected settlements from a stubbed
+    refresh, since the real one fetches live data
+    """
+    import estimates.refresh as refresh
+
+    with redirect_stdout(io.StringIO()):
+        import bot
+
+    settlements = refresh.RefreshGraph()
+    for product in refresh.SETTLEMENT_PRODUCTS:
+        settlements.add(product, lambda: 1000)
+    graph = mock.patch.object(bot, "settlement_graph", lambda engine: settlements)
+    with graph, redirect_stdout(io.StringIO()):
+        bot.update_settlement()
+    return bot
+
+
+@case("client.robotrader_trade_per_tick")
+def bench_robotrader_trade_per_tick():
+    bot = _import_bot_offline()
+    trader = bot.RoboTrader("http://bench", "bench", "bench", rate_limit=None)
+    connect_simulated(trader, list(bot.EXPECTED_SETTLEMENT))
+    # logging stays on, only its output is dropped
+    handlers, bot.logger.handlers = bot.logger.handlers, [logging.NullHandler()]
+    # the two books alternate so every tick moves both quotes
+    books = [(900, 1100, 1000.0, 200), (901, 1101, 1001.0, 200)]
+    tick = 0
+
+    def step():
+        nonlocal tick
+        trader.orderbook_estimate["1_Eisbach"] = books[tick % 2]
+        tick += 1
+        wait(trader.trade("1_Eisbach"))
+
+    try:
+        yield step
+    finally:
+        bot.logger.handlers = handlers
+        trader._executor.shutdown()
+
+
+def _mass_orders_case(batch: int):
+    def setup():
+        client = connect_simulated(
+            SimulatedBot("http://bench", "bench", "bench", rate_limit=None),
+            ["1_Eisbach"],
+        )
+        orders = [
+            OrderRequest("1_Eisbach", 900 + i % 50, Side.BUY, 1) for i in range(batch)
+        ]
+        try:
+            yield lambda: client.send_mass_orders(orders)
+        finally:
+            client._executor.shutdown()
+
+    case(f"client.send_mass_orders[batch={batch}]")(setup)
+
+
+for _batch in (10, 100):
+    _mass_orders_case(_batch)
+
+
+# --- estimates --------------------------------------------------------------
+
+
+def _series(n: int, low: float, high: float, seed: int) -> list[float]:
+    rng = random.Random(seed)
+    return [rng.uniform(low, high) for _ in range(n)]
+
+
+@case("estimates.market_1_settlement")
+def bench_market_1_settlement():
+    from estimates.markets import market_1_settlement
+
+    yield lambda: market_1_settlement(25.3, 138.0)
+
+
+@case("estimates.market_2_call_value[n=96]")
+def bench_market_2_call_value():
+    from estimates.markets import market_2_call_value
+
+    flows, levels = _series(96, 20, 30, 1), _series(96, 130, 145, 2)
+    yield lambda: market_2_call_value(flows, levels)
+
+
+@case("estimates.market_3_settlement[n=96]")
+def bench_market_3_settlement():
+    from estimates.markets import market_3_settlement
+
+    temps, humidities = _series(96, 30, 45, 3), _series(96, 60, 100, 4)
+    yield lambda: market_3_settlement(temps, humidities)
+
+
+@case("estimates.market_4_settlement[n=96]")
+def bench_market_4_settlement():
+    from estimates.markets import market_4_settlement
+
+    temps = [(t, 38.0, 39.0) for t in _series(96, 30, 45, 5)]
+    humidities = [(h, 80.0, 78.0) for h in _series(96, 60, 100, 6)]
+    # prints every term; the runner discards stdout while timing
+    yield lambda: market_4_settlement(temps, humidities)
+
+
+@case("estimates.market_5_settlement[n=96]")
+def bench_market_5_settlement():
+    from estimates.markets import market_5_settlement
+
+    rng = random.Random(7)
+    arrivals = pd.Series([rng.randint(0, 40) for _ in range(96)])
+    departures = pd.Series([rng.randint(0, 40) for _ in range(96)])
+    yield lambda: market_5_settlement(arrivals, departures)
+
+
+@case("estimates.market_6_settlement[n=96]")
+def bench_market_6_settlement():
+    from estimates.markets import market_6_settlement
+
+    rng = random.Random(8)
+    arrivals = [rng.randint(0, 40) for _ in range(96)]
+    departures = [rng.randint(0, 40) for _ in range(96)]
+    yield lambda: market_6_settlement(arrivals, departures)
+
+
+@case("estimates.market_7_etf_settlement")
+def bench_market_7_etf_settlement():
+    from estimates.markets import market_7_etf_settlement
+
+    yield lambda: market_7_etf_settlement(25.3, 138.0, 40.0, 80.0, 12.5)
+
+
+@case("estimates.market_3_settlement_batch[1000x96]")
+def bench_market_3_settlement_batch():
+    import numpy as np
+
+    from estimates.markets import market_3_settlement_batch
+
+    rng = np.random.default_rng(3)
+    temps, humidities = rng.uniform(30, 45, (1000, 96)), rng.uniform(
+        60, 100, (1000, 96)
+    )
+    yield lambda: market_3_settlement_batch(temps, humidities)
+
+
+@case("estimates.market_6_settlement_batch[1000x96]")
+def bench_market_6_settlement_batch():
+    import numpy as np
+
+    from estimates.markets import market_6_settlement_batch
+
+    rng = np.random.default_rng(8)
+    arrivals, departures = rng.integers(0, 40, (2, 1000, 96))
+    yield lambda: market_6_settlement_batch(arrivals, departures)
+
+
+@case("estimates.monte_carlo[paths=10000]")
+def bench_monte_carlo():
+    from benchmarks.bench_monte_carlo import inputs
+    from estimates.monte_carlo import simulate
+    from estimates.safety_net import settlement_model
+
+    model = settlement_model(**inputs(stunden=6))
+    yield lambda: simulate(model, paths=10_000, seed=0)
+
+
+# --- scrapers ---------------------------------------------------------------
+
+
+def _parser_case(function: str, fixture: str):
+    def setup():
+        import estimates.past_data_scraper as scraper
+
+        response = page(fixture)
+        parse = getattr(scraper, function)
+        yield lambda: parse(response)
+
+    case(f"scraper.{function}")(setup)
+
+
+for _function, _fixture in (
+    ("parse_waterflow", "hnd_waterflow.html"),
+    ("parse_waterlevel", "hnd_waterlevel.html"),
+    ("parse_weather_df", "timeanddate_weather.html"),
+):
+    _parser_case(_function, _fixture)
+
+
+@case("scraper.get_waterflow[cached]")
+def bench_cached_waterflow():
+    import estimates.past_data_scraper as scraper
+    from estimates.fetch_cache import FetchCache
+    from estimates.timeseries import TimeSeriesStore
+
+    response = page("hnd_waterflow.html")
+    session = mock.Mock(get=lambda *args, **kwargs: response)
+    with tempfile.TemporaryDirectory() as directory, mock.patch.multiple(
+        scraper,
+        FETCH_CACHE=FetchCache(session=session),
+        STORE=TimeSeriesStore(directory),
+    ):
+        yield scraper.get_waterflow
+
+
+@case("scraper.get_history[waterflow,24h]")
+def bench_waterflow_history():
+    import estimates.past_data_scraper as scraper
+    from estimates.timeseries import TimeSeriesStore
+
+    response = page("hnd_waterflow.html")
+    frame = scraper.parse_waterflow(response)
+    with tempfile.TemporaryDirectory() as directory, mock.patch.object(
+        scraper, "STORE", TimeSeriesStore(directory)
+    ):
+        scraper.STORE.series("waterflow").append(frame.index, value=frame["data"])
+        yield lambda: scraper.get_history("waterflow", "24h")
+
+
+# --- runner -----------------------------------------------------------------
+
+
+def time_case(
+    bench: Case, rounds: int, min_time: float, sink: io.StringIO
+) -> dict[str, Any]:
+    with bench.setup() as step:
+        # calibrate so one round takes at least min_time
+        number = 1
+        while True:
+            start = perf_counter()
+            with redirect_stdout(sink):
+                for _ in range(number):
+                    step()
+            elapsed = perf_counter() - start
+            sink.seek(0)
+            sink.truncate()
+            if elapsed >= min_time:
+                break
+            number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+
+        samples = []
+        for _ in range(rounds):
+            start = perf_counter()
+            with redirect_stdout(sink):
+                for _ in range(number):
+                    step()
+            samples.append((perf_counter() - start) / number)
+            sink.seek(0)
+            sink.truncate()
+
+    return {
+        "unit": "s",
+        "rounds": rounds,
+        "number": number,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if rounds > 1 else 0.0,
+    }
+
+
+def run(filters: list[str], rounds: int, min_time: float) -> dict[str, Any]:
+    results = {}
+    sink = io.StringIO()
+    for name, bench in CASES.items():
+        if filters and not any(f in name for f in filters):
+            continue
+        results[name] = result = time_case(bench, rounds, min_time, sink)
+        print(
+            f"{name:<48} {format_time(result['median']):>10}"
+            f" ±{result['stdev'] / result['median']:>4.0%}",
+            file=sys.stderr,
+        )
+    return {
+        "schema": SCHEMA,
+        "created": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    Prints a comparison table and returns the names of regressed cases
+    """
+    if baseline.get("schema") != SCHEMA or current.get("schema") != SCHEMA:
+        raise ValueError(f"Can only compare schema {SCHEMA} results")
+    old, new = baseline["results"], current["results"]
+    regressions = []
+    print(f"{'case':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(old.keys() | new.keys()):
+        if name not in new or name not in old:
+            where = "baseline" if name in old else "current"
+            print(f"{name:<48} only in {where}")
+            continue
+        before, after = old[name], new[name]
+        ratio = after["median"] / before["median"]
+        status = ""
+        if ratio > 1 + threshold and after["min"] > before["median"]:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        print(
+            f"{name:<48} {format_time(before['median']):>10}"
+            f" {format_time(after['median']):>10} {ratio - 1:>+8.1%} {status}"
+        )
+    return regressions
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load(path: str) -> dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--filter", action="append", default=[], metavar="TEXT")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.1, metavar="SECONDS")
+    parser.add_argument("--quick", action="store_true", help="3 rounds of 20ms")
+    parser.add_argument("--output", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    if args.compare:
+        regressions = compare(*map(_load, args.compare), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    rounds, min_time = (3, 0.02) if args.quick else (args.rounds, args.min_time)
+    results = run(args.filter, rounds, min_time)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+    elif not args.baseline:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.baseline:
+        baseline = _load(args.baseline)
+        if args.filter:
+            baseline["results"] = {
+                name: result
+                for name, result in baseline["results"].items()
+                if name in results["results"]
+            }
+        regressions = compare(baseline, results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Minimal local stand-in for the CMI exchange REST API, used by the benchmarks.
+
+Only answers enough of the API for the client hot paths to run: authentication,
+order placement/cancellation, the current-user queries and the market stream.
+Responses are canned, no matching happens here. The market stream replays
+`server.stream_body` and closes the connection.
+"""
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from threading import Thread
+
+_order_ids = count(1)
+
+
+def _order_response(payload: dict) -> dict:
+    return {
+        "id": str(next(_order_ids)),
+        "status": "ACTIVE",
+        "product": payload.get("product"),
+        "side": payload.get("side"),
+        "price": payload.get("price"),
+        "volume": payload.get("volume"),
+        "filled": 0,
+        "user": "bench",
+        "timestamp": "2025-11-22T10:00:00Z",
+        "targetUser": None,
+        "message": None,
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, headers: dict[str, str] | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path.startswith("/api/user/authenticate"):
+            self._send_json({}, {"Authorization": "Bearer bench"})
+        else:
+            self._send_json(_order_response(payload))
+
+    def do_DELETE(self):
+        self._send_json({"id": self.path.rsplit("/", 1)[-1]})
+
+    def do_GET(self):
+        if self.path.startswith("/api/market/stream"):
+            self._send_stream(self.server.stream_body)
+        else:
+            self._send_json([])
+
+    def _send_stream(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(body)
+
+
+def start_stand_in(port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Starts the stand-in server on a background thread and returns it with its base url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    server.stream_body = b""
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
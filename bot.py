@@ -1,11 +1,18 @@
 from time import sleep
 import logging
 import sys
-from datetime import datetime, timedelta
 
 from imcity_template import BaseBot, Side, OrderRequest, OrderBook, Order
+from imcity_quotes import QuoteManager
 from estimates.safety_net import *
-from estimates.weather_forecast import get_3_weather_prediction
+from estimates.fair_value import FairValue, FairValueService
+from estimates.monte_carlo import MonteCarloEngine
+from estimates.refresh import (
+    DISTRIBUTIONS,
+    SETTLEMENT_PRODUCTS,
+    SOURCE_INTERVALS,
+    settlement_graph,
+)
 
 
 # colored stdout logging
@@ -38,71 +45,84 @@ logger.addHandler(stream_handler)
 logger.propagate = False
 
 
-EXPECTED_SETTLEMENT = {
-    '1_Eisbach': int(predict_market_1()),
-    '2_Eisbach_Call': int(predict_market_2()),
-    '3_Weather': int(get_3_weather_prediction()),
-    # '4_Weather': 8545,
-    '5_Flights': int(predict_market_5()),
-    '6_Airport': int(predict_market_6()),
-    '7_ETF': int(predict_market_7()),
-    # '8_ETF_Strangle': 0,
-}
-logger.info(f"Expected Settlements: {EXPECTED_SETTLEMENT}")
+# not quoted: '4_Weather', '8_ETF_Strangle'
+EXPECTED_SETTLEMENT = {}
+# product -> SettlementDistribution of the simulated settlements
+SETTLEMENT_DISTRIBUTION = {}
+SETTLEMENT_ENGINE = MonteCarloEngine()
+# keeps them current as new data comes in, after a full refresh at start-up
+FAIR_VALUES = FairValueService(settlement_graph(SETTLEMENT_ENGINE), SOURCE_INTERVALS)
 
 
 def update_settlement():
-    EXPECTED_SETTLEMENT['1_Eisbach'] = int(predict_market_1())
-    EXPECTED_SETTLEMENT['2_Eisbach_Call'] = int(predict_market_2())
-    EXPECTED_SETTLEMENT['3_Weather'] = int(get_3_weather_prediction())
-    EXPECTED_SETTLEMENT['5_Flights'] = int(predict_market_5())
-    EXPECTED_SETTLEMENT['6_Airport'] = int(predict_market_6())
-    EXPECTED_SETTLEMENT['7_ETF'] = int(predict_market_7())
+    refresh = settlement_graph(SETTLEMENT_ENGINE).run()
+    FAIR_VALUES.load(refresh)
+    for product in SETTLEMENT_PRODUCTS:
+        if product in refresh.values:
+            EXPECTED_SETTLEMENT[product] = int(refresh.values[product])
+        else:
+            # keep quoting around the last good estimate
+            logger.error(f"Settlement refresh failed for {product}: {refresh.errors[product]!r}")
+    if DISTRIBUTIONS in refresh.values:
+        SETTLEMENT_DISTRIBUTION.update(refresh.values[DISTRIBUTIONS])
+        for product, distribution in refresh.values[DISTRIBUTIONS].items():
+            logger.info(f"Settlement distribution {product}: {distribution}")
+    elif DISTRIBUTIONS in refresh.errors:
+        # spreads stay sized by the last good distribution
+        logger.error(f"Settlement distributions failed: {refresh.errors[DISTRIBUTIONS]!r}")
+    logger.info(f"Settlement refresh (ms):\n{refresh.report()}")
     logger.info(f"Expected Settlements: {EXPECTED_SETTLEMENT}")
 
 
 class RoboTrader(BaseBot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.new_orders: list[OrderRequest] = []
-        self.last_trade_time = datetime.now()
+        self.quotes = QuoteManager(self)
 
-        self.positions = {}
         self.position_limit = 200
         self.base_order_volume = 2
         self.base_spread_percentage = 10
+        # share of the settlement distribution between bid and ask
+        self.spread_coverage = 0.5
 
         self.orderbook_estimate = {} # product_name -> (best_bid, best_ask, mid_price, spread)
 
-    def update_position(self, product, volume):
-        if product not in self.positions:
-            self.positions[product] = 0
-        self.positions[product] += volume
-
-        # TODO: Check back with .request_positions() if accurate
-
     def main(self):
-        self.get_orderbooks()
+        # the stream keeps the books, BaseBot resyncs them from REST snapshots
+        # after every reconnect, so there is nothing to poll here
         sleep(10)
 
+    # INCOMING - Fair Value Updates, on the fair value service's threads
+    def on_fair_value(self, fair_value: FairValue):
+        if fair_value.name == DISTRIBUTIONS:
+            SETTLEMENT_DISTRIBUTION.update(fair_value.value)
+            products = list(fair_value.value)
+            for product, distribution in fair_value.value.items():
+                logger.info(f"[FAIR VALUE] {product} distribution: {distribution}")
+        elif fair_value.name in SETTLEMENT_PRODUCTS:
+            EXPECTED_SETTLEMENT[fair_value.name] = int(fair_value.value)
+            products = [fair_value.name]
+            logger.info(f"[FAIR VALUE] {fair_value.name}: {int(fair_value.value)}, data {fair_value.age:.0f}s old")
+        else:
+            return
+
+        # requote through the dispatcher, never alongside a book update
+        for product in products:
+            if product in self.orderbook_estimate:
+                self.replay_orderbook(product)
+
     # INCOMING - Trade Notifications
     def on_trades(self, trades: list[dict]):
-        sleep(1)
+        # self.ledger has already applied these fills (see BaseBot._handle_trades)
         for trade in trades:
             product = trade['product']
             volume = trade['volume']
             price = trade['price']
-            
 
             if trade['buyer'] == self.username:
-                # self.update_position(product, volume)
-                logger.critical(f"[TRADE] BUY on {product}: #{volume} @ {price}. Pos: {self.positions[product]}")
+                logger.critical(f"[TRADE] BUY on {product}: #{volume} @ {price}. Pos: {self.ledger[product]}")
             elif trade['seller'] == self.username:
-                # self.update_position(product, -volume)
-                logger.critical(f"[TRADE] SELL on {product}: #{volume} @ {price}. Pos: {self.positions[product]}")
-
-            self.positions = self.request_positions()
-            logger.info(f"Updated Positions: {self.positions}")
+                logger.critical(f"[TRADE] SELL on {product}: #{volume} @ {price}. Pos: {self.ledger[product]}")
 
 
     # INCOMING - Order Book Updates
@@ -122,92 +142,72 @@ class RoboTrader(BaseBot):
         # print(f"[ORDERBOOK {product}] Best Bid: {best_bid}, Best Ask: {best_ask}, Mid: {mid_price}, Expected Settlement: {expected_settlement}")
         # print("Orderbook Activity")
         logger.info(f"[ORDERBOOK {product}] Best Bid: {best_bid}, Best Ask: {best_ask}, Mid: {mid_price}, Expected Settlement: {expected_settlement}")
-        logger.info(f"{self.orderbook_estimate}")
+        logger.debug("%s", self.orderbook_estimate)
 
-        self.trade()
-
-    def get_orderbooks(self):
-        for product in EXPECTED_SETTLEMENT.keys():
-            resp = self.request_order_book_per_product(product)
-            logger.info(f"Got orderbooks: {resp}")
+        self.trade(product)
 
     # TRADING LOGIC
-    def trade(self):
+    def trade(self, product=None):
+        # pacing to the exchange rate limit happens in BaseBot's request scheduler.
+        # The dispatcher never runs two handlers for the same product at once,
+        # so quoting only the product that ticked keeps updates from racing.
+        # Requests go out without waiting for the exchange; their futures are returned.
+        products = [product] if product else list(self.orderbook_estimate)
+        futures = []
+        for product in products:
+            # only the difference to what is already resting goes out
+            futures += self.quotes.update(product, self.desired_quotes(product))
+        return futures
+
+    def desired_quotes(self, product) -> list[OrderRequest]:
         order_volume = self.base_order_volume
-        bot.cancel_all_orders()
-        for product in self.orderbook_estimate:
-            best_bid, best_ask, market_mid_price, market_spread = self.orderbook_estimate[product]
-            current_pos = self.positions.get(product, 0)
-            estimated_settlement = EXPECTED_SETTLEMENT.get(product, None)
-            if not estimated_settlement:
-                continue
-
-            # Skew adjustment
-            # skew_factor = 0.005  # For every 1 unit of position
-            # current_skew = current_pos * skew_factor * abs(estimated_settlement - market_mid_price)
-            adjusted_settlement = estimated_settlement# - current_skew
-
-            # Based on estimated settlement
-            spread = adjusted_settlement * (self.base_spread_percentage / 100)
-            my_bid = int(adjusted_settlement - (spread / 2))
-            my_ask = int(adjusted_settlement + (spread / 2))
-
-            my_bid = min(my_bid, best_bid + 1)
-            my_ask = max(my_ask, best_ask - 1)
-
-            if my_bid >= my_ask:
-            # If spread is crossed, we essentially become a Taker. 
-            # Back off slightly to maintain a minimum spread.
-                mid = (my_bid + my_ask) / 2
-                my_bid = int(mid - 1)
-                my_ask = int(mid + 1)
-
-            # Safety Checks
-            can_buy = current_pos + order_volume <= self.position_limit
-            can_sell = current_pos - order_volume >= -self.position_limit
-
-            bid_would_execute = my_bid >= best_ask
-            ask_would_execute = my_ask <= best_bid
-            bid_is_highest = my_bid >= best_bid
-            ask_is_lowest = my_ask <= best_ask
-
-            logger.warning(f"[{product}] MARKET IS Bid: {best_bid}, Ask: {best_ask}, Mid: {market_mid_price}, Spread: {market_spread}")
-            if can_buy:
-                self.add_order(product, Side.BUY, my_bid, order_volume)
-                logger.warning(f"[ORDER] Placing BUY order for {product}: #{order_volume} @ {my_bid}")
-                # logger.warning(f"Would place BUY order for {product}: #{order_volume} @ {my_bid} for est. settlement {estimated_settlement}")
-                # logger.warning(f"Our bid is {my_bid-best_bid} higher than market --> Would Execute: {bid_would_execute}, Is Highest: {bid_is_highest}")
-
-            if can_sell:
-                self.add_order(product, Side.SELL, my_ask, order_volume)
-                logger.warning(f"[ORDER] Placing SELL order for {product}: #{order_volume} @ {my_ask}")
-                # logger.warning(f"Would place SELL order for {product}: #{order_volume} @ {my_ask} for est. settlement {estimated_settlement}")
-                # logger.warning(f"Our ask is {best_ask-my_ask} lower than market --> Would Execute: {ask_would_execute}, Is Lowest: {ask_is_lowest}")
-
-    # OUTGOING - Place Orders
-    def add_order(self, product, side: Side, price, volume):
-        if datetime.now() - self.last_trade_time < timedelta(seconds=1):
-            self.add_order_to_backlog(product, side, price, volume)
+        best_bid, best_ask, market_mid_price, market_spread = self.orderbook_estimate[product]
+        current_pos = self.ledger[product]
+        estimated_settlement = EXPECTED_SETTLEMENT.get(product, None)
+        if not estimated_settlement:
+            return []
+
+        # Skew adjustment
+        # skew_factor = 0.005  # For every 1 unit of position
+        # current_skew = current_pos * skew_factor * abs(estimated_settlement - market_mid_price)
+        adjusted_settlement = estimated_settlement# - current_skew
+
+        # Based on how uncertain the settlement still is, or on the
+        # estimated settlement until there is a distribution
+        distribution = SETTLEMENT_DISTRIBUTION.get(product)
+        if distribution is not None:
+            low, high = distribution.interval(self.spread_coverage)
+            spread = high - low
         else:
-            self.add_order_to_backlog(product, side, price, volume)
-            self.execute_orders()
-            self.last_trade_time = datetime.now()
+            spread = adjusted_settlement * (self.base_spread_percentage / 100)
+        my_bid = int(adjusted_settlement - (spread / 2))
+        my_ask = int(adjusted_settlement + (spread / 2))
+
+        my_bid = min(my_bid, best_bid + 1)
+        my_ask = max(my_ask, best_ask - 1)
+
+        if my_bid >= my_ask:
+        # If spread is crossed, we essentially become a Taker. 
+        # Back off slightly to maintain a minimum spread.
+            mid = (my_bid + my_ask) / 2
+            my_bid = int(mid - 1)
+            my_ask = int(mid + 1)
 
-    def add_order_to_backlog(self, product, side: Side, price, volume):
-        order_request = OrderRequest(
-            product=product,
-            side=side,
-            price=price,
-            volume=volume,
-        )
+        # Safety Checks
+        can_buy = current_pos + order_volume <= self.position_limit
+        can_sell = current_pos - order_volume >= -self.position_limit
 
-        self.new_orders.append(order_request)
-        logger.info(f"[ORDER ADDED] {side} {product} #{volume} @ {price}")
+        logger.warning(f"[{product}] MARKET IS Bid: {best_bid}, Ask: {best_ask}, Mid: {market_mid_price}, Spread: {market_spread}")
+        desired = []
+        if can_buy:
+            desired.append(OrderRequest(product=product, side=Side.BUY, price=my_bid, volume=order_volume))
+            logger.warning(f"[ORDER] Quoting BUY for {product}: #{order_volume} @ {my_bid}")
 
+        if can_sell:
+            desired.append(OrderRequest(product=product, side=Side.SELL, price=my_ask, volume=order_volume))
+            logger.warning(f"[ORDER] Quoting SELL for {product}: #{order_volume} @ {my_ask}")
 
-    def execute_orders(self):
-        resp = self.send_mass_orders(self.new_orders)
-        self.new_orders = []
+        return desired
 
 
 if __name__ == "__main__":
@@ -224,28 +224,34 @@ if __name__ == "__main__":
     if not USERNAME or not PASSWORD:
         raise RuntimeError("Environment variables IMCITY_USERNAME and IMCITY_PASSWORD must be set.")
 
+    # not at import: the settlement engine's worker processes import this module
+    update_settlement()
+
     try:
-        bot = RoboTrader(REAL_EXCHANGE, USERNAME, PASSWORD)
+        bot = RoboTrader(REAL_EXCHANGE, USERNAME, PASSWORD, latency_report_interval=300)
         
         # Sync positions on startup
         server_positions = bot.request_positions()
         if server_positions:
-            bot.positions = server_positions
-            logger.info(f"Initial Positions: {bot.positions}")
-        
+            bot.ledger.reset(server_positions)
+            logger.info(f"Initial Positions: {bot.ledger.volumes()}")
+
+        # Pick up orders left resting from a previous run
+        bot.reconcile_orders()
+
         bot.start()
 
-        last_minute = None
-        while True:
-            now = datetime.now()
-            if now.minute in {1, 16, 34, 46} and now.minute != last_minute:
-                last_minute = now.minute
-                logger.warning("Running 15-min clock-aligned task...")
-                update_settlement()
+        # settlements follow new data from here on
+        FAIR_VALUES.subscribe(bot.on_fair_value)
+        FAIR_VALUES.start()
 
+        while True:
             bot.main()
 
 
     except KeyboardInterrupt:
+        FAIR_VALUES.stop()
         bot.stop()
+        SETTLEMENT_ENGINE.close()
+        print(f"Tick-to-trade latency (us):\n{bot.latency.report()}")
         print("Bot stopped.")
\ No newline at end of file
@@ -1,4 +1,5 @@
 
-WATERFLOW_DATA_NAME = "waterflow.csv"
-WATERLEVEL_DATA_NAME = "waterlevel.csv"
-WEATHER_DATA_NAME = "weather.csv"
\ No newline at end of file
+from pathlib import Path
+
+# next to the code, not wherever the bot happens to be started from
+TIMESERIES_DIRECTORY = Path(__file__).resolve().parent / "timeseries"
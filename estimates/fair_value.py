@@ -0,0 +1,246 @@
+"""
+Incremental fair values on top of the settlement graph.
+
+Instead of refreshing every settlement on a clock, each source of the graph
+(a node without dependencies) is polled on its own interval, or pushes its
+observations through `publish`. A source that changed recomputes only the
+nodes depending on it, in dependency order, and a recomputed node whose value
+did not change stops the update there. Subscribers are called with every new
+value right after it is computed, so quotes can follow new data within
+seconds.
+
+A fetch returning the very object it returned before, as the scrapers' fetch
+cache does while a page is unchanged, or an equal value is not a change.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Event, RLock, Thread
+from time import monotonic, time
+from traceback import format_exc
+from typing import Any, Callable, Iterable
+
+from estimates.refresh import RefreshGraph, RefreshResult
+
+DEFAULT_INTERVAL = 60.0
+
+
+@dataclass(frozen=True, slots=True)
+class FairValue:
+    """
+    A node's value and the wall clock time of the newest source observation
+    it was computed from
+    """
+
+    name: str
+    value: Any
+    as_of: float
+
+    @property
+    def age(self) -> float:
+        return time() - self.as_of
+
+
+class FairValueService:
+    """
+    Keeps the values of all nodes of `graph` current. Sources are polled every
+    `intervals[name]` seconds, DEFAULT_INTERVAL if not given, once `start`ed.
+    """
+
+    graph: RefreshGraph
+    errors: dict[str, BaseException]
+
+    def __init__(
+        self,
+        graph: RefreshGraph,
+        intervals: dict[str, float] | None = None,
+        default_interval: float = DEFAULT_INTERVAL,
+    ):
+        self.graph = graph
+        self.errors = {}
+        self._sources = [node.name for node in graph.nodes.values() if not node.deps]
+        self._intervals = {
+            name: (intervals or {}).get(name, default_interval)
+            for name in self._sources
+        }
+        self._values: dict[str, FairValue] = {}
+        self._subscribers: list[Callable[[FairValue], Any]] = []
+        # one update at a time, subscribers may publish from their callback;
+        # also guards _inflight, which fetch callbacks clear
+        self._lock = RLock()
+        self._inflight: dict[str, Future] = {}
+        self._stop = Event()
+        self._thread: Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def subscribe(self, callback: Callable[[FairValue], Any]) -> None:
+        self._subscribers.append(callback)
+
+    def value(self, name: str) -> FairValue | None:
+        return self._values.get(name)
+
+    def values(self) -> dict[str, FairValue]:
+        return dict(self._values)
+
+    def load(self, result: RefreshResult) -> None:
+        """
+        Takes the values of a full refresh of the graph as current, without
+        notifying subscribers
+        """
+        now = time()
+        with self._lock:
+            for name, value in result.values.items():
+                if name in self.graph.nodes:
+                    self._values[name] = FairValue(name, value, now)
+
+    def publish(
+        self, source: str, value: Any, as_of: float | None = None
+    ) -> list[FairValue]:
+        """
+        Takes a new observation of `source` and recomputes what depends on
+        it. Returns the values that changed, the source's first.
+        """
+        if source not in self._intervals:
+            raise KeyError(f"{source} is not a source")
+        with self._lock:
+            previous = self._values.get(source)
+            self.errors.pop(source, None)
+            if previous is not None and _equal(previous.value, value):
+                return []
+            fair_value = FairValue(source, value, time() if as_of is None else as_of)
+            self._values[source] = fair_value
+            self._notify(fair_value)
+            return [fair_value] + self._recompute(source)
+
+    def poll(self, sources: Iterable[str] | None = None) -> list[FairValue]:
+        """
+        Fetches `sources` (all by default) concurrently, publishes what
+        changed and returns the values that changed
+        """
+        executor = self._executor or ThreadPoolExecutor(
+            max_workers=len(self._sources) or 1, thread_name_prefix="FairValue"
+        )
+        try:
+            futures = {
+                name: executor.submit(self.graph.nodes[name].fn)
+                for name in sources or self._sources
+            }
+            changed = []
+            for name, future in futures.items():
+                changed += self._fetched(name, future)
+            return changed
+        finally:
+            if executor is not self._executor:
+                executor.shutdown()
+
+    def start(self) -> None:
+        """
+        Polls the sources in the background until `stop`, each first one
+        interval from now: `load` or `poll` them before
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self._sources) or 1, thread_name_prefix="FairValue"
+        )
+        self._thread = Thread(target=self._run, name="FairValueService", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _run(self) -> None:
+        due = {
+            name: monotonic() + interval for name, interval in self._intervals.items()
+        }
+        while not self._stop.is_set():
+            now = monotonic()
+            for name, at in due.items():
+                if at > now:
+                    continue
+                due[name] = now + self._intervals[name]
+                with self._lock:
+                    # a fetch still running skips this round
+                    if name in self._inflight:
+                        continue
+                    future = self._executor.submit(self.graph.nodes[name].fn)
+                    self._inflight[name] = future
+                future.add_done_callback(
+                    lambda future, name=name: self._fetched(name, future)
+                )
+            self._stop.wait(max(min(due.values(), default=now + 1) - monotonic(), 0))
+
+    def _fetched(self, name: str, future: Future) -> list[FairValue]:
+        with self._lock:
+            if self._inflight.get(name) is future:
+                del self._inflight[name]
+        error = future.exception()
+        if error is not None:
+            # the last good value stays current
+            self.errors[name] = error
+            print(f"Fetching {name} failed: {error!r}")
+            return []
+        try:
+            return self.publish(name, future.result())
+        except Exception:
+            print(f"Fair value update for {name} failed:\n{format_exc()}")
+            return []
+
+    def _recompute(self, source: str) -> list[FairValue]:
+        changed = {source}
+        updated = []
+        # nodes are added after their dependencies, so this is dependency order
+        for node in self.graph.nodes.values():
+            if not changed.intersection(node.deps):
+                continue
+            inputs = [self._values.get(dep) for dep in node.deps]
+            if any(fair_value is None for fair_value in inputs):
+                continue
+            try:
+                value = node.fn(*(fair_value.value for fair_value in inputs))
+            except Exception as error:
+                # its dependents keep their values as well
+                self.errors[node.name] = error
+                print(f"Fair value of {node.name} failed: {error!r}")
+                continue
+            self.errors.pop(node.name, None)
+            fair_value = FairValue(
+                node.name, value, max(fair_value.as_of for fair_value in inputs)
+            )
+            previous = self._values.get(node.name)
+            self._values[node.name] = fair_value
+            if previous is not None and _equal(previous.value, value):
+                continue
+            changed.add(node.name)
+            updated.append(fair_value)
+            self._notify(fair_value)
+        return updated
+
+    def _notify(self, fair_value: FairValue) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(fair_value)
+            except Exception:
+                print(f"Fair value subscriber failed:\n{format_exc()}")
+
+
+def _equal(a: Any, b: Any) -> bool:
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if hasattr(a, "equals"):
+        # pandas objects
+        return a.equals(b)
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        # e.g. arrays, whose == is elementwise
+        return False
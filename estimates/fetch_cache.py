@@ -0,0 +1,211 @@
+"""
+Shared HTTP fetch cache for the estimates scrapers.
+
+A settlement refresh asks for the same few pages many times over, so every
+fetch goes through one FetchCache:
+
+- responses are fresh for a per-source TTL and served without a request
+- stale responses are revalidated with If-None-Match / If-Modified-Since,
+  and a 304 (or an identical body) keeps the cached response
+- concurrent fetches of the same url share one request (single flight)
+- parsed results are cached alongside the response they were parsed from,
+  so they are rebuilt only when the page content changes
+
+Cached objects are shared between callers and must not be modified.
+"""
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Hashable, Mapping
+from urllib.parse import urlsplit
+
+import requests
+
+# hnd.bayern.de publishes a value every 15 minutes, timeanddate.com every 30
+DEFAULT_TTLS = {
+    "www.hnd.bayern.de": 300.0,
+    "www.timeanddate.com": 600.0,
+}
+
+
+@dataclass
+class _Entry:
+    response: requests.Response
+    fetched_at: float
+    parsed: dict[Hashable, Any] = field(default_factory=dict)
+    parse_lock: Lock = field(default_factory=Lock)
+
+
+class FetchCache:
+    """
+    TTL cache of successful GET responses with conditional revalidation and
+    single-flight deduplication.
+
+    `ttls` maps host names to seconds a response stays fresh; other hosts get
+    `default_ttl`. Only 200 responses are cached; anything else is returned
+    to the caller as is.
+    """
+
+    hits: int
+    fetches: int
+    revalidated: int
+    coalesced: int
+    parses: int
+
+    def __init__(
+        self,
+        ttls: Mapping[str, float] | None = None,
+        default_ttl: float = 60.0,
+        timeout: float = 10.0,
+        session: requests.Session | None = None,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.clock = clock
+
+        self.hits = 0
+        self.fetches = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.parses = 0
+
+        self._lock = Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._inflight: dict[str, Future] = {}
+
+    def ttl(self, url: str) -> float:
+        return self.ttls.get(urlsplit(url).hostname, self.default_ttl)
+
+    def get(
+        self,
+        url: str,
+        headers: Mapping[str, str] | None = None,
+        ttl: float | None = None,
+    ) -> requests.Response:
+        """
+        The response for `url`, from the cache while fresh. Raises
+        requests.RequestException when the request fails.
+        """
+        return self._entry(url, headers, ttl)[1]
+
+    def parsed(
+        self,
+        url: str,
+        parse: Callable[[requests.Response], Any],
+        headers: Mapping[str, str] | None = None,
+        ttl: float | None = None,
+    ) -> Any:
+        """
+        `parse(response)` for the response of `url`, computed once per
+        distinct page content. Non-200 responses are not parsed; their
+        requests.HTTPError is raised.
+        """
+        entry, response = self._entry(url, headers, ttl)
+        if entry is None:
+            response.raise_for_status()
+            # a non-error status that was still not cacheable, e.g. 204
+            return parse(response)
+        with entry.parse_lock:
+            try:
+                return entry.parsed[parse]
+            except KeyError:
+                self.parses += 1
+                result = entry.parsed[parse] = parse(response)
+                return result
+
+    def invalidate(self, url: str | None = None) -> None:
+        """
+        Drops the cached response for `url`, or every cached response
+        """
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "revalidated": self.revalidated,
+            "coalesced": self.coalesced,
+            "parses": self.parses,
+        }
+
+    def _entry(
+        self,
+        url: str,
+        headers: Mapping[str, str] | None,
+        ttl: float | None,
+    ) -> tuple[_Entry | None, requests.Response]:
+        ttl = self.ttl(url) if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and self.clock() - entry.fetched_at < ttl:
+                self.hits += 1
+                return entry, entry.response
+            future = self._inflight.get(url)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = self._inflight[url] = Future()
+                leader = True
+
+        if not leader:
+            return future.result()
+        try:
+            result = self._fetch(url, headers, entry)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[url]
+
+    def _fetch(
+        self,
+        url: str,
+        headers: Mapping[str, str] | None,
+        stale: _Entry | None,
+    ) -> tuple[_Entry | None, requests.Response]:
+        request_headers = dict(headers or {})
+        if stale is not None:
+            etag = stale.response.headers.get("ETag")
+            last_modified = stale.response.headers.get("Last-Modified")
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+
+        response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+        self.fetches += 1
+        now = self.clock()
+
+        if stale is not None and (
+            response.status_code == 304
+            or (
+                response.status_code == 200
+                and response.content == stale.response.content
+            )
+        ):
+            # unchanged, keep the old response and whatever was parsed from it
+            self.revalidated += 1
+            entry = _Entry(stale.response, now, stale.parsed, stale.parse_lock)
+        elif response.status_code == 200:
+            entry = _Entry(response, now)
+        else:
+            return None, response
+
+        with self._lock:
+            self._entries[url] = entry
+        return entry, entry.response
@@ -0,0 +1,310 @@
+"""
+HTML table extraction for the estimates scrapers.
+
+The scrapers only need the cell texts of table rows, so `table_rows` returns
+just those, from one of interchangeable backends:
+
+- "tokenizer": a single pass over the structural tags (table, sections,
+  rows, cells) with one regex, building no tree at all
+- "lxml": libxml2's HTML parser, if lxml is installed
+- "bs4": BeautifulSoup with html.parser, the reference the other backends
+  must match
+
+DEFAULT_BACKEND is "lxml" when it is available and "tokenizer" otherwise.
+Tables nested inside table cells are not supported, and neither are cells
+without end tags by the reference: html.parser nests each such cell in the
+previous one.
+"""
+
+import re
+from html import unescape
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+Rows = list[list[str]]
+
+BACKENDS: dict[str, Callable[..., Rows | None]] = {}
+DEFAULT_BACKEND = "lxml" if lxml else "tokenizer"
+
+
+def table_rows(
+    html: str | bytes,
+    table_class: str | None = None,
+    section: str | None = None,
+    cell_tags: tuple[str, ...] = ("td", "th"),
+    strip: bool = False,
+    backend: str | None = None,
+) -> Rows | None:
+    """
+    The cell texts of every row, in document order, of the first table with
+    `table_class` among its classes, or of every table if it is None. With
+    `section` ("thead", "tbody" or "tfoot") only the rows in the table's
+    first such section. Only cells with a tag in `cell_tags` are returned.
+
+    A cell's text is all the text inside it, like BeautifulSoup's `.text`,
+    or with `strip` every text fragment stripped and the empty ones dropped,
+    like `get_text(strip=True)`.
+
+    Returns None when the table or section is not in the document.
+    """
+    return BACKENDS[backend or DEFAULT_BACKEND](
+        html, table_class, section, cell_tags, strip
+    )
+
+
+def _backend(name: str):
+    def register(fn):
+        BACKENDS[name] = fn
+        return fn
+
+    return register
+
+
+# --- tokenizer --------------------------------------------------------------
+
+_ATTRIBUTES = r"((?:[^>\"']+|\"[^\"]*\"|'[^']*')*)"
+
+
+def _tag_pattern(*tags: str) -> re.Pattern:
+    # comments are matched so that tags inside them are not
+    return re.compile(
+        rf"<(?:!--.*?-->|(/?)({'|'.join(tags)})\b{_ATTRIBUTES}>)",
+        re.IGNORECASE | re.DOTALL,
+    )
+
+
+_RAW_TEXT = ("script", "style")
+_TABLE = _tag_pattern("table", *_RAW_TEXT)
+_SECTION = _tag_pattern("thead", "tbody", "tfoot", "table", *_RAW_TEXT)
+_STRUCTURE = _tag_pattern(
+    "table", "thead", "tbody", "tfoot", "tr", "td", "th", *_RAW_TEXT
+)
+_RAW_TEXT_END = {tag: re.compile(f"</{tag}", re.IGNORECASE) for tag in _RAW_TEXT}
+# any tag or comment inside a cell, splitting its text into fragments
+_MARKUP = re.compile(r"<!--.*?-->|<[^>]*>", re.DOTALL)
+_CLASS = re.compile(
+    r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""", re.IGNORECASE
+)
+_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([\w-]+)""", re.IGNORECASE)
+
+
+@_backend("tokenizer")
+def _tokenizer_rows(html, table_class, section, cell_tags, strip) -> Rows | None:
+    if isinstance(html, bytes):
+        html = _decode(html)
+    pos, end = 0, len(html)
+
+    if table_class is not None:
+        span = _find_table(html, table_class)
+        if span is None:
+            return None
+        pos, end = span
+    if section is not None:
+        span = _find_section(html, pos, end, section.lower())
+        if span is None:
+            return None
+        pos, end = span
+
+    # inside a table already if we looked one up
+    tables = 0 if table_class is None and section is None else 1
+    rows: Rows = []
+    row: list[str] | None = None
+    cell_start = -1
+
+    skip = pos
+    # _tags inlined, this loop runs several times per row
+    for match in _STRUCTURE.finditer(html, pos, end):
+        tag = match.group(2)
+        if tag is None or match.start() < skip:
+            continue
+        tag = tag.lower()
+        if tag in _RAW_TEXT:
+            if not match.group(1):
+                close = _RAW_TEXT_END[tag].search(html, match.end(), end)
+                skip = end if close is None else close.start()
+            continue
+
+        if cell_start >= 0:
+            # any other structural tag ends the open cell
+            row.append(_text(html[cell_start : match.start()], strip))
+            cell_start = -1
+
+        if tag == "td" or tag == "th":
+            if row is not None and tag in cell_tags and not match.group(1):
+                cell_start = match.end()
+        elif tag == "tr":
+            if row is not None:
+                rows.append(row)
+                row = None
+            if tables and not match.group(1):
+                row = []
+        else:
+            # table or section boundary
+            if row is not None:
+                rows.append(row)
+                row = None
+            if tag == "table":
+                tables = max(tables + (-1 if match.group(1) else 1), 0)
+
+    if cell_start >= 0:
+        row.append(_text(html[cell_start:end], strip))
+    if row is not None:
+        rows.append(row)
+    return rows
+
+
+def _tags(pattern: re.Pattern, html: str, pos: int, end: int):
+    """
+    The matches of a _tag_pattern within pos:end with their lowercase tag
+    names, leaving out comments, script and style elements and what is in
+    them
+    """
+    skip = pos
+    for match in pattern.finditer(html, pos, end):
+        tag = match.group(2)
+        if tag is None or match.start() < skip:
+            continue
+        tag = tag.lower()
+        if tag in _RAW_TEXT:
+            if not match.group(1):
+                close = _RAW_TEXT_END[tag].search(html, match.end(), end)
+                skip = end if close is None else close.start()
+            continue
+        yield match, tag
+
+
+def _find_table(html: str, table_class: str) -> tuple[int, int] | None:
+    """
+    Content span of the first table with `table_class`
+    """
+    start = None
+    depth = 0
+    for match, _ in _tags(_TABLE, html, 0, len(html)):
+        if start is None:
+            if not match.group(1) and table_class in _classes(match.group(3)):
+                start = match.end()
+                depth = 1
+            continue
+        depth += -1 if match.group(1) else 1
+        if not depth:
+            return start, match.start()
+    return None if start is None else (start, len(html))
+
+
+def _find_section(
+    html: str, pos: int, end: int, section: str
+) -> tuple[int, int] | None:
+    """
+    Content span of the first `section` element within pos:end
+    """
+    start = None
+    for match, tag in _tags(_SECTION, html, pos, end):
+        if start is None:
+            if tag == section and not match.group(1):
+                start = match.end()
+        else:
+            # its end tag, or the next section implying it
+            return start, match.start()
+    return None if start is None else (start, end)
+
+
+def _classes(attributes: str) -> list[str]:
+    match = _CLASS.search(attributes)
+    if match is None:
+        return []
+    return unescape(next(g for g in match.groups() if g is not None)).split()
+
+
+def _text(inner: str, strip: bool) -> str:
+    fragments = _MARKUP.split(inner) if "<" in inner else (inner,)
+    fragments = [unescape(f) if "&" in f else f for f in fragments]
+    if strip:
+        return "".join(s for f in fragments if (s := f.strip()))
+    return "".join(fragments)
+
+
+def _decode(content: bytes) -> str:
+    match = _CHARSET.search(content, 0, 4096)
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return content.decode(encoding)
+    except (LookupError, UnicodeDecodeError):
+        return content.decode("windows-1252", errors="replace")
+
+
+# --- lxml -------------------------------------------------------------------
+
+
+@_backend("lxml")
+def _lxml_rows(html, table_class, section, cell_tags, strip) -> Rows | None:
+    if lxml is None:
+        raise RuntimeError("The lxml backend needs lxml installed")
+    document = lxml.html.fromstring(html)
+    if table_class is None:
+        tables = document.iter("table")
+    else:
+        tables = document.xpath(
+            "(//table[contains(concat(' ', normalize-space(@class), ' '), $cls)])[1]",
+            cls=f" {table_class} ",
+        )
+        if not tables:
+            return None
+    rows: Rows = []
+    for table in tables:
+        parent = table
+        if section is not None:
+            parent = table.find(f".//{section}")
+            if parent is None:
+                return None
+        for row in parent.iter("tr"):
+            rows.append([_lxml_text(cell, strip) for cell in row.iter(*cell_tags)])
+    return rows
+
+
+def _lxml_text(cell, strip: bool) -> str:
+    fragments = [cell.text] if cell.text else []
+    for child in cell.iterdescendants():
+        # comments and processing instructions have a non-string tag
+        if isinstance(child.tag, str) and child.text:
+            fragments.append(child.text)
+        if child.tail:
+            fragments.append(child.tail)
+    if strip:
+        return "".join(s for f in fragments if (s := f.strip()))
+    return "".join(fragments)
+
+
+# --- BeautifulSoup ----------------------------------------------------------
+
+
+@_backend("bs4")
+def _bs4_rows(html, table_class, section, cell_tags, strip) -> Rows | None:
+    soup = BeautifulSoup(html, "html.parser")
+    if table_class is None:
+        tables = soup.find_all("table")
+    else:
+        table = soup.find("table", class_=table_class)
+        if table is None:
+            return None
+        tables = [table]
+    rows: Rows = []
+    for table in tables:
+        parent = table
+        if section is not None:
+            parent = table.find(section)
+            if parent is None:
+                return None
+        for row in parent.find_all("tr"):
+            rows.append(
+                [
+                    cell.get_text(strip=True) if strip else cell.text
+                    for cell in row.find_all(list(cell_tags))
+                ]
+            )
+    return rows
@@ -1,10 +1,55 @@
+"""
+Settlement formulas of the markets.
+
+Every formula has a `*_batch` version on NumPy arrays whose last axis is the
+settlement intervals and whose leading axes, if any, are scenarios: a
+(scenarios, intervals) batch gives one settlement per scenario, so thousands
+of what-if paths are a single call. Per-interval inputs of market 4 carry one
+more axis, (value, median, mean). The scalar functions wrap the batch ones and
+return plain Python numbers, except that markets 1 and 7, single expressions
+without intervals, still evaluate scalars on Python numbers: NumPy's per-call
+overhead would cost many times the formula.
+
+Sums over intervals accumulate in order, like the builtin sum, so a batch row
+settles exactly like the same values passed to the scalar function.
+"""
+
 import math
 from typing import List, Tuple
 
+import numpy as np
+
+
+def _array(values, dtype=None) -> np.ndarray:
+    # pandas' __array__ is several times slower than to_numpy
+    if hasattr(values, "to_numpy"):
+        return values.to_numpy(dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+
+def _ordered_sum(values: np.ndarray) -> np.ndarray:
+    # np.sum adds pairwise, cumsum strictly left to right like the builtin sum
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    return np.cumsum(values, axis=-1)[..., -1]
+
+
+def _check_intervals(a: np.ndarray, b: np.ndarray, message: str, axis: int = -1) -> None:
+    if a.shape[axis] != b.shape[axis]:
+        raise ValueError(message)
+
 
 # ---------------------------------------------------------
 # Eisbach 1
 # ---------------------------------------------------------
+def market_1_settlement_batch(flow_rate, water_level) -> np.ndarray:
+    """
+    round(flow_rate * water_level) per scenario, broadcasting the inputs
+    """
+    product = np.multiply(flow_rate, water_level, dtype=float)
+    return np.rint(product).astype(np.int64)
+
+
 def market_1_settlement(flow_rate: float, water_level: float) -> int:
     """
     Settlement = round(flow_rate * water_level)
@@ -15,20 +60,34 @@ def market_1_settlement(flow_rate: float, water_level: float) -> int:
 # ---------------------------------------------------------
 # Eisbach 2
 # ---------------------------------------------------------
+def market_2_settlement_batch(flow_rates, water_levels) -> np.ndarray:
+    """
+    round((max(wl) - max(fr)) * (min(wl) - min(fr))) per scenario
+    """
+    flow_rates = _array(flow_rates, dtype=float)
+    water_levels = _array(water_levels, dtype=float)
+    if flow_rates.shape[-1] == 0 or water_levels.shape[-1] == 0:
+        raise ValueError("Lists cannot be empty")
+
+    result = (water_levels.max(axis=-1) - flow_rates.max(axis=-1)) * (
+        water_levels.min(axis=-1) - flow_rates.min(axis=-1)
+    )
+    return np.rint(result).astype(np.int64)
+
+
 def market_2_settlement(flow_rates: List[float], water_levels: List[float]) -> int:
     """
     Settlement = max(wl) - max(fr)  *  min(wl) - min(fr), rounded
     """
-    if len(flow_rates)==0 or len(water_levels)==0:
-        raise ValueError("Lists cannot be empty")
+    return int(market_2_settlement_batch(flow_rates, water_levels))
 
-    max_wl = max(water_levels)
-    max_fr = max(flow_rates)
-    min_wl = min(water_levels)
-    min_fr = min(flow_rates)
 
-    result = (max_wl - max_fr) * (min_wl - min_fr)
-    return round(result)
+def market_2_call_value_batch(flow_rates, water_levels, strike: float = 5000) -> np.ndarray:
+    """
+    max(0, settlement - strike) per scenario
+    """
+    settlement = market_2_settlement_batch(flow_rates, water_levels)
+    return np.maximum(0.0, settlement - strike)
 
 
 def market_2_call_value(flow_rates: List[float],
@@ -37,31 +96,55 @@ def market_2_call_value(flow_rates: List[float],
     """
     Value = max(0, settlement - strike)
     """
-    settlement = market_2_settlement(flow_rates, water_levels)
-    return max(0.0, settlement - strike)
+    return float(market_2_call_value_batch(flow_rates, water_levels, strike))
 
 
 # ---------------------------------------------------------
 # Weather data 3
 # ---------------------------------------------------------
-def market_3_settlement(temps: List[float], humidities: List[float]) -> int:
+def market_3_settlement_batch(temps, humidities) -> np.ndarray:
     """
-    Settlement = |sum_over_intervals (temp*2 + humidity)|
+    |sum_over_intervals (temp*2 + humidity)| per scenario
     """
-    if len(temps) != len(humidities):
-        raise ValueError("Temperature and humidity list must match")
+    temps = _array(temps, dtype=float)
+    humidities = _array(humidities, dtype=float)
+    _check_intervals(temps, humidities, "Temperature and humidity list must match")
+
+    return np.abs(_ordered_sum(temps * 2 + humidities))
 
-    total = sum(t * 2 + h for t, h in zip(temps, humidities))
-    return abs(total)
+
+def market_3_settlement(temps: List[float], humidities: List[float]) -> float:
+    """
+    Settlement = |sum_over_intervals (temp*2 + humidity)|
+    """
+    return float(market_3_settlement_batch(temps, humidities))
 
 
 # ---------------------------------------------------------
 # Weather data 4
 # ---------------------------------------------------------
+def market_4_settlement_batch(temps, humidities) -> np.ndarray:
+    """
+    |round(sum((T+H) * (mean_t - median_t) * (mean_h - median_h)))| per
+    scenario, with temps and humidities of shape (..., intervals, 3) holding
+    (value, median, mean) per interval
+    """
+    temps = _array(temps, dtype=float)
+    humidities = _array(humidities, dtype=float)
+    _check_intervals(temps, humidities, "Temperature and humidity list must match", axis=-2)
+    if temps.shape[-2] == 0:
+        return np.zeros(temps.shape[:-2], dtype=np.int64)
+
+    T, medT, meanT = np.moveaxis(temps, -1, 0)
+    H, medH, meanH = np.moveaxis(humidities, -1, 0)
+    diff = (T + H) * (meanT - medT) * (meanH - medH)
+    return np.abs(np.rint(_ordered_sum(diff))).astype(np.int64)
+
+
 def market_4_settlement(
     temps: List[Tuple[float, float, float]],
     humidities: List[Tuple[float, float, float]]
-):
+) -> int:
     """
     Temps list contains tuples: (temp, median_temp, mean_temp)
     Humidities list contains tuples: (humidity, median_hum, mean_hum)
@@ -70,32 +153,28 @@ def market_4_settlement(
     sum( temp * (mean_t - median_t) * (mean_h - median_h) )
     Settlement = |result|
     """
-
-    if len(temps) != len(humidities):
-        raise ValueError("Temperature and humidity list must match")
-
-    total = 0
-    for (T, medT, meanT), (H, medH, meanH) in zip(temps, humidities):
-        diff = (T+H) * (meanT - medT) * (meanH - medH)
-        print(diff)
-        total += diff
-
-    return abs(round(total))
+    return int(market_4_settlement_batch(temps, humidities))
 
 
 # ---------------------------------------------------------
 # Airport 5
 # ---------------------------------------------------------
-def market_5_settlement(arrivals, departures) -> int:
+def market_5_settlement_batch(arrivals, departures) -> np.ndarray:
     """
-    Settlement = 3 * sum(arrivals + departures)
+    3 * sum(arrivals + departures) per scenario
     """
-    if len(arrivals) != len(departures):
-        raise ValueError("Arrivals and departures list must match")
+    arrivals = _array(arrivals)
+    departures = _array(departures)
+    _check_intervals(arrivals, departures, "Arrivals and departures list must match")
 
-    total = 3 * (arrivals.to_numpy().sum() + departures.to_numpy().sum())
+    return 3 * (arrivals.sum(axis=-1) + departures.sum(axis=-1))
 
-    return total
+
+def market_5_settlement(arrivals, departures) -> int:
+    """
+    Settlement = 3 * sum(arrivals + departures)
+    """
+    return market_5_settlement_batch(arrivals, departures).item()
 
 
 # ---------------------------------------------------------
@@ -114,23 +193,67 @@ def airport_metric(arrivals: int, departures: int) -> float:
     return metric
 
 
+def airport_metrics(arrivals, departures) -> np.ndarray:
+    """
+    airport_metric of every interval, 0 where there is no traffic
+    """
+    arrivals = _array(arrivals, dtype=float)
+    departures = _array(departures, dtype=float)
+    denom = arrivals + departures
+    empty = denom == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metric = 300 * (arrivals - departures) / np.where(empty, 1.0, denom) ** 1.5
+    return np.where(empty, 0.0, metric)
+
+
+def market_6_settlement_batch(arrivals, departures) -> np.ndarray:
+    """
+    |int(sum(interval_metrics))| per scenario
+    """
+    arrivals = _array(arrivals)
+    departures = _array(departures)
+    _check_intervals(arrivals, departures, "Arrivals and departures list must match")
+
+    total = _ordered_sum(airport_metrics(arrivals, departures))
+    return np.abs(np.trunc(total)).astype(np.int64)
+
+
 def market_6_settlement(arrivals, departures) -> int:
     """
     Settlement = | sum(interval_metrics) |, rounded down (int)
     """
-    if len(arrivals) != len(departures):
-        raise ValueError("Arrivals and departures list must match")
-
-    metrics = [
-        airport_metric(a, d)
-        for a, d in zip(arrivals, departures)
-    ]
-    return abs(int(sum(metrics)))
+    return int(market_6_settlement_batch(arrivals, departures))
 
 
 # ---------------------------------------------------------
 # ETF 7
 # ---------------------------------------------------------
+def _etf(flow_rate, water_level, temperature, humidity, airport_metric_sum):
+    # on Python numbers and arrays alike
+    return (
+        0.3 * flow_rate +
+        0.1 * water_level +
+        0.2 * temperature +
+        0.1 * humidity +
+        0.3 * airport_metric_sum
+    )
+
+
+def market_7_etf_settlement_batch(
+    flow_rate,
+    water_level,
+    temperature,
+    humidity,
+    airport_metric_sum
+) -> np.ndarray:
+    """
+    |0.3*flow + 0.1*water + 0.2*temp + 0.1*humidity + 0.3*airport_metric|
+    per scenario, broadcasting the inputs
+    """
+    inputs = (flow_rate, water_level, temperature, humidity, airport_metric_sum)
+    return np.abs(_etf(*(_array(x, dtype=float) for x in inputs)))
+
+
 def market_7_etf_settlement(
     flow_rate: float,
     water_level: float,
@@ -142,11 +265,6 @@ def market_7_etf_settlement(
     ETF = 0.3*flow + 0.1*water + 0.2*temp + 0.1*humidity + 0.3*airport_metric
     Settlement = absolute value
     """
-    etf = (
-        0.3 * flow_rate +
-        0.1 * water_level +
-        0.2 * temperature +
-        0.1 * humidity +
-        0.3 * airport_metric_sum
-    )
-    return abs(etf)
+    return abs(_etf(
+        flow_rate, water_level, temperature, humidity, airport_metric_sum
+    ))
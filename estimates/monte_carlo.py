@@ -0,0 +1,323 @@
+"""
+Monte Carlo settlement distributions.
+
+Forward paths for the rest of the settlement window are simulated for every
+input of the markets and pushed through the batch formulas of
+estimates.markets, one settlement per path and product. The summary per
+product (mean, stdev, percentiles) tells how uncertain a settlement still is,
+which is what spreads should be sized by.
+
+The models are deliberately simple:
+
+- Eisbach flow and level: hourly log random walks from the last observation,
+  drifting to the safety net's estimate at the end of the window
+- temperature and humidity: the forecast plus a forecast error growing like a
+  random walk from the current half-hour bin on
+- arrivals and departures: Poisson counts around the schedule for the bins
+  still to come
+
+Paths are simulated in chunks, each with its own child of one seed sequence,
+so a seeded run gives the same distributions whether its chunks run in
+process or on any number of worker processes. Workers are spawned, so the
+main module of a program running an engine must guard its entry point with
+`if __name__ == "__main__"`.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from itertools import repeat
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from estimates.markets import (
+    market_1_settlement_batch,
+    market_2_call_value_batch,
+    market_3_settlement_batch,
+    market_5_settlement_batch,
+    market_6_settlement_batch,
+    market_7_etf_settlement_batch,
+)
+
+PATHS = 100_000
+CHUNK_SIZE = 10_000
+# percentiles kept per distribution, quantiles in between are interpolated
+PERCENTILES = np.linspace(0, 100, 201)
+
+# forecast errors per square root of an hour, in °F and % relative humidity
+TEMPERATURE_ERROR = 0.6
+HUMIDITY_ERROR = 2.0
+# of log flow and log level per square root of an hour, without history
+RIVER_VOLATILITY = 0.01
+
+
+@dataclass(frozen=True, slots=True)
+class RiverModel:
+    """
+    A gauge's hourly path over the `steps` hours left in the window: a log
+    random walk from `last` whose median ends at `target`. `observed` are the
+    readings already in the window.
+    """
+
+    observed: np.ndarray
+    last: float
+    target: float
+    volatility: float
+    steps: int
+
+    def paths(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        if not self.steps:
+            return np.empty((n, 0))
+        drift = (np.log(self.target) - np.log(self.last)) / self.steps
+        steps = drift + self.volatility * rng.standard_normal((n, self.steps))
+        return self.last * np.exp(np.cumsum(steps, axis=1))
+
+    def end(self, paths: np.ndarray) -> np.ndarray:
+        if not self.steps:
+            return np.full(len(paths), self.last)
+        return paths[:, -1]
+
+    def window(self, paths: np.ndarray) -> np.ndarray:
+        """
+        Observed readings followed by each path
+        """
+        observed = np.broadcast_to(self.observed, (len(paths), len(self.observed)))
+        return np.concatenate([observed, paths], axis=1)
+
+
+@dataclass(frozen=True, slots=True)
+class WeatherModel:
+    """
+    Temperature and humidity of the half-hour bins of the window, the first
+    `elapsed` of them already measured
+    """
+
+    temperature: np.ndarray
+    humidity: np.ndarray
+    elapsed: int
+    temperature_error: float = TEMPERATURE_ERROR
+    humidity_error: float = HUMIDITY_ERROR
+
+    def paths(self, rng: np.random.Generator, n: int) -> tuple[np.ndarray, np.ndarray]:
+        ahead = len(self.temperature) - self.elapsed
+        # half-hour bins, errors are per square root of an hour
+        scale = np.sqrt(0.5)
+        temperature = np.tile(self.temperature, (n, 1))
+        humidity = np.tile(self.humidity, (n, 1))
+        if ahead > 0:
+            temperature[:, self.elapsed :] += np.cumsum(
+                rng.standard_normal((n, ahead)) * (self.temperature_error * scale),
+                axis=1,
+            )
+            humidity[:, self.elapsed :] += np.cumsum(
+                rng.standard_normal((n, ahead)) * (self.humidity_error * scale),
+                axis=1,
+            )
+            np.clip(humidity, 0, 100, out=humidity)
+        return temperature, humidity
+
+
+@dataclass(frozen=True, slots=True)
+class AirportModel:
+    """
+    Scheduled arrivals and departures of the half-hour bins of the window,
+    the first `elapsed` of them already flown
+    """
+
+    arrivals: np.ndarray
+    departures: np.ndarray
+    elapsed: int
+
+    def paths(self, rng: np.random.Generator, n: int) -> tuple[np.ndarray, np.ndarray]:
+        def counts(schedule: np.ndarray) -> np.ndarray:
+            counts = np.tile(schedule, (n, 1))
+            counts[:, self.elapsed :] = rng.poisson(
+                schedule[self.elapsed :], (n, len(schedule) - self.elapsed)
+            )
+            return counts
+
+        return counts(self.arrivals), counts(self.departures)
+
+
+@dataclass(frozen=True, slots=True)
+class SettlementModel:
+    """
+    Inputs of all markets; products whose inputs are missing are left out
+    """
+
+    flow: RiverModel
+    level: RiverModel
+    weather: WeatherModel | None = None
+    airport: AirportModel | None = None
+
+    def settlements(self, rng: np.random.Generator, n: int) -> dict[str, np.ndarray]:
+        """
+        One settlement per path and product for `n` paths
+        """
+        flow, level = self.flow.paths(rng, n), self.level.paths(rng, n)
+        flow_end, level_end = self.flow.end(flow), self.level.end(level)
+        settlements = {
+            "1_Eisbach": market_1_settlement_batch(flow_end, level_end),
+            "2_Eisbach_Call": market_2_call_value_batch(
+                self.flow.window(flow), self.level.window(level)
+            ),
+        }
+        if self.weather is not None:
+            temperature, humidity = self.weather.paths(rng, n)
+            settlements["3_Weather"] = market_3_settlement_batch(temperature, humidity)
+        if self.airport is not None:
+            arrivals, departures = self.airport.paths(rng, n)
+            settlements["5_Flights"] = market_5_settlement_batch(arrivals, departures)
+            settlements["6_Airport"] = market_6_settlement_batch(arrivals, departures)
+        if self.weather is not None and self.airport is not None:
+            settlements["7_ETF"] = market_7_etf_settlement_batch(
+                flow_end,
+                level_end,
+                temperature[:, -1],
+                humidity[:, -1],
+                settlements["6_Airport"],
+            )
+        return settlements
+
+
+@dataclass(frozen=True, slots=True)
+class SettlementDistribution:
+    """
+    Summary of the simulated settlements of one product
+    """
+
+    mean: float
+    stdev: float
+    percentiles: np.ndarray
+    paths: int
+
+    @classmethod
+    def of(cls, settlements: np.ndarray) -> "SettlementDistribution":
+        return cls(
+            mean=float(settlements.mean()),
+            stdev=float(settlements.std()),
+            percentiles=np.percentile(settlements, PERCENTILES),
+            paths=len(settlements),
+        )
+
+    def quantile(self, q: float) -> float:
+        return float(np.interp(q * 100, PERCENTILES, self.percentiles))
+
+    def interval(self, coverage: float) -> tuple[float, float]:
+        """
+        The central interval holding `coverage` of the settlements
+        """
+        tail = (1 - coverage) / 2
+        return self.quantile(tail), self.quantile(1 - tail)
+
+    def __str__(self) -> str:
+        quantiles = " ".join(
+            f"q{q * 100:g}={self.quantile(q):,.0f}"
+            for q in (0.05, 0.25, 0.5, 0.75, 0.95)
+        )
+        return f"mean={self.mean:,.1f} stdev={self.stdev:,.1f} {quantiles}"
+
+
+def hourly_volatility(
+    series: pd.Series, hours: int = 48, default: float = RIVER_VOLATILITY
+) -> float:
+    """
+    Standard deviation of the hourly changes of log `series` over its last
+    `hours`, from hourly means so that reading noise does not add up
+    """
+    if not isinstance(series.index, pd.DatetimeIndex) or len(series) < 2:
+        return default
+    recent = series[series.index > series.index[-1] - pd.Timedelta(hours=hours)]
+    hourly = recent.resample("1h").mean().dropna()
+    if len(hourly) < 3 or (hourly <= 0).any():
+        return default
+    return float(np.diff(np.log(hourly.to_numpy(dtype=float))).std(ddof=1))
+
+
+def _simulate_chunk(
+    model: SettlementModel, seed: np.random.SeedSequence, n: int
+) -> dict[str, np.ndarray]:
+    return model.settlements(np.random.default_rng(seed), n)
+
+
+def simulate(
+    model: SettlementModel,
+    paths: int = PATHS,
+    seed: int | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    executor: Executor | None = None,
+) -> dict[str, SettlementDistribution]:
+    """
+    Settlement distributions of `paths` paths per product, simulated in
+    chunks of `chunk_size` on `executor`, or in this process without one
+    """
+    if paths < 1:
+        raise ValueError("Simulate at least one path")
+    sizes = [chunk_size] * (paths // chunk_size)
+    if paths % chunk_size:
+        sizes.append(paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if executor is None or len(sizes) == 1:
+        chunks = list(map(_simulate_chunk, repeat(model), seeds, sizes))
+    else:
+        chunks = list(executor.map(_simulate_chunk, repeat(model), seeds, sizes))
+    return {
+        product: SettlementDistribution.of(
+            np.concatenate([chunk[product] for chunk in chunks])
+        )
+        for product in chunks[0]
+    }
+
+
+class MonteCarloEngine:
+    """
+    Runs simulations on a pool of worker processes, started on first use and
+    kept until `close`
+    """
+
+    workers: int
+    chunk_size: int
+
+    def __init__(self, workers: int | None = None, chunk_size: int = CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._lock = Lock()
+        self._pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "MonteCarloEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def run(
+        self, model: SettlementModel, paths: int = PATHS, seed: int | None = None
+    ) -> dict[str, SettlementDistribution]:
+        executor = self._executor() if self.workers > 1 else None
+        try:
+            return simulate(model, paths, seed, self.chunk_size, executor)
+        except BrokenProcessPool:
+            # a worker died, the next run starts a fresh pool
+            with self._lock:
+                if self._pool is executor:
+                    self._pool = None
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
@@ -1,31 +1,65 @@
+import re
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 from matplotlib import pyplot as plt
 
 from constants import *
+from estimates.fetch_cache import FetchCache
+from estimates.html_tables import table_rows
+from estimates.timeseries import TimeSeriesStore
+
+# shared by every scraper, so a settlement refresh fetches each page once
+FETCH_CACHE = FetchCache()
+
+# every scrape appends its new rows here, history grows across days
+STORE = TimeSeriesStore(TIMESERIES_DIRECTORY)
+SERIES_COLUMNS = {
+    "waterflow": ("value",),
+    "waterlevel": ("value",),
+    "weather": ("temp", "humidity"),
+}
+
+# Header setzen, um wie ein Browser zu wirken und nicht geblockt zu werden
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+WATERFLOW_URL = "https://www.hnd.bayern.de/pegel/isar/muenchen-himmelreichbruecke-16515005/tabelle?methode=abfluss&"
+WATERLEVEL_URL = "https://www.hnd.bayern.de/pegel/isar/muenchen-himmelreichbruecke-16515005/tabelle"
+WEATHER_URL = "https://www.timeanddate.com/weather/germany/munich/historic"
 
 
 def get_waterflow():
-    url = "https://www.hnd.bayern.de/pegel/isar/muenchen-himmelreichbruecke-16515005/tabelle?methode=abfluss&"
-    df = scrape_waterflow(url)
+    df = scrape_waterflow(WATERFLOW_URL)
     return df["data"]
 
 def get_waterlevel():
-    url = "https://www.hnd.bayern.de/pegel/isar/muenchen-himmelreichbruecke-16515005/tabelle"
-    df = scrape_waterlevel(url)
+    df = scrape_waterlevel(WATERLEVEL_URL)
     return df["data"]
 
 def get_temperature():
-    url = "https://www.timeanddate.com/weather/germany/munich/historic"
-    df = scrape_weather_df(url)
+    df = scrape_weather_df(WEATHER_URL)
     return df["temp"]
 
 def get_humidity():
-    url = "https://www.timeanddate.com/weather/germany/munich/historic"
-    df = scrape_weather_df(url)
+    df = scrape_weather_df(WEATHER_URL)
     return df["humidity"]
+
+
+def get_history(source: str, duration=None):
+    """
+    Stored timestamps and column arrays of `source` ("waterflow",
+    "waterlevel" or "weather"), the last `duration` (e.g. "24h") or all of
+    it. The arrays are read-only views of the store, nothing is copied.
+    """
+    series = STORE.series(source, SERIES_COLUMNS[source])
+    if duration is None:
+        return series.range()
+    return series.last(duration)
+
 def get_arrivals():
     return 0
 
@@ -35,67 +69,73 @@ def get_departures():
 def scrape_weather_df(url: str) -> pd.DataFrame:
     """
     Scrapes a timeanddate.com weather table and returns a pandas DataFrame
-    with columns: ["time", "temp", "humidity"].
+    with columns: ["time", "temp", "humidity", "timestamp"].
     """
+    df = FETCH_CACHE.parsed(url, parse_weather_df)
+    if df is not None:
+        STORE.series("weather", SERIES_COLUMNS["weather"]).append(
+            df["timestamp"], temp=df["temp"], humidity=df["humidity"]
+        )
+    return df
 
-    response = requests.get(url, timeout=10)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    tables = soup.find_all("table")
-
+def parse_weather_df(
+    response: requests.Response, backend=None, now: datetime | None = None
+) -> pd.DataFrame:
+    """
+    Parses a fetched timeanddate.com weather page, see scrape_weather_df.
+    `backend` is an estimates.html_tables backend, the default one if None.
+    `now` dates the page, by default the time it was served (see served_at),
+    so a parse cached with the response stays right as the response ages.
+    """
     records = []
 
-    for table in tables:
-        rows = table.find_all("tr")
-
-        for row in rows:
-            cols = [c.get_text(strip=True) for c in row.find_all(["td", "th"])]
-
-            if len(cols) < 4:
-                continue
-
-            # --- extract time ---
-            time = None
-            for c in cols:
-                # detect hh:mm pattern
-                if ":" in c and len(c.split(":")) == 2:
-                    time = c
+    # Zeilen aller Tabellen
+    for cols in table_rows(response.text, strip=True, backend=backend):
+        if len(cols) < 4:
+            continue
+
+        # --- extract time ---
+        time = None
+        for c in cols:
+            # a time label weather_timestamps can read, other rows are skipped
+            if _weather_label(c) is not None:
+                time = c
+                break
+
+        if not time:
+            continue
+
+        # --- extract temperature ---
+        temp = None
+        for c in cols:
+            if "°" in c:
+                num = c.split("°")[0].strip()
+                try:
+                    temp = float(num)
                     break
+                except:
+                    pass
+
+        # --- extract humidity ---
+        humidity = None
+        for c in cols:
+            if c.endswith("%"):
+                try:
+                    humidity = float(c.replace("%", ""))
+                    break
+                except:
+                    pass
 
-            if not time:
-                continue
-
-            # --- extract temperature ---
-            temp = None
-            for c in cols:
-                if "°" in c:
-                    num = c.split("°")[0].strip()
-                    try:
-                        temp = float(num)
-                        break
-                    except:
-                        pass
-
-            # --- extract humidity ---
-            humidity = None
-            for c in cols:
-                if c.endswith("%"):
-                    try:
-                        humidity = float(c.replace("%", ""))
-                        break
-                    except:
-                        pass
-
-            if temp is not None and humidity is not None:
-                records.append((time, temp, humidity))
+        if temp is not None and humidity is not None:
+            records.append((time, temp, humidity))
 
     # convert to DataFrame
     df = pd.DataFrame(records, columns=["time", "temp", "humidity"])
     # celsius to fahrenheit
     df["temp"] = df["temp"] * 1.8 + 32
-    # save it for later
-    df.to_csv(WEATHER_DATA_NAME)
+    # the labels only carry a date on the first row of each day, so the
+    # timestamps have to be worked out in page order
+    df["timestamp"] = weather_timestamps(df["time"], now or served_at(response))
     if not df.empty:
         df.set_index("time", inplace=True)
         df.sort_index(inplace=True)  # Chronologisch sortieren
@@ -104,150 +144,169 @@ def scrape_weather_df(url: str) -> pd.DataFrame:
         # print(df.head())
         # print("\nInfo:")
         # print(df.info())
-        df.to_csv(WATERFLOW_DATA_NAME)
 
         return df
     else:
         print("Keine Daten gefunden oder Tabelle leer.")
         return None
 
-def scrape_waterflow(url):
-    # Header setzen, um wie ein Browser zu wirken
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+def served_at(response: requests.Response) -> datetime:
+    """
+    Local time the response was served at, from its Date header, or now if
+    it has none
+    """
+    try:
+        served = parsedate_to_datetime(response.headers["Date"])
+    except (KeyError, TypeError, ValueError):
+        return datetime.now()
+    return served.astimezone().replace(tzinfo=None)
 
+def weather_timestamps(labels, now: datetime) -> list[datetime]:
+    """
+    Timestamps for timeanddate.com time labels in page order. A label is the
+    time, followed by the date on the first row of each day
+    ("12:20 amSat, 22 Nov", then "12:50 am"). Dates take the year of `now`,
+    or the year before if that would put them in the future. Raises a
+    ValueError for anything else.
+    """
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    timestamps = []
+    for label in labels:
+        parsed = _weather_label(label)
+        if parsed is None:
+            raise ValueError(f"Not a timeanddate.com time label: {label!r}")
+        clock, date = parsed
+        if date is not None:
+            day = datetime(now.year, *date)
+            if day > now + timedelta(days=1):
+                day = day.replace(year=now.year - 1)
+        timestamps.append(day.replace(hour=clock.hour, minute=clock.minute))
+    return timestamps
+
+_WEATHER_LABEL = re.compile(
+    r"\s*(\d{1,2}:\d{2})\s*([ap]m)?\s*(.*?)\s*", re.IGNORECASE | re.DOTALL
+)
+
+def _weather_label(label: str):
+    """
+    (time of day, (month, day) or None) of a time label, None if it is not one
+    """
+    match = _WEATHER_LABEL.fullmatch(label)
+    if match is None:
+        return None
+    clock, meridiem, date = match.groups()
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Wirft Fehler bei 404 oder 500 Codes
+        if meridiem:
+            clock = datetime.strptime(f"{clock} {meridiem}", "%I:%M %p")
+        else:
+            clock = datetime.strptime(clock, "%H:%M")
+        # in a leap year, so 29 Feb parses too
+        date = datetime.strptime(f"{date} 2000", "%a, %d %b %Y") if date else None
+    except ValueError:
+        return None
+    return clock.time(), date and (date.month, date.day)
+
+def scrape_waterflow(url):
+    try:
+        # Wirft Fehler bei 404 oder 500 Codes
+        df = FETCH_CACHE.parsed(url, parse_waterflow, headers=HEADERS)
     except requests.exceptions.RequestException as e:
         print(f"Fehler beim Abrufen der URL: {e}")
         return None
+    if df is not None:
+        STORE.series("waterflow").append(df.index, value=df["data"])
+    return df
 
-    soup = BeautifulSoup(response.content, 'html.parser')
-
-    # Wir suchen nach der Tabelle, die 'tblsort' in den Klassen hat
-    # BeautifulSoup findet dies auch, wenn 'tablesorter' etc. dabei steht.
-    table = soup.find("table", class_="tblsort")
-
-    data = []
-
-    if table:
-        # Suche im Body der Tabelle, um Header zu überspringen
-        tbody = table.find("tbody")
-        if tbody:
-            rows = tbody.find_all("tr")
-
-            for row in rows:
-                cols = row.find_all("td")
-
-                # Prüfen ob Zeile Daten enthält (mind. 2 Spalten)
-                if len(cols) >= 2:
-                    try:
-                        # Spalte 1: Datum (z.B. "22.11.2025 03:00")
-                        raw_timestamp = cols[0].text.strip()
-
-                        # Spalte 2: Wert (z.B. "25,8")
-                        raw_value = cols[1].text.strip()
-
-                        # WICHTIG: Deutsches Komma durch Punkt ersetzen für Python float
-                        clean_value = raw_value.replace(',', '.')
-
-                        # Umwandlung
-                        dt_obj = datetime.strptime(raw_timestamp, "%d.%m.%Y %H:%M")
-
-                        # Float statt Int, da Dezimalstellen vorhanden sind
-                        val_float = float(clean_value)
-
-                        data.append({"timestamp": dt_obj, "data": val_float})
-                    except ValueError as e:
-                        # Falls Parsing fehlschlägt (z.B. leerer String), überspringen wir die Zeile
-                        # print(f"Parsing Fehler in Zeile: {e}")
-                        continue
-
-    # DataFrame erstellen
-    df = pd.DataFrame(data)
-
-    if not df.empty:
-        df.set_index("timestamp", inplace=True)
-        df.sort_index(inplace=True)  # Chronologisch sortieren
-
-        # print("Daten erfolgreich geladen:")
-        # print(df.head())
-        # print("\nInfo:")
-        # print(df.info())
-        df.to_csv(WATERFLOW_DATA_NAME)
-
+def parse_waterflow(response, backend=None):
+    """
+    Parses a fetched hnd.bayern.de flow table, values in m³/s
+    """
+    # Tabelle mit 'tblsort' in den Klassen, ohne Header
+    rows = table_rows(
+        response.content, "tblsort", "tbody", cell_tags=("td",), backend=backend
+    )
+    # Float statt Int, da Dezimalstellen vorhanden sind
+    df = _table_frame(rows, float, decimal_comma=True)
+
+    if df is not None:
         return df
     else:
         print("Keine Daten gefunden oder Tabelle leer.")
         return None
 
 def scrape_waterlevel(url):
-    # Header setzen, um nicht geblockt zu werden
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Wir suchen die Tabelle mit der Klasse "tblsort", wie in deinem HTML gesehen
-        table = soup.find("table", class_="tblsort")
-
-        data = []
-
-        if table:
-            # Wir suchen direkt im tbody nach Zeilen
-            tbody = table.find("tbody")
-            rows = tbody.find_all("tr")
-
-            for row in rows:
-                cols = row.find_all("td")
-
-                # Dein HTML zeigt genau 2 Spalten pro Zeile
-                if len(cols) >= 2:
-                    try:
-                        # Spalte 1: Datum und Zeit kombiniert
-                        raw_timestamp = cols[0].text.strip()
-
-                        # Spalte 2: Wert
-                        raw_value = cols[1].text.strip()
-
-                        # Umwandlung in Python-Objekte
-                        dt_obj = datetime.strptime(raw_timestamp, "%d.%m.%Y %H:%M")
-                        val_int = int(raw_value)
-
-                        data.append({"timestamp": dt_obj, "data": val_int})
-                    except ValueError:
-                        continue
+    try:
+        df = FETCH_CACHE.parsed(url, parse_waterlevel, headers=HEADERS)
+    except requests.exceptions.HTTPError:
+        print("Seite konnte nicht abgerufen werden.")
+        return None
+    if df is not None:
+        STORE.series("waterlevel").append(df.index, value=df["data"])
+    return df
 
-        # DataFrame erstellen
-        df = pd.DataFrame(data)
+def parse_waterlevel(response, backend=None):
+    """
+    Parses a fetched hnd.bayern.de water level table, values in cm
+    """
+    rows = table_rows(
+        response.content, "tblsort", "tbody", cell_tags=("td",), backend=backend
+    )
+    df = _table_frame(rows, int)
 
-        if not df.empty:
-            df.set_index("timestamp", inplace=True)
-            df.sort_index(inplace=True)  # Sicherstellen, dass die Zeitreihe chronologisch ist
+    if df is not None:
+        return df
+    else:
+        print("Keine Daten gefunden.")
+        return None
 
-            # print("Daten erfolgreich geladen:")
-            # print(df.head())
-            # print(df.info())
-            # plt.plot(df)
-            df.to_csv(WATERLEVEL_DATA_NAME)
+def _table_frame(rows, dtype, decimal_comma=False):
+    """
+    Rows of ("%d.%m.%Y %H:%M" timestamp, `dtype` value) cells as a DataFrame
+    indexed by timestamp in chronological order, None if there are none.
+    Rows that do not parse are skipped.
+    """
+    # Prüfen ob Zeile Daten enthält (mind. 2 Spalten)
+    rows = [row for row in rows or () if len(row) >= 2]
+    raw_timestamps = [row[0].strip() for row in rows]
+    raw_values = [row[1].strip() for row in rows]
+    if decimal_comma:
+        # WICHTIG: Deutsches Komma durch Punkt ersetzen für Python float
+        raw_values = [value.replace(",", ".") for value in raw_values]
 
-        else:
-            print("Keine Daten gefunden.")
-            return None
+    try:
+        # the whole table at once, as long as every row is well-formed
+        timestamps = _hnd_timestamps(raw_timestamps).astype("datetime64[us]")
+        values = np.array(raw_values, dtype=dtype)
+    except ValueError:
+        timestamps, values = [], []
+        for raw_timestamp, raw_value in zip(raw_timestamps, raw_values):
+            try:
+                timestamp = datetime.strptime(raw_timestamp, "%d.%m.%Y %H:%M")
+                value = dtype(raw_value)
+            except ValueError:
+                # Falls Parsing fehlschlägt (z.B. leerer String), überspringen wir die Zeile
+                continue
+            timestamps.append(timestamp)
+            values.append(value)
 
-    else:
-        print("Seite konnte nicht abgerufen werden.")
+    if not len(values):
         return None
-
-    # naive prediction
+    df = pd.DataFrame({"timestamp": timestamps, "data": values})
+    df.set_index("timestamp", inplace=True)
+    df.sort_index(inplace=True)  # Chronologisch sortieren
     return df
 
+def _hnd_timestamps(raw_timestamps):
+    # "22.11.2025 03:00" -> "2025-11-22T03:00", which numpy parses in bulk
+    iso = [
+        f"{t[6:10]}-{t[3:5]}-{t[:2]}T{t[11:]}"
+        for t in raw_timestamps
+        if len(t) == 16 and t[2] == t[5] == "." and t[10] == " " and t[13] == ":"
+    ]
+    if len(iso) != len(raw_timestamps):
+        raise ValueError("Not every timestamp is DD.MM.YYYY HH:MM")
+    return np.array(iso, dtype="datetime64[m]")
+
 
 
 
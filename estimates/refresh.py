@@ -0,0 +1,222 @@
+"""
+Settlement refresh as a dependency graph.
+
+Data sources are fetched, derived inputs computed and market settlements
+predicted as nodes of one graph. Every node runs on a thread pool as soon as
+the nodes it depends on have finished, so independent fetches overlap and a
+refresh takes about as long as its slowest chain instead of the sum of all
+nodes. Each node runs once per refresh and its result is passed to every
+node that depends on it.
+
+A node that raises fails the nodes depending on it; everything else still
+completes.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Iterable
+
+from estimates import safety_net, weather_forecast
+from estimates.monte_carlo import PATHS, MonteCarloEngine
+
+
+@dataclass(frozen=True, slots=True)
+class Node:
+    name: str
+    fn: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class NodeTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class RefreshResult:
+    """
+    Node results by name, the errors of nodes that failed or could not run,
+    and node timings in seconds relative to the start of the refresh
+    """
+
+    values: dict[str, Any] = field(default_factory=dict)
+    errors: dict[str, BaseException] = field(default_factory=dict)
+    timings: dict[str, NodeTiming] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def report(self) -> str:
+        """
+        Per-node start, end and duration as a table, in milliseconds
+        """
+        lines = [f"{'node':<16} {'start':>9} {'end':>9} {'took':>9}"]
+        for name, timing in sorted(self.timings.items(), key=lambda x: x[1].start):
+            status = (
+                f" {type(self.errors[name]).__name__}" if name in self.errors else ""
+            )
+            lines.append(
+                f"{name:<16} {timing.start * 1e3:>9.1f} {timing.end * 1e3:>9.1f}"
+                f" {timing.duration * 1e3:>9.1f}{status}"
+            )
+        for name, error in self.errors.items():
+            if name not in self.timings:
+                lines.append(f"{name:<16} skipped: {error}")
+        lines.append(f"{'total':<16} {'':>9} {self.elapsed * 1e3:>9.1f}")
+        return "\n".join(lines)
+
+
+class DependencyError(Exception):
+    """
+    A node was not run because a node it depends on failed
+    """
+
+
+class RefreshGraph:
+    """
+    Nodes called with the results of their dependencies as positional
+    arguments, in the order the dependencies are listed
+    """
+
+    nodes: dict[str, Node]
+
+    def __init__(self, nodes: Iterable[Node] = ()):
+        self.nodes = {}
+        for node in nodes:
+            self.add(node.name, node.fn, node.deps)
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()) -> None:
+        deps = tuple(deps)
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            # requiring dependencies first also rules out cycles
+            raise ValueError(f"{name} depends on unknown nodes {missing}")
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node {name}")
+        self.nodes[name] = Node(name, fn, deps)
+
+    def run(self, max_workers: int | None = None) -> RefreshResult:
+        result = RefreshResult()
+        dependents: dict[str, list[str]] = {name: [] for name in self.nodes}
+        waiting: dict[str, int] = {}
+        for node in self.nodes.values():
+            waiting[node.name] = len(node.deps)
+            for dep in node.deps:
+                dependents[dep].append(node.name)
+
+        start = perf_counter()
+
+        def call(node: Node) -> Any:
+            started = perf_counter()
+            try:
+                return node.fn(*(result.values[dep] for dep in node.deps))
+            finally:
+                result.timings[node.name] = NodeTiming(
+                    started - start, perf_counter() - start
+                )
+
+        def fail(name: str, error: BaseException) -> None:
+            result.errors[name] = error
+            for dependent in dependents[name]:
+                if dependent not in result.errors:
+                    fail(dependent, DependencyError(f"{name} failed"))
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or len(self.nodes) or 1,
+            thread_name_prefix="SettlementRefresh",
+        ) as executor:
+            running: dict[Future, str] = {
+                executor.submit(call, node): node.name
+                for node in self.nodes.values()
+                if not node.deps
+            }
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        fail(name, error)
+                        continue
+                    result.values[name] = future.result()
+                    for dependent in dependents[name]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0 and dependent not in result.errors:
+                            node = self.nodes[dependent]
+                            running[executor.submit(call, node)] = dependent
+
+        result.elapsed = perf_counter() - start
+        return result
+
+
+def settlement_graph(
+    engine: MonteCarloEngine | None = None, paths: int = PATHS
+) -> RefreshGraph:
+    """
+    The graph behind the bot's expected settlements, one market node per
+    product: sources first, then derived inputs, then the markets. With an
+    `engine` also a DISTRIBUTIONS node, the settlement distributions of
+    `paths` simulated paths per product.
+    """
+    graph = RefreshGraph()
+    # sources
+    graph.add("waterflow", safety_net.get_waterflow)
+    graph.add("waterlevel", safety_net.get_waterlevel)
+    graph.add("weather", weather_forecast.get_raw_data)
+    graph.add("arrivals", safety_net.predict_arrivals)
+    graph.add("departures", safety_net.predict_departures)
+    # derived
+    graph.add("hours", safety_net.elapsed_hours)
+    # markets
+    graph.add(
+        "1_Eisbach", safety_net.predict_market_1, ("waterflow", "waterlevel", "hours")
+    )
+    graph.add(
+        "2_Eisbach_Call",
+        safety_net.predict_market_2,
+        ("waterflow", "waterlevel", "hours"),
+    )
+    graph.add("3_Weather", weather_forecast.get_3_weather_prediction, ("weather",))
+    graph.add("5_Flights", safety_net.predict_market_5, ("arrivals", "departures"))
+    graph.add("6_Airport", safety_net.predict_market_6, ("arrivals", "departures"))
+    graph.add(
+        "7_ETF",
+        safety_net.predict_market_7,
+        ("waterflow", "waterlevel", "weather", "6_Airport", "hours"),
+    )
+    if engine is not None:
+        graph.add(
+            "model",
+            safety_net.settlement_model,
+            ("waterflow", "waterlevel", "weather", "arrivals", "departures", "hours"),
+        )
+        graph.add(DISTRIBUTIONS, lambda model: engine.run(model, paths), ("model",))
+    return graph
+
+
+DISTRIBUTIONS = "distributions"
+
+# seconds between polls of the graph's sources by a FairValueService: the
+# gauges publish every 15 minutes behind a 5 minute fetch cache, the forecast
+# is cached for an hour and the schedule is a file
+SOURCE_INTERVALS = {
+    "waterflow": 60,
+    "waterlevel": 60,
+    "weather": 300,
+    "arrivals": 3600,
+    "departures": 3600,
+    "hours": 30,
+}
+
+SETTLEMENT_PRODUCTS = (
+    "1_Eisbach",
+    "2_Eisbach_Call",
+    "3_Weather",
+    "5_Flights",
+    "6_Airport",
+    "7_ETF",
+)
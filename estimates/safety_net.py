@@ -2,13 +2,29 @@ import pandas as pd
 from typing import List
 import numpy as np
 from datetime import datetime, time
+from threading import Lock
 
 from estimates.markets import *
+from estimates.monte_carlo import (
+    AirportModel,
+    RiverModel,
+    SettlementModel,
+    WeatherModel,
+    hourly_volatility,
+    simulate,
+)
 from estimates.predictions import *
 from estimates.weather_forecast import get_raw_data
 
 PRIOR_FLOW = 23
 PRIOR_LEVEL = 138
+# paths behind the expected payoff of the Eisbach call
+CALL_PATHS = 20_000
+# (waterflow, waterlevel, stunden, payoff) of the last simulated call value,
+# while the gauges are unchanged it is not simulated again. The bot and the
+# refresh threads both ask for it, the lock makes them share one simulation.
+_call_value = None
+_call_value_lock = Lock()
 
 # --------------------------------------------------------------------
 # Helper: load CSV and get full column (used for markets needing lists)
@@ -22,9 +38,9 @@ def load_series(csv_path: str) -> List[float]:
 
 
 # --------------------------------------------------------------------
-# Market 1 – Eisbach flow * water level
+# Hours since 10:00 today, how far the settlement window has progressed
 # --------------------------------------------------------------------
-def predict_market_1() -> int:
+def elapsed_hours() -> int:
     # Zeitpunkt heute um 10:00 Uhr
     heute_zehn = datetime.combine(datetime.today(), time(10, 0))
 
@@ -33,10 +49,24 @@ def predict_market_1() -> int:
 
     # vergangene Stunden (abgerundet)
     stunden = int((jetzt - heute_zehn).total_seconds() // 3600)
+    return stunden
+
 
-    weighted_flow = (1 - (stunden/24)) * PRIOR_FLOW + (stunden/24)*get_waterflow().iloc[-1]
+# The predictions below fetch whatever input is not passed in, a refresh
+# passes inputs fetched once for all markets (see estimates.refresh)
 
-    weighted_level = (1 - (stunden / 24)) * PRIOR_LEVEL + (stunden / 24) * get_waterlevel().iloc[-1]
+
+# --------------------------------------------------------------------
+# Market 1 – Eisbach flow * water level
+# --------------------------------------------------------------------
+def predict_market_1(waterflow=None, waterlevel=None, stunden=None) -> int:
+    waterflow = get_waterflow() if waterflow is None else waterflow
+    waterlevel = get_waterlevel() if waterlevel is None else waterlevel
+    stunden = elapsed_hours() if stunden is None else stunden
+
+    weighted_flow = (1 - (stunden/24)) * PRIOR_FLOW + (stunden/24)*waterflow.iloc[-1]
+
+    weighted_level = (1 - (stunden / 24)) * PRIOR_LEVEL + (stunden / 24) * waterlevel.iloc[-1]
 
     return market_1_settlement(
         flow_rate=weighted_flow,
@@ -47,28 +77,36 @@ def predict_market_1() -> int:
 # --------------------------------------------------------------------
 # Market 2 – Eisbach extrema option
 # --------------------------------------------------------------------
-def predict_market_2() -> float:
-
-    # Zeitpunkt heute um 10:00 Uhr
-    heute_zehn = datetime.combine(datetime.today(), time(10, 0))
-
-    # aktueller Zeitpunkt
-    jetzt = datetime.now()
-
-    # vergangene Stunden (abgerundet)
-    stunden = int((jetzt - heute_zehn).total_seconds() // 3600)
-
-    # --- Daten laden ---
-    wl_actual = get_waterlevel().tail(24-stunden)
-    wf_actual = get_waterflow().tail(24-stunden)
-
-    wl = list(wl_actual)
-    wl += [wl[-1]] * (24 - len(wl))
-
-    wf = list(wf_actual)
-    wf += [wf[-1]] * (24 - len(wf))
-
-    return market_2_call_value(water_levels=wl, flow_rates=wf, strike=5000)
+def predict_market_2(waterflow=None, waterlevel=None, stunden=None) -> float:
+    waterflow = get_waterflow() if waterflow is None else waterflow
+    waterlevel = get_waterlevel() if waterlevel is None else waterlevel
+    stunden = elapsed_hours() if stunden is None else stunden
+
+    global _call_value
+    with _call_value_lock:
+        cached = _call_value
+        if (
+            cached is not None
+            and _same_series(cached[0], waterflow)
+            and _same_series(cached[1], waterlevel)
+            and cached[2] == stunden
+        ):
+            return cached[3]
+
+        # Erwartete Auszahlung über simulierte Pfade statt den letzten Wert
+        # bis zum Ende des Fensters fortzuschreiben
+        model = SettlementModel(
+            flow=river_model(waterflow, PRIOR_FLOW, stunden),
+            level=river_model(waterlevel, PRIOR_LEVEL, stunden),
+        )
+        value = simulate(model, CALL_PATHS, seed=0)["2_Eisbach_Call"].mean
+        _call_value = (waterflow, waterlevel, stunden, value)
+        return value
+
+
+def _same_series(a, b) -> bool:
+    # the fetch cache hands back the very same series while a page is unchanged
+    return a is b or a.equals(b)
 
 
 # --------------------------------------------------------------------
@@ -125,9 +163,9 @@ def predict_market_4() -> int:
 # --------------------------------------------------------------------
 # Market 5 – Airport arrivals + departures
 # --------------------------------------------------------------------
-def predict_market_5() -> int:
-    arr = predict_arrivals()
-    dep = predict_departures()
+def predict_market_5(arr=None, dep=None) -> int:
+    arr = predict_arrivals() if arr is None else arr
+    dep = predict_departures() if dep is None else dep
 
     return market_5_settlement(arr, dep)
 
@@ -135,36 +173,84 @@ def predict_market_5() -> int:
 # --------------------------------------------------------------------
 # Market 6 – Airport metric
 # --------------------------------------------------------------------
-def predict_market_6() -> int:
-    arr = predict_arrivals()
-    dep = predict_departures()
+def predict_market_6(arr=None, dep=None) -> int:
+    arr = predict_arrivals() if arr is None else arr
+    dep = predict_departures() if dep is None else dep
     return market_6_settlement(arr, dep)
 
 
 # --------------------------------------------------------------------
-# Market 7 – ETF
+# Monte Carlo inputs – paths for the rest of the window (see
+# estimates.monte_carlo)
 # --------------------------------------------------------------------
-def predict_market_7() -> float:
-    # Zeitpunkt heute um 10:00 Uhr
-    heute_zehn = datetime.combine(datetime.today(), time(10, 0))
+def river_model(series, prior, stunden) -> RiverModel:
+    stunden = min(max(stunden, 0), 24)
+    last = float(series.iloc[-1])
+    # Median am Ende wie bei predict_market_1 gewichtet
+    target = (1 - (stunden / 24)) * prior + (stunden / 24) * last
+    observed = series[series.index > series.index[-1] - pd.Timedelta(hours=stunden)]
+    return RiverModel(
+        observed=observed.to_numpy(dtype=float),
+        last=last,
+        target=target,
+        volatility=hourly_volatility(series),
+        steps=24 - stunden,
+    )
 
-    # aktueller Zeitpunkt
-    jetzt = datetime.now()
 
-    # vergangene Stunden (abgerundet)
-    stunden = int((jetzt - heute_zehn).total_seconds() // 3600)
+def settlement_model(
+    waterflow=None, waterlevel=None, weather=None, arr=None, dep=None, stunden=None
+) -> SettlementModel:
+    waterflow = get_waterflow() if waterflow is None else waterflow
+    waterlevel = get_waterlevel() if waterlevel is None else waterlevel
+    weather = get_raw_data() if weather is None else weather
+    arr = predict_arrivals() if arr is None else arr
+    dep = predict_departures() if dep is None else dep
+    stunden = elapsed_hours() if stunden is None else stunden
+
+    # Halbstunden-Bins, deren Zeitpunkt schon vorbei ist
+    now = pd.Timestamp.now(tz=weather.index.tz)
+    weather_elapsed = int((weather.index <= now).sum())
+    airport_elapsed = min(max(2 * stunden, 0), len(arr))
+
+    return SettlementModel(
+        flow=river_model(waterflow, PRIOR_FLOW, stunden),
+        level=river_model(waterlevel, PRIOR_LEVEL, stunden),
+        weather=WeatherModel(
+            temperature=weather["temperature_2m"].to_numpy(dtype=float),
+            humidity=weather["relative_humidity_2m"].to_numpy(dtype=float),
+            elapsed=weather_elapsed,
+        ),
+        airport=AirportModel(
+            arrivals=np.asarray(arr),
+            departures=np.asarray(dep),
+            elapsed=airport_elapsed,
+        ),
+    )
+
+
+# --------------------------------------------------------------------
+# Market 7 – ETF
+# --------------------------------------------------------------------
+def predict_market_7(
+    waterflow=None, waterlevel=None, weather=None, airport_value=None, stunden=None
+) -> float:
+    waterflow = get_waterflow() if waterflow is None else waterflow
+    waterlevel = get_waterlevel() if waterlevel is None else waterlevel
+    stunden = elapsed_hours() if stunden is None else stunden
 
-    weighted_flow = (1 - (stunden / 24)) * PRIOR_FLOW + (stunden / 24) * get_waterflow().iloc[-1]
+    weighted_flow = (1 - (stunden / 24)) * PRIOR_FLOW + (stunden / 24) * waterflow.iloc[-1]
 
-    weighted_level = (1 - (stunden / 24)) * PRIOR_LEVEL + (stunden / 24) * get_waterlevel().iloc[-1]
+    weighted_level = (1 - (stunden / 24)) * PRIOR_LEVEL + (stunden / 24) * waterlevel.iloc[-1]
 
-    filtered_dataframe = get_raw_data()
+    filtered_dataframe = get_raw_data() if weather is None else weather
     temp = filtered_dataframe["temperature_2m"].tail(1).iloc[-1]
     hum = filtered_dataframe["relative_humidity_2m"].tail(1).iloc[-1]
 
     flow = weighted_flow
     water = weighted_level
-    airport_value = predict_market_6()
+    if airport_value is None:
+        airport_value = predict_market_6()
 
     print(f"{flow} {water} {temp} {hum} {airport_value}")
 
@@ -0,0 +1,200 @@
+"""
+Append-only columnar time-series store for the estimates inputs.
+
+Each series is a directory with one raw little-endian file per column:
+`timestamp.i8` holds datetime64[ns] timestamps, strictly increasing, and
+every `<column>.f8` the float64 values of one column. Appends only add rows
+newer than the last stored timestamp, so a series keeps growing across
+scrapes and days. Reads memory-map the files and hand out array views, so
+"the last 24 hours of flow" is two binary searches and a slice.
+
+Values are written before timestamps, so a crash mid-append leaves at most
+unreferenced values behind, which are cut off when the series is opened.
+"""
+
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_FILE = "timestamp.i8"
+VALUE_SUFFIX = ".f8"
+
+_TIMESTAMP = np.dtype("<M8[ns]")
+_VALUE = np.dtype("<f8")
+
+
+class TimeSeries:
+    """
+    One series of float64 columns sharing a timestamp column
+    """
+
+    name: str
+    directory: Path
+    columns: tuple[str, ...]
+
+    def __init__(self, directory: Path, columns: Iterable[str]):
+        self.name = directory.name
+        self.directory = directory
+        self.columns = tuple(columns)
+        self._lock = Lock()
+        self._rows = 0
+        self._maps: dict[str, np.ndarray] = {}
+        self._open()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def last_timestamp(self) -> np.datetime64 | None:
+        if not self._rows:
+            return None
+        return self.timestamps()[-1]
+
+    def timestamps(self) -> np.ndarray:
+        return self._map(TIMESTAMP_FILE, _TIMESTAMP)
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self.columns:
+            raise KeyError(f"{self.name} has no column {name}")
+        return self._map(name + VALUE_SUFFIX, _VALUE)
+
+    def append(self, timestamps: Any, **values: Any) -> int:
+        """
+        Appends the rows newer than the last stored timestamp and returns how
+        many there were. `timestamps` is anything numpy can read as
+        datetime64 (naive timestamps are stored as given), `values` one
+        array-like per column.
+        """
+        if set(values) != set(self.columns):
+            raise ValueError(f"{self.name} takes columns {self.columns}")
+        timestamps = np.asarray(timestamps, dtype=_TIMESTAMP)
+        if any(len(values[name]) != len(timestamps) for name in self.columns):
+            raise ValueError("Timestamps and columns must have the same length")
+
+        with self._lock:
+            last = self.last_timestamp()
+            # the common case, a re-scrape of a page with nothing new
+            if not len(timestamps) or last is not None and timestamps.max() <= last:
+                return 0
+            order = np.argsort(timestamps, kind="stable")
+            timestamps = timestamps[order]
+            keep = np.ones(len(timestamps), dtype=bool)
+            # drop duplicates and everything already stored
+            keep[1:] = timestamps[1:] != timestamps[:-1]
+            if last is not None:
+                keep &= timestamps > last
+            rows = order[keep]
+            values = {
+                name: np.asarray(values[name], dtype=_VALUE)[rows]
+                for name in self.columns
+            }
+
+            for name in self.columns:
+                with open(self.directory / (name + VALUE_SUFFIX), "ab") as file:
+                    file.write(values[name].tobytes())
+            with open(self.directory / TIMESTAMP_FILE, "ab") as file:
+                file.write(timestamps[keep].tobytes())
+            self._rows += len(rows)
+            self._maps = {}
+            return len(rows)
+
+    def range(
+        self, start: Any = None, end: Any = None
+    ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        Timestamps and column views of the rows with start <= timestamp < end
+        """
+        timestamps = self.timestamps()
+        lo = 0 if start is None else np.searchsorted(timestamps, _datetime(start))
+        hi = (
+            len(timestamps)
+            if end is None
+            else np.searchsorted(timestamps, _datetime(end))
+        )
+        return timestamps[lo:hi], {
+            name: self.column(name)[lo:hi] for name in self.columns
+        }
+
+    def last(self, duration: Any) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        The rows within `duration` (a timedelta) of the last timestamp
+        """
+        last = self.last_timestamp()
+        if last is None:
+            return self.range()
+        # + 1ns: exactly `duration` before the last row is out of range
+        return self.range(last - pd.Timedelta(duration).to_timedelta64() + 1)
+
+    def frame(self, start: Any = None, end: Any = None) -> pd.DataFrame:
+        """
+        The rows of `range` copied into a DataFrame indexed by timestamp
+        """
+        timestamps, columns = self.range(start, end)
+        return pd.DataFrame(
+            {name: column.copy() for name, column in columns.items()},
+            index=pd.DatetimeIndex(timestamps.copy(), name="timestamp"),
+        )
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stored = {path.stem for path in self.directory.glob("*" + VALUE_SUFFIX)}
+        if stored and stored != set(self.columns):
+            raise ValueError(f"{self.name} has columns {sorted(stored)}")
+        files = [self.directory / TIMESTAMP_FILE] + [
+            self.directory / (name + VALUE_SUFFIX) for name in self.columns
+        ]
+        for path in files:
+            path.touch()
+        rows = min(path.stat().st_size // 8 for path in files)
+        for path in files:
+            # a torn append, rows beyond the shortest file were never complete
+            if path.stat().st_size != rows * 8:
+                with open(path, "r+b") as file:
+                    file.truncate(rows * 8)
+        self._rows = rows
+
+    def _map(self, filename: str, dtype: np.dtype) -> np.ndarray:
+        array = self._maps.get(filename)
+        if array is None:
+            if self._rows:
+                array = np.memmap(
+                    self.directory / filename, dtype=dtype, mode="r", shape=self._rows
+                )
+            else:
+                array = np.empty(0, dtype=dtype)
+            self._maps[filename] = array
+        return array
+
+
+class TimeSeriesStore:
+    """
+    A directory of series, created on first use
+    """
+
+    directory: Path
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self._lock = Lock()
+        self._series: dict[str, TimeSeries] = {}
+
+    def series(self, name: str, columns: Iterable[str] = ("value",)) -> TimeSeries:
+        columns = tuple(columns)
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = TimeSeries(self.directory / name, columns)
+        if series.columns != columns:
+            raise ValueError(f"{name} has columns {series.columns}, not {columns}")
+        return series
+
+    def names(self) -> list[str]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(path.name for path in self.directory.iterdir() if path.is_dir())
+
+
+def _datetime(value: Any) -> np.datetime64:
+    return pd.Timestamp(value).as_unit("ns").asm8
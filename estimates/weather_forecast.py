@@ -60,9 +60,9 @@ def get_raw_data():
     # print(filtered_dataframe)
     return filtered_dataframe
 
-def get_3_weather_prediction():
-    # Get the filtered data
-    df = get_raw_data()
+def get_3_weather_prediction(df=None):
+    # Get the filtered data, unless a refresh already fetched it
+    df = get_raw_data() if df is None else df.copy()
 
     # Calculate the desired value: temperature * 2 + humidity
     df['calculated_value'] = (df['temperature_2m'] * 2) + df['relative_humidity_2m']
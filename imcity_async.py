@@ -0,0 +1,404 @@
+"""
+Asyncio counterpart of `imcity_template.BaseBot`.
+
+Market data, order entry and queries all run on one event loop over a single
+pooled aiohttp session, so many in-flight requests cost no extra threads.
+Strategies written against `BaseBot` port over by turning `on_orderbook`,
+`on_trades` into coroutines and awaiting the order methods they call.
+
+REST calls share one token bucket with the same defaults as BaseBot's request
+scheduler, so concurrent requests stay within the exchange rate limit. They
+are released first come, first served.
+
+Needs aiohttp, which the threaded BaseBot does not: `pip install aiohttp`.
+"""
+
+import asyncio
+import inspect
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from traceback import format_exc
+from typing import Any, Awaitable, Callable, Iterable
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError(
+        "imcity_async needs aiohttp, install it with `pip install aiohttp`"
+    ) from e
+
+from imcity_scheduler import TokenBucket
+from imcity_sse import Backoff, ConnectionState, SSEParser
+from imcity_template import (
+    DEFAULT_TIMEOUT,
+    STANDARD_HEADERS,
+    OrderBook,
+    OrderRequest,
+    OrderResponse,
+    Product,
+    Trade,
+    decode_orderbook,
+    decode_trades,
+    json_loads,
+    parse_orderbook,
+)
+
+
+async def _maybe_await(result: Any) -> Any:
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class AsyncSSEReader:
+    """
+    Consumes the market event stream on the running loop and dispatches
+    `order` and `trade` events to the given handlers. Reconnects with jittered
+    exponential backoff, resuming from the last event id.
+    """
+
+    session: aiohttp.ClientSession
+    bearer: str
+    url: str
+    _handle_orderbook: Callable[[OrderBook], Awaitable[Any] | Any]
+    _handle_trade_event: Callable[[list[Trade]], Awaitable[Any] | Any]
+    _on_state: Callable[[ConnectionState], Awaitable[Any] | Any] | None
+    parser: SSEParser
+    backoff: Backoff
+    state: ConnectionState
+    _task: asyncio.Task | None = None
+    _closed: bool = False
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        bearer: str,
+        url: str,
+        handle_orderbook: Callable[[OrderBook], Awaitable[Any] | Any],
+        handle_trade_event: Callable[[list[Trade]], Awaitable[Any] | Any],
+        on_state: Callable[[ConnectionState], Awaitable[Any] | Any] | None = None,
+        backoff: Backoff | None = None,
+    ):
+        self.session = session
+        self.bearer = bearer
+        self.url = url
+        self._handle_orderbook = handle_orderbook
+        self._handle_trade_event = handle_trade_event
+        self._on_state = on_state
+        self.parser = SSEParser()
+        self.backoff = backoff or Backoff()
+        self.state = ConnectionState.DISCONNECTED
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._set_state(ConnectionState.CLOSED)
+
+    async def run(self) -> None:
+        while not self._closed:
+            await self._set_state(ConnectionState.CONNECTING)
+            try:
+                await self._consume()
+                reason = "stream ended"
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                reason = repr(e)
+            except Exception:
+                reason = "unexpected error"
+                if not self._closed:
+                    print(format_exc())
+            if self._closed:
+                return
+
+            await self._set_state(ConnectionState.DISCONNECTED)
+            if self.parser.retry is not None:
+                self.backoff.initial = self.parser.retry / 1000
+            delay = self.backoff.next_delay()
+            print(f"SSE connection lost ({reason}). Reconnecting in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+    async def _set_state(self, state: ConnectionState) -> None:
+        self.state = state
+        if self._on_state:
+            try:
+                await _maybe_await(self._on_state(state))
+            except Exception:
+                print(format_exc())
+
+    async def _consume(self) -> None:
+        headers = {
+            "Authorization": self.bearer,
+            "Accept": "text/event-stream; charset=utf-8",
+        }
+        if self.parser.last_event_id is not None:
+            headers["Last-Event-ID"] = self.parser.last_event_id
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)
+
+        self.parser.reset()
+        async with self.session.get(
+            self.url, headers=headers, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            await self._set_state(ConnectionState.CONNECTED)
+
+            feed = self.parser.feed
+            async for chunk in response.content.iter_any():
+                events = feed(chunk)
+                if not events:
+                    continue
+                self.backoff.reset()
+                for event in events:
+                    await self._dispatch(event.event, event.data)
+
+    async def _dispatch(self, event: str, data: str) -> None:
+        if event == "order":
+            await _maybe_await(self._handle_orderbook(decode_orderbook(data)))
+        elif event == "trade":
+            await _maybe_await(self._handle_trade_event(decode_trades(data)))
+
+
+class AsyncBaseBot(ABC):
+    username: str
+    _password: str
+    _cmi_url: str
+    _pool_size: int
+    _timeout: aiohttp.ClientTimeout
+    _bucket: TokenBucket | None
+    _session: aiohttp.ClientSession | None = None
+    _sse_reader: AsyncSSEReader | None = None
+    auth_token: str | None = None
+
+    def __init__(
+        self,
+        cmi_url: str,
+        username: str,
+        password: str,
+        pool_size: int = 4,
+        timeout: float = DEFAULT_TIMEOUT,
+        rate_limit: float | None = 1.0,
+        burst: int = 4,
+    ):
+        self._cmi_url = cmi_url
+        self.username = username
+        self._password = password
+        self._pool_size = pool_size
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self._bucket_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncBaseBot":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        """
+        Opens the pooled HTTP session and authenticates
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=self._timeout,
+            )
+        if self.auth_token is None:
+            self.auth_token = await self._authenticate()
+
+    async def close(self) -> None:
+        """
+        Stops the event stream and closes the HTTP session
+        """
+        if self._sse_reader:
+            await self.stop()
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def start(
+        self, on_orderbook: Callable | None = None, on_trades: Callable | None = None
+    ) -> None:
+        """
+        Starts consuming market events on the running event loop
+        """
+        if self._sse_reader:
+            raise Exception(
+                "Bot already running. Please use the `stop()` method before trying again."
+            )
+        await self.connect()
+
+        self._sse_reader = AsyncSSEReader(
+            session=self._session,
+            bearer=self.auth_token,
+            url=f"{self._cmi_url}/api/market/stream",
+            handle_orderbook=on_orderbook or self.on_orderbook,
+            handle_trade_event=on_trades or self.on_trades,
+            on_state=self.on_connection_state,
+        )
+        self._sse_reader.start()
+
+    async def stop(self) -> None:
+        """
+        Stops consuming market events
+        """
+        await self._sse_reader.close()
+        self._sse_reader = None
+
+    @abstractmethod
+    async def on_orderbook(self, orderbook: OrderBook):
+        raise NotImplementedError("You must implement the on_orderbook method!")
+
+    @abstractmethod
+    async def on_trades(self, trades: list[Trade]):
+        raise NotImplementedError("You must implement the on_trades method!")
+
+    async def on_connection_state(self, state: ConnectionState) -> None:
+        """
+        Called whenever the market stream connects, drops or closes
+        """
+
+    def _get_headers(self) -> dict[str, str]:
+        return {**STANDARD_HEADERS, "Authorization": self.auth_token}
+
+    async def _acquire(self) -> None:
+        """
+        Waits for a token of the rate limit, in the order the callers came
+        """
+        if self._bucket is None:
+            return
+        async with self._bucket_lock:
+            while (delay := self._bucket.delay()) > 0:
+                await asyncio.sleep(delay)
+            self._bucket.take()
+
+    async def _request(self, method: str, url: str, **kwargs) -> tuple[int, Any, bytes]:
+        """
+        Sends a request over the shared session once the rate limit allows it
+        and returns (status, json, raw body)
+        """
+        await self._acquire()
+        async with self._session.request(method, url, **kwargs) as response:
+            body = await response.read()
+            payload = json_loads(body) if response.status == 200 and body else None
+            return response.status, payload, body
+
+    async def send_order(self, order_request: OrderRequest) -> OrderResponse | None:
+        payload = asdict(order_request)
+        url = f"{self._cmi_url}/api/order"
+        status, body, raw = await self._request(
+            "POST", url, json=payload, headers=self._get_headers()
+        )
+        if status == 200:
+            return OrderResponse(**body)
+        else:
+            print(f"Failed to send order, {order_request}, with response {raw}")
+
+    async def send_mass_orders(
+        self, order_requests: list[OrderRequest]
+    ) -> list[OrderResponse | None]:
+        return list(
+            await asyncio.gather(*(self.send_order(req) for req in order_requests))
+        )
+
+    async def request_all_orders(self) -> list[dict] | None:
+        url = f"{self._cmi_url}/api/order/current-user"
+        status, body, raw = await self._request("GET", url, headers=self._get_headers())
+        if status == 200:
+            return body
+        else:
+            print(f"Failed to get all orders: {raw}")
+
+    async def cancel_order_by_id(self, order_id: str) -> dict | None:
+        url = f"{self._cmi_url}/api/order/{order_id}"
+        status, body, raw = await self._request(
+            "DELETE", url, headers=self._get_headers()
+        )
+        if status == 200:
+            return body
+
+        print(f"Failed to cancel order: {raw}")
+
+    async def cancel_order(self, product: str, price: float) -> dict | None:
+        url = f"{self._cmi_url}/api/order?product={product}&price={price}"
+        status, body, raw = await self._request(
+            "DELETE", url, headers=self._get_headers()
+        )
+        if status == 200:
+            return body
+        else:
+            print(f"Failed to cancel order: {raw}")
+
+    async def cancel_all_orders(self) -> None:
+        orders = await self.request_all_orders() or []
+        await asyncio.gather(
+            *(self.cancel_order_by_id(order["id"]) for order in orders)
+        )
+
+    async def request_all_products(self) -> list[Product] | None:
+        url = f"{self._cmi_url}/api/product"
+        status, body, raw = await self._request("GET", url, headers=self._get_headers())
+        if status == 200:
+            return list(map(lambda prod: Product(**prod), body))
+        else:
+            print(f"Failed to get all products: {raw}")
+
+    async def request_positions(self) -> dict[str, int] | None:
+        url = f"{self._cmi_url}/api/position/current-user"
+        status, body, raw = await self._request("GET", url, headers=self._get_headers())
+        if status == 200:
+            return {position["product"]: position["volume"] for position in body}
+        else:
+            print(f"Failed to get positions: {raw}")
+
+    async def request_net_positions(self) -> dict[str, int] | None:
+        url = f"{self._cmi_url}/api/position/current-user"
+        status, body, raw = await self._request("GET", url, headers=self._get_headers())
+        if status == 200:
+            return {position["product"]: position["netPosition"] for position in body}
+        else:
+            print(f"Failed to get net positions for user: {raw}")
+
+    async def request_order_book_per_product(self, product: str) -> OrderBook | None:
+        url = f"{self._cmi_url}/api/product/{product}/order-book/current-user"
+        status, body, raw = await self._request("GET", url, headers=self._get_headers())
+        if status == 200:
+            return parse_orderbook(body)
+        else:
+            print(f"Failed to get order book for {product}: {raw}")
+
+    async def request_order_books(
+        self, products: Iterable[str]
+    ) -> dict[str, OrderBook]:
+        """
+        Fetches the order books of several products concurrently, within the
+        rate limit. Products whose request failed are left out.
+        """
+        products = list(products)
+        orderbooks = await asyncio.gather(
+            *(self.request_order_book_per_product(product) for product in products)
+        )
+        return {
+            product: orderbook
+            for product, orderbook in zip(products, orderbooks)
+            if orderbook is not None
+        }
+
+    async def _authenticate(self) -> str:
+        auth = {"username": self.username, "password": self._password}
+        url = f"{self._cmi_url}/api/user/authenticate"
+        await self._acquire()
+        async with self._session.post(
+            url, headers=STANDARD_HEADERS, json=auth
+        ) as response:
+            response.raise_for_status()
+            return response.headers["Authorization"]
@@ -0,0 +1,449 @@
+"""
+Deterministic replay and backtesting of BaseBot strategies.
+
+A Backtest takes an already constructed BaseBot subclass and rewires it to
+run in-process against a MatchingEngine: its HTTP session is routed to an
+ExchangeAPI, its worker pool and event dispatcher run inline, and the
+strategy's module sees a simulated clock. Market data, recorded with
+`imcity_journal` or generated by `synthetic_market`, is replayed in order:
+
+- order book events set the resting volume of a `__market__` participant, so
+  the strategy's orders queue behind or ahead of real liquidity,
+- trade events are replayed as immediate-or-cancel orders of a `__tape__`
+  participant at the traded price, filling whatever rests ahead in the queue,
+  including our orders,
+- the strategy sees the engine's book (with its own volume) and every trade.
+
+Nothing runs on other threads and all ids and timestamps come from the
+replay, so the same data and strategy always give the same fills.
+"""
+
+import sys
+import time
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import count
+from random import Random
+from traceback import format_exc
+from types import ModuleType
+from typing import Any, Callable, Iterable, Iterator
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from imcity_book import BookManager
+from imcity_journal import JournalRecord
+from imcity_matching import ExchangeAPI, MatchingEngine
+from imcity_template import BaseBot
+from imcity_types import OrderBook, Trade, json_loads, parse_trades
+
+RECORDED_USER = "__recorded__"
+
+
+class InlineExecutor(Executor):
+    """
+    Runs submitted calls immediately on the calling thread
+    """
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        return future
+
+
+class InlineDispatcher:
+    """
+    EventDispatcher stand-in that calls the handlers on the publishing thread
+    """
+
+    def __init__(
+        self,
+        handle_orderbook: Callable[[OrderBook], Any],
+        handle_trades: Callable[[list[Trade]], Any],
+    ):
+        self._handle_orderbook = handle_orderbook
+        self._handle_trades = handle_trades
+        self.handler_errors = 0
+
+    def publish_orderbook(self, orderbook: OrderBook) -> None:
+        self._call(self._handle_orderbook, orderbook)
+
+    def publish_trades(self, trades: list[Trade]) -> None:
+        self._call(self._handle_trades, trades)
+
+    def close(self) -> None:
+        pass
+
+    def _call(self, handler: Callable, event: Any) -> None:
+        try:
+            handler(event)
+        except Exception:
+            self.handler_errors += 1
+            print(f"Event handler failed:\n{format_exc()}")
+
+
+class SimulatedAdapter(BaseAdapter):
+    """
+    requests transport adapter that answers from an ExchangeAPI in-process
+    """
+
+    def __init__(self, api: ExchangeAPI):
+        super().__init__()
+        self.api = api
+
+    def send(self, request, **kwargs) -> requests.Response:
+        url = urlsplit(request.url)
+        body = json_loads(request.body) if request.body else None
+        status, payload, headers = self.api.handle(
+            request.method,
+            url.path,
+            dict(parse_qsl(url.query)),
+            body,
+            request.headers.get("Authorization"),
+        )
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = requests.compat.json.dumps(payload).encode()
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": "application/json", **headers}
+        )
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedClock:
+    """
+    Replay time, exposed with the same functions as the `time` module
+    """
+
+    now_ns: int
+
+    def __init__(self, now_ns: int = 0):
+        self.now_ns = now_ns
+
+    def time_ns(self) -> int:
+        return self.now_ns
+
+    def time(self) -> float:
+        return self.now_ns / 1e9
+
+    monotonic = perf_counter = time
+
+    def sleep(self, seconds: float) -> None:
+        # replay time only moves with the data
+        pass
+
+
+class _TimeModule(ModuleType):
+    def __init__(self, clock: SimulatedClock):
+        super().__init__("time")
+        self._clock = clock
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._clock, name, None)
+        return attr if attr is not None else getattr(time, name)
+
+
+@dataclass
+class BacktestResult:
+    """
+    Our fills plus position and PnL paths. PnL is cash plus positions marked
+    at the market mid (or the settlement price once given to `summary`).
+    """
+
+    fills: list[Trade] = field(default_factory=list)
+    # (timestamp_ns, product, position after the fill)
+    positions: list[tuple[int, str, int]] = field(default_factory=list)
+    # (timestamp_ns, pnl)
+    pnl: list[tuple[int, float]] = field(default_factory=list)
+    events: int = 0
+    final_positions: dict[str, int] = field(default_factory=dict)
+    cash: float = 0.0
+    marks: dict[str, float] = field(default_factory=dict)
+
+    def total_pnl(self, settlement: dict[str, float] | None = None) -> float:
+        prices = {**self.marks, **(settlement or {})}
+        return self.cash + sum(
+            volume * prices.get(product, 0.0)
+            for product, volume in self.final_positions.items()
+        )
+
+    def summary(self, settlement: dict[str, float] | None = None) -> dict[str, Any]:
+        peak, drawdown = float("-inf"), 0.0
+        for _, pnl in self.pnl:
+            peak = max(peak, pnl)
+            drawdown = max(drawdown, peak - pnl)
+        return {
+            "events": self.events,
+            "fills": len(self.fills),
+            "volume": sum(fill.volume for fill in self.fills),
+            "positions": dict(self.final_positions),
+            "cash": self.cash,
+            "pnl": self.total_pnl(settlement),
+            "max_drawdown": drawdown,
+        }
+
+
+class Backtest:
+    """
+    Drives `bot` from replayed market data against a local matching engine.
+
+    The bot must not have been started. Its username is the trading user in
+    the engine; recorded trades made by that same user are renamed so they
+    do not count as ours.
+    """
+
+    bot: BaseBot
+    engine: MatchingEngine
+    api: ExchangeAPI
+    clock: SimulatedClock
+    pnl_interval_ns: int
+
+    def __init__(
+        self,
+        bot: BaseBot,
+        tick_sizes: dict[str, float] | None = None,
+        pnl_interval: float = 1.0,
+        patch_time: bool = True,
+    ):
+        self.bot = bot
+        self.clock = SimulatedClock()
+        self.engine = MatchingEngine(tick_sizes)
+        self.api = ExchangeAPI(
+            self.engine, self.clock.time_ns, self._on_exchange_trades
+        )
+        self.pnl_interval_ns = int(pnl_interval * 1e9)
+        self.patch_time = patch_time
+        self.books = BookManager()
+        self.result = BacktestResult()
+        self._last_sample = None
+        self._attach(bot)
+
+    def run(self, events: Iterable[JournalRecord]) -> BacktestResult:
+        """
+        Replays `events` in order and returns the result
+        """
+        restore = self._patch_time() if self.patch_time else []
+        try:
+            for record in events:
+                self.clock.now_ns = max(self.clock.now_ns, record.received_ns)
+                if record.event == "order":
+                    self._replay_book(record.payload)
+                elif record.event == "trade":
+                    self._replay_trades(record.payload)
+                self.result.events += 1
+                self._sample()
+        finally:
+            for module, name, value in restore:
+                setattr(module, name, value)
+
+        user = self.bot.username
+        self.result.final_positions = {
+            product: volume
+            for product, volume in self.engine.positions[user].items()
+            if volume
+        }
+        self.result.cash = self.engine.cash[user]
+        self._sample(force=True)
+        return self.result
+
+    def _attach(self, bot: BaseBot) -> None:
+        if bot.scheduler is not None:
+            bot.scheduler.close()
+            bot.scheduler = None
+        bot._executor.shutdown(wait=False)
+        bot._executor = InlineExecutor()
+        adapter = SimulatedAdapter(self.api)
+        bot._session.mount("http://", adapter)
+        bot._session.mount("https://", adapter)
+        # skip proxy lookups in the environment on every simulated request
+        bot._session.trust_env = False
+        bot.dispatcher = InlineDispatcher(bot.on_orderbook, bot.on_trades)
+
+    def _patch_time(self) -> list[tuple[ModuleType, str, Any]]:
+        """
+        Points `time` and functions imported from it at the simulated clock in
+        the modules defining the bot's classes
+        """
+        replacements = {
+            id(time): _TimeModule(self.clock),
+            id(time.time): self.clock.time,
+            id(time.time_ns): self.clock.time_ns,
+            id(time.monotonic): self.clock.monotonic,
+            id(time.perf_counter): self.clock.perf_counter,
+            id(time.sleep): self.clock.sleep,
+        }
+        restore = []
+        for cls in type(self.bot).__mro__:
+            module = sys.modules.get(cls.__module__)
+            if module is None or module.__name__ in ("builtins", "abc", __name__):
+                continue
+            if module.__name__ == BaseBot.__module__:
+                continue
+            for name, value in list(vars(module).items()):
+                replacement = replacements.get(id(value))
+                if replacement is not None:
+                    restore.append((module, name, value))
+                    setattr(module, name, replacement)
+        return restore
+
+    def _replay_book(self, payload: dict[str, Any]) -> None:
+        product = payload["product"]
+        self._deliver(self.engine.replay_orderbook(payload, self.clock.now_ns))
+
+        best_bid, best_ask = _best(payload["buy"], max), _best(payload["sell"], min)
+        if best_bid is not None and best_ask is not None:
+            self.result.marks[product] = (best_bid + best_ask) / 2
+
+        snapshot = self.books.apply(self.engine.depth(product, self.bot.username))
+        if snapshot is not None:
+            self.bot.dispatcher.publish_orderbook(snapshot)
+
+    def _replay_trades(self, payload: list[dict[str, Any]]) -> None:
+        recorded = []
+        for trade in parse_trades(payload):
+            self._deliver(
+                self.engine.replay_trade(
+                    trade.product, float(trade.price), trade.volume, self.clock.now_ns
+                )
+            )
+            recorded.append(self._rename(trade))
+        self.bot._handle_trades(recorded)
+
+    def _on_exchange_trades(self, trades: list[Trade]) -> None:
+        # trades caused by the bot's own orders, reported before its response
+        self._deliver(trades)
+
+    def _deliver(self, trades: list[Trade]) -> None:
+        user = self.bot.username
+        ours = [trade for trade in trades if user in (trade.buyer, trade.seller)]
+        if not ours:
+            return
+        positions = self.engine.positions[user]
+        for trade in ours:
+            self.result.fills.append(trade)
+            self.result.positions.append(
+                (self.clock.now_ns, trade.product, positions[trade.product])
+            )
+        self.bot._handle_trades(ours)
+        self._sample(force=True)
+
+    def _rename(self, trade: Trade) -> Trade:
+        user = self.bot.username
+        if user not in (trade.buyer, trade.seller):
+            return trade
+        return Trade(
+            trade.timestamp,
+            trade.product,
+            RECORDED_USER if trade.buyer == user else trade.buyer,
+            RECORDED_USER if trade.seller == user else trade.seller,
+            trade.volume,
+            trade.price,
+        )
+
+    def _sample(self, force: bool = False) -> None:
+        now = self.clock.now_ns
+        if (
+            not force
+            and self._last_sample is not None
+            and now - self._last_sample < self.pnl_interval_ns
+        ):
+            return
+        self._last_sample = now
+        user = self.bot.username
+        marks = self.result.marks
+        pnl = self.engine.cash[user] + sum(
+            volume * marks.get(product, 0.0)
+            for product, volume in self.engine.positions[user].items()
+        )
+        self.result.pnl.append((now, pnl))
+
+
+def synthetic_market(
+    start_prices: dict[str, float],
+    duration: float = 3600.0,
+    interval: float = 0.25,
+    depth: int = 5,
+    trade_probability: float = 0.2,
+    volatility: float = 0.5,
+    seed: int = 0,
+    start_ns: int | None = None,
+) -> Iterator[JournalRecord]:
+    """
+    Random-walk order books and trades for each product, every `interval`
+    seconds, in the same shape as recorded journal events. The same seed
+    always gives the same stream; with `duration` None it never ends.
+    """
+    rng = Random(seed)
+    now = (
+        start_ns
+        if start_ns is not None
+        else int(datetime(2025, 11, 22, tzinfo=timezone.utc).timestamp() * 1e9)
+    )
+    step = int(interval * 1e9)
+    mids = {product: float(price) for product, price in start_prices.items()}
+    steps = count() if duration is None else range(int(duration / interval))
+    for _ in steps:
+        now += step
+        for product in mids:
+            mids[product] = max(depth + 2, mids[product] + rng.gauss(0, volatility))
+            best_bid = int(mids[product]) - rng.randint(0, 1)
+            best_ask = best_bid + rng.randint(1, 3)
+            yield JournalRecord(
+                now,
+                "order",
+                {
+                    "product": product,
+                    "tickSize": 1,
+                    "buy": [
+                        {
+                            "price": best_bid - i,
+                            "volume": rng.randint(1, 20),
+                            "userOrderVolume": 0,
+                        }
+                        for i in range(depth)
+                    ],
+                    "sell": [
+                        {
+                            "price": best_ask + i,
+                            "volume": rng.randint(1, 20),
+                            "userOrderVolume": 0,
+                        }
+                        for i in range(depth)
+                    ],
+                },
+            )
+            if rng.random() < trade_probability:
+                yield JournalRecord(
+                    now,
+                    "trade",
+                    [
+                        {
+                            "timestamp": None,
+                            "product": product,
+                            "buyer": "synthetic_buyer",
+                            "seller": "synthetic_seller",
+                            "volume": rng.randint(1, 10),
+                            "price": rng.choice((best_bid, best_ask)),
+                        }
+                    ],
+                )
+
+
+def _best(levels: list[dict[str, Any]], pick: Callable) -> float | None:
+    prices = [level["price"] for level in levels if level["volume"] > 0]
+    return float(pick(prices)) if prices else None
@@ -0,0 +1,209 @@
+"""
+Incremental per-product L2 order books.
+
+Levels are kept in a price -> `Order` map plus a sorted price ladder per side,
+so a volume change at an existing level is a dict update, the best bid/ask is
+the head of the ladder, and snapshots handed to strategy callbacks are cached
+until the book changes again.
+
+The ladders are plain sorted lists, so adding or removing a level is a binary
+search plus an O(n) memmove of the ladder, not an O(log n) tree update. At
+the depths the exchange sends, the memmove moves at most a few kilobytes and
+is still far cheaper than re-sorting the book. Every "order" event carries
+the full book, so applying one is O(levels) to diff it against the current
+book; only the levels that differ touch the ladders.
+"""
+
+from bisect import bisect_left, insort
+from typing import Any
+
+from imcity_types import Order, OrderBook, Side
+
+
+class LocalOrderBook:
+    """
+    L2 book for a single product.
+
+    Bid prices are stored negated so both ladders are ascending and index 0 is
+    always the best level.
+    """
+
+    product: str
+    tick_size: float
+    version: int
+
+    def __init__(self, product: str, tick_size: float):
+        self.product = product
+        self.tick_size = tick_size
+        self.version = 0
+        self._levels: dict[Side, dict[float, Order]] = {Side.BUY: {}, Side.SELL: {}}
+        self._ladders: dict[Side, list[float]] = {Side.BUY: [], Side.SELL: []}
+        self._sides: dict[Side, tuple[Order, ...]] = {Side.BUY: (), Side.SELL: ()}
+        self._dirty: set[Side] = set()
+        self._snapshot: OrderBook | None = None
+
+    def __len__(self) -> int:
+        return len(self._levels[Side.BUY]) + len(self._levels[Side.SELL])
+
+    @property
+    def best_bid(self) -> Order | None:
+        ladder = self._ladders[Side.BUY]
+        return self._levels[Side.BUY][-ladder[0]] if ladder else None
+
+    @property
+    def best_ask(self) -> Order | None:
+        ladder = self._ladders[Side.SELL]
+        return self._levels[Side.SELL][ladder[0]] if ladder else None
+
+    def update_level(
+        self, side: Side, price: float, volume: int, own_volume: int = 0
+    ) -> bool:
+        """
+        Sets the resting volume at a price level, removing it when volume is zero.
+        O(1) for an existing level, O(depth) to add or remove one.
+        Returns whether the book changed.
+        """
+        levels = self._levels[side]
+        key = -price if side == Side.BUY else price
+        current = levels.get(price)
+
+        if volume <= 0:
+            if current is None:
+                return False
+            del levels[price]
+            ladder = self._ladders[side]
+            del ladder[bisect_left(ladder, key)]
+        else:
+            if (
+                current is not None
+                and current.volume == volume
+                and current.own_volume == own_volume
+            ):
+                return False
+            if current is None:
+                insort(self._ladders[side], key)
+            levels[price] = Order(price, volume, own_volume)
+
+        self._mark_dirty(side)
+        return True
+
+    def apply_snapshot(self, orderbook: dict[str, Any]) -> bool:
+        """
+        Applies a full exchange order book payload by diffing it against the
+        current levels, touching only the levels that changed. O(levels of the
+        payload and the book). Returns whether the book changed.
+        """
+        self.tick_size = orderbook.get("tickSize", self.tick_size)
+        changed = False
+        for side, key in ((Side.BUY, "buy"), (Side.SELL, "sell")):
+            incoming = {
+                float(level["price"]): level for level in orderbook.get(key) or ()
+            }
+            for price in [p for p in self._levels[side] if p not in incoming]:
+                changed |= self.update_level(side, price, 0)
+            for price, level in incoming.items():
+                changed |= self.update_level(
+                    side, price, level["volume"], level.get("userOrderVolume", 0)
+                )
+        return changed
+
+    def apply_orderbook(self, orderbook: OrderBook) -> bool:
+        """
+        Like `apply_snapshot`, for an already decoded OrderBook.
+        Returns whether the book changed.
+        """
+        self.tick_size = orderbook.tick_size
+        changed = False
+        for side, orders in (
+            (Side.BUY, orderbook.buy_orders),
+            (Side.SELL, orderbook.sell_orders),
+        ):
+            incoming = {order.price: order for order in orders}
+            for price in [p for p in self._levels[side] if p not in incoming]:
+                changed |= self.update_level(side, price, 0)
+            for price, order in incoming.items():
+                changed |= self.update_level(
+                    side, price, order.volume, order.own_volume
+                )
+        return changed
+
+    def snapshot(self) -> OrderBook:
+        """
+        Immutable view of the book, best levels first. Only sides that changed
+        since the previous call are rebuilt.
+        """
+        if self._snapshot is None:
+            for side in self._dirty:
+                levels = self._levels[side]
+                sign = -1 if side == Side.BUY else 1
+                self._sides[side] = tuple(
+                    levels[sign * key] for key in self._ladders[side]
+                )
+            self._dirty.clear()
+            self._snapshot = OrderBook(
+                self.product,
+                self.tick_size,
+                self._sides[Side.BUY],
+                self._sides[Side.SELL],
+            )
+        return self._snapshot
+
+    def _mark_dirty(self, side: Side) -> None:
+        self.version += 1
+        self._dirty.add(side)
+        self._snapshot = None
+
+
+class BookManager:
+    """
+    Holds one LocalOrderBook per product and applies exchange payloads to them
+    """
+
+    books: dict[str, LocalOrderBook]
+
+    def __init__(self):
+        self.books = {}
+
+    def __getitem__(self, product: str) -> LocalOrderBook:
+        return self.books[product]
+
+    def __contains__(self, product: str) -> bool:
+        return product in self.books
+
+    def get_book(self, product: str, tick_size: float = 1) -> LocalOrderBook:
+        book = self.books.get(product)
+        if book is None:
+            book = self.books[product] = LocalOrderBook(product, tick_size)
+        return book
+
+    def apply(self, orderbook: dict[str, Any]) -> OrderBook | None:
+        """
+        Applies an order book payload and returns the new snapshot, or None when
+        nothing changed
+        """
+        book = self.get_book(orderbook["product"], orderbook.get("tickSize", 1))
+        if book.apply_snapshot(orderbook):
+            return book.snapshot()
+        return None
+
+    def version(self, product: str) -> int:
+        book = self.books.get(product)
+        return book.version if book else 0
+
+    def resync(
+        self, orderbook: OrderBook, version: int | None = None
+    ) -> OrderBook | None:
+        """
+        Brings a book in line with a REST snapshot and returns the new snapshot.
+
+        Returns None when the snapshot holds the same levels as the book, or
+        when the book has moved past `version` (taken when the snapshot was
+        requested), since the stream has then delivered something fresher.
+        """
+        if version is not None and self.version(orderbook.product) != version:
+            return None
+        book = self.get_book(orderbook.product, orderbook.tick_size)
+        if book.snapshot().same_content(orderbook):
+            return None
+        book.apply_orderbook(orderbook)
+        return book.snapshot()
@@ -0,0 +1,225 @@
+"""
+NumPy-backed order book view for depth-aware pricing.
+
+A DepthBook holds price, volume and own_volume as contiguous arrays per
+side, best level first, and answers depth questions (cumulative depth, VWAP
+to fill N lots, microprice, imbalance, our share of each level) with
+vectorized operations. It exposes the same `product`, `tick_size`,
+`buy_orders` and `sell_orders` attributes as OrderBook so it can be handed to
+existing strategy code.
+"""
+
+from typing import Any
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from imcity_book import LocalOrderBook
+from imcity_types import Order, OrderBook, Side
+
+_LOCAL_VIEWS: "WeakKeyDictionary[LocalOrderBook, tuple[int, DepthBook]]" = (
+    WeakKeyDictionary()
+)
+
+
+class DepthBook:
+    product: str
+    tick_size: float
+    bid_price: np.ndarray
+    bid_volume: np.ndarray
+    bid_own: np.ndarray
+    ask_price: np.ndarray
+    ask_volume: np.ndarray
+    ask_own: np.ndarray
+
+    def __init__(
+        self,
+        product: str,
+        tick_size: float,
+        bids: tuple[np.ndarray, np.ndarray, np.ndarray],
+        asks: tuple[np.ndarray, np.ndarray, np.ndarray],
+    ):
+        """
+        `bids`/`asks` are (price, volume, own_volume) arrays, best level first
+        """
+        self.product = product
+        self.tick_size = tick_size
+        self.bid_price, self.bid_volume, self.bid_own = bids
+        self.ask_price, self.ask_volume, self.ask_own = asks
+        self._orders: dict[Side, list[Order]] = {}
+
+    @classmethod
+    def from_orderbook(cls, orderbook: OrderBook) -> "DepthBook":
+        view = cls(
+            orderbook.product,
+            orderbook.tick_size,
+            _orders_to_arrays(orderbook.buy_orders),
+            _orders_to_arrays(orderbook.sell_orders),
+        )
+        view._orders = {
+            Side.BUY: orderbook.buy_orders,
+            Side.SELL: orderbook.sell_orders,
+        }
+        return view
+
+    @classmethod
+    def from_payload(cls, orderbook: dict[str, Any]) -> "DepthBook":
+        """
+        Builds the arrays straight from an exchange order book payload (SSE
+        event or REST snapshot), without creating Order objects
+        """
+        return cls(
+            orderbook["product"],
+            orderbook["tickSize"],
+            _levels_to_arrays(orderbook["buy"], descending=True),
+            _levels_to_arrays(orderbook["sell"], descending=False),
+        )
+
+    @classmethod
+    def from_local_book(cls, book: LocalOrderBook) -> "DepthBook":
+        """
+        View of an incremental book. The arrays are filled once per book
+        version and shared by every caller until the book changes again.
+        """
+        cached = _LOCAL_VIEWS.get(book)
+        if cached is not None and cached[0] == book.version:
+            return cached[1]
+        view = cls.from_orderbook(book.snapshot())
+        _LOCAL_VIEWS[book] = (book.version, view)
+        return view
+
+    # --- OrderBook compatibility ---
+    @property
+    def buy_orders(self) -> list[Order]:
+        return self._side_orders(Side.BUY)
+
+    @property
+    def sell_orders(self) -> list[Order]:
+        return self._side_orders(Side.SELL)
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def to_orderbook(self) -> OrderBook:
+        return OrderBook(
+            self.product, self.tick_size, self.buy_orders, self.sell_orders
+        )
+
+    # --- analytics ---
+    @property
+    def best_bid(self) -> float | None:
+        return float(self.bid_price[0]) if self.bid_price.size else None
+
+    @property
+    def best_ask(self) -> float | None:
+        return float(self.ask_price[0]) if self.ask_price.size else None
+
+    @property
+    def mid(self) -> float | None:
+        if not self.bid_price.size or not self.ask_price.size:
+            return None
+        return float(self.bid_price[0] + self.ask_price[0]) / 2
+
+    @property
+    def spread(self) -> float | None:
+        if not self.bid_price.size or not self.ask_price.size:
+            return None
+        return float(self.ask_price[0] - self.bid_price[0])
+
+    def cumulative_depth(self, side: Side, exclude_own: bool = False) -> np.ndarray:
+        """
+        Running total of resting volume on `side`, best level first
+        """
+        _, volume, own = self._arrays(side)
+        return np.cumsum(volume - own if exclude_own else volume)
+
+    def vwap(self, side: Side, volume: int, exclude_own: bool = True) -> float | None:
+        """
+        Average price to fill `volume` lots with an aggressive order on `side`
+        (a BUY takes the asks). None if the book is not deep enough.
+        Our own resting volume is skipped by default since we cannot trade with it.
+        """
+        opposite = Side.SELL if side == Side.BUY else Side.BUY
+        prices, _, _ = self._arrays(opposite)
+        depth = self.cumulative_depth(opposite, exclude_own)
+        level = int(np.searchsorted(depth, volume))
+        if volume <= 0 or level >= depth.size:
+            return None
+
+        available = np.diff(depth, prepend=0)
+        before = depth[level - 1] if level else 0
+        cost = prices[:level] @ available[:level] + prices[level] * (volume - before)
+        return float(cost / volume)
+
+    def microprice(self) -> float | None:
+        """
+        Top-of-book price weighted towards the side with less volume
+        """
+        if not self.bid_price.size or not self.ask_price.size:
+            return None
+        bid_volume, ask_volume = self.bid_volume[0], self.ask_volume[0]
+        total = bid_volume + ask_volume
+        if total == 0:
+            return self.mid
+        return float(
+            (self.bid_price[0] * ask_volume + self.ask_price[0] * bid_volume) / total
+        )
+
+    def imbalance(self, levels: int = 1) -> float:
+        """
+        (bid volume - ask volume) / total over the best `levels` levels, in [-1, 1]
+        """
+        bid = self.bid_volume[:levels].sum()
+        ask = self.ask_volume[:levels].sum()
+        total = bid + ask
+        return float((bid - ask) / total) if total else 0.0
+
+    def own_share(self, side: Side) -> np.ndarray:
+        """
+        Fraction of each level's volume on `side` that is ours
+        """
+        _, volume, own = self._arrays(side)
+        return np.divide(
+            own, volume, out=np.zeros(volume.shape, dtype=float), where=volume > 0
+        )
+
+    def _arrays(self, side: Side) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if side == Side.BUY:
+            return self.bid_price, self.bid_volume, self.bid_own
+        return self.ask_price, self.ask_volume, self.ask_own
+
+    def _side_orders(self, side: Side) -> list[Order]:
+        orders = self._orders.get(side)
+        if orders is None:
+            price, volume, own = self._arrays(side)
+            orders = self._orders[side] = [
+                Order(p, v, o)
+                for p, v, o in zip(price.tolist(), volume.tolist(), own.tolist())
+            ]
+        return orders
+
+
+def _orders_to_arrays(orders) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    count = len(orders)
+    return (
+        np.fromiter((order.price for order in orders), dtype=float, count=count),
+        np.fromiter((order.volume for order in orders), dtype=np.int64, count=count),
+        np.fromiter(
+            (order.own_volume for order in orders), dtype=np.int64, count=count
+        ),
+    )
+
+
+def _levels_to_arrays(
+    levels: list[dict[str, Any]], descending: bool
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    count = len(levels)
+    price = np.fromiter((level["price"] for level in levels), dtype=float, count=count)
+    volume = np.fromiter(
+        (level["volume"] for level in levels), dtype=np.int64, count=count
+    )
+    own = np.fromiter(
+        (level["userOrderVolume"] for level in levels), dtype=np.int64, count=count
+    )
+    order = np.argsort(-price if descending else price, kind="stable")
+    return price[order], volume[order], own[order]
@@ -0,0 +1,170 @@
+"""
+Event dispatch between the market data reader and strategy handlers.
+
+The reader thread only publishes events; a small pool of workers runs the
+handlers. Order books are coalesced per product, so a slow handler only ever
+sees the freshest book instead of working through a backlog of stale ones.
+Trade batches are queued in order and never dropped.
+"""
+
+from collections import deque
+from threading import Condition, Thread
+from time import time_ns
+from traceback import format_exc
+from typing import Any, Callable
+
+from imcity_latency import DISPATCH, STRATEGY, LatencyTracker
+from imcity_types import OrderBook, Trade
+
+TRADES_LANE = "__trades__"
+
+
+class _Lane:
+    __slots__ = ("latest", "received_ns", "published_ns", "trades", "scheduled")
+
+    def __init__(self):
+        self.latest: OrderBook | None = None
+        self.received_ns: int | None = None
+        self.published_ns = 0
+        self.trades: deque[list[Trade]] = deque()
+        self.scheduled = False
+
+    def has_work(self) -> bool:
+        return self.latest is not None or bool(self.trades)
+
+
+class EventDispatcher:
+    """
+    Runs order book and trade handlers on `workers` threads.
+
+    Every product (and the trade stream) is a lane handled by at most one
+    worker at a time, so handlers for one product never overlap while
+    different products are handled in parallel.
+
+    With a `latency` tracker, order books published while the publishing
+    thread has a current tick record the dispatch and strategy stages, and
+    the handler runs with that tick as its own thread's current tick.
+    """
+
+    books_published: int
+    books_coalesced: int
+    trades_published: int
+    handler_errors: int
+
+    def __init__(
+        self,
+        handle_orderbook: Callable[[OrderBook], Any],
+        handle_trades: Callable[[list[Trade]], Any],
+        workers: int = 2,
+        latency: LatencyTracker | None = None,
+    ):
+        self._handle_orderbook = handle_orderbook
+        self._handle_trades = handle_trades
+        self.latency = latency
+        self._lanes: dict[str, _Lane] = {}
+        self._ready: deque[str] = deque()
+        self._condition = Condition()
+        self._closed = False
+        self.books_published = 0
+        self.books_coalesced = 0
+        self.trades_published = 0
+        self.handler_errors = 0
+
+        self._workers = [
+            Thread(target=self._run, name=f"EventDispatcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def publish_orderbook(self, orderbook: OrderBook) -> None:
+        received_ns = self.latency.current_tick() if self.latency else None
+        with self._condition:
+            self.books_published += 1
+            lane = self._lane(orderbook.product)
+            if lane.latest is not None:
+                self.books_coalesced += 1
+            lane.latest = orderbook
+            lane.received_ns = received_ns
+            if received_ns is not None:
+                lane.published_ns = time_ns()
+            self._schedule(orderbook.product, lane)
+
+    def publish_trades(self, trades: list[Trade]) -> None:
+        with self._condition:
+            self.trades_published += len(trades)
+            lane = self._lane(TRADES_LANE)
+            lane.trades.append(trades)
+            self._schedule(TRADES_LANE, lane)
+
+    def stats(self) -> dict[str, Any]:
+        with self._condition:
+            return {
+                "ready_lanes": len(self._ready),
+                "pending_trade_batches": len(self._lane(TRADES_LANE).trades),
+                "books_published": self.books_published,
+                "books_coalesced": self.books_coalesced,
+                "trades_published": self.trades_published,
+                "handler_errors": self.handler_errors,
+            }
+
+    def close(self) -> None:
+        """
+        Stops the workers once the events already queued have been handled
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _lane(self, key: str) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        return lane
+
+    def _schedule(self, key: str, lane: _Lane) -> None:
+        if not lane.scheduled:
+            lane.scheduled = True
+            self._ready.append(key)
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._ready and not self._closed:
+                    self._condition.wait()
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                lane = self._lanes[key]
+                received_ns = None
+                if key == TRADES_LANE:
+                    event, handler = lane.trades.popleft(), self._handle_trades
+                else:
+                    event, handler = lane.latest, self._handle_orderbook
+                    received_ns, published_ns = lane.received_ns, lane.published_ns
+                    lane.latest = lane.received_ns = None
+
+            if received_ns is not None:
+                started_ns = time_ns()
+                self.latency.record(DISPATCH, started_ns - published_ns)
+                self.latency.set_current_tick(received_ns)
+            try:
+                handler(event)
+            except Exception:
+                with self._condition:
+                    self.handler_errors += 1
+                print(f"Event handler failed:\n{format_exc()}")
+            if received_ns is not None:
+                self.latency.record(STRATEGY, time_ns() - started_ns)
+                self.latency.set_current_tick(None)
+
+            with self._condition:
+                if lane.has_work():
+                    # back of the queue so other lanes get their turn
+                    self._ready.append(key)
+                    self._condition.notify()
+                else:
+                    lane.scheduled = False
@@ -0,0 +1,386 @@
+"""
+Local mock of the CMI exchange for offline end-to-end and load testing.
+
+MockExchange serves the REST endpoints BaseBot uses from an ExchangeAPI over
+a MatchingEngine, plus `/api/market/stream` as server-sent events. A feed
+thread replays market data (synthetic by default) into the engine at a fixed
+number of events per second, the same way the backtest does: books set the
+resting volume of a market participant and trades hit whatever rests at
+their price. Every stream subscriber receives each changed book with its own
+`userOrderVolume`, and every trade.
+
+For load testing, REST responses can be delayed, requests dropped and
+streams cut. The exchange measures tick-to-order latency itself: the time
+from publishing a market book for a product to receiving the first order on
+that product after it.
+
+Run standalone and point a bot at it:
+
+    python -m imcity_exchange --port 8000 --rate 50
+"""
+
+import argparse
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time_ns
+from typing import Any, Iterable
+from urllib.parse import parse_qsl, urlsplit
+
+from imcity_backtest import synthetic_market
+from imcity_journal import JournalRecord
+from imcity_matching import ExchangeAPI, MatchingEngine
+from imcity_types import Trade
+
+HEARTBEAT_INTERVAL = 1.0
+
+DEFAULT_PRODUCTS = {
+    "1_Eisbach": 1000,
+    "2_Eisbach_Call": 150,
+    "3_Weather": 2500,
+    "5_Flights": 3000,
+}
+
+
+class _Subscriber:
+    __slots__ = ("user", "queue", "drop_at")
+
+    def __init__(self, user: str, drop_at: float | None):
+        self.user = user
+        self.queue: SimpleQueue = SimpleQueue()
+        self.drop_at = drop_at
+
+
+class MockExchange:
+    """
+    A matching engine behind the exchange's HTTP API on 127.0.0.1.
+
+    - `rate`: market events replayed per second from `market`, which defaults
+      to an endless synthetic market over `products`
+    - `latency`, `jitter`: seconds every REST response is delayed by, the
+      latter a uniformly random extra
+    - `drop_probability`: chance a REST request gets its connection closed
+      without a response
+    - `stream_drop_rate`: average stream disconnects per connected second
+
+    Stream events carry increasing ids; `Last-Event-ID` is accepted but
+    nothing is replayed on reconnect, as the client resyncs its books.
+    """
+
+    engine: MatchingEngine
+    api: ExchangeAPI
+    url: str | None = None
+    events_replayed: int
+    events_published: int
+    events_sent: int
+    requests_served: int
+    requests_dropped: int
+    stream_drops: int
+    tick_to_order_ns: list[int]
+
+    def __init__(
+        self,
+        products: dict[str, float] | None = None,
+        rate: float = 50.0,
+        market: Iterable[JournalRecord] | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        drop_probability: float = 0.0,
+        stream_drop_rate: float = 0.0,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        products = products or DEFAULT_PRODUCTS
+        self.engine = MatchingEngine({product: 1 for product in products})
+        self.api = ExchangeAPI(
+            self.engine, on_trades=self._publish_trades, on_book=self._publish_book
+        )
+        self.rate = rate
+        self.market = (
+            market
+            if market is not None
+            else synthetic_market(products, duration=None, seed=seed)
+        )
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_probability = drop_probability
+        self.stream_drop_rate = stream_drop_rate
+        self.port = port
+
+        self.events_replayed = 0
+        self.events_published = 0
+        self.events_sent = 0
+        self.requests_served = 0
+        self.requests_dropped = 0
+        self.stream_drops = 0
+        self.tick_to_order_ns = []
+
+        self._rng = random.Random(seed)
+        self._event_ids = count(1)
+        self._subscribers: list[_Subscriber] = []
+        self._subscribers_lock = Lock()
+        self._tick_ns: dict[str, int] = {}
+        self._stopping = Event()
+        self._server: ThreadingHTTPServer | None = None
+        self._threads: list[Thread] = []
+
+    def start(self) -> str:
+        """
+        Starts serving and replaying the market, and returns the base url
+        """
+        server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        server.daemon_threads = True
+        server.exchange = self
+        self._server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        self._stopping.clear()
+        self._threads = [
+            Thread(target=server.serve_forever, name="MockExchange", daemon=True),
+            Thread(target=self._run_feed, name="MockExchangeFeed", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        self._stopping.set()
+        with self._subscribers_lock:
+            for subscriber in self._subscribers:
+                subscriber.queue.put(None)
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "events_replayed": self.events_replayed,
+            "events_published": self.events_published,
+            "events_sent": self.events_sent,
+            "requests_served": self.requests_served,
+            "requests_dropped": self.requests_dropped,
+            "stream_drops": self.stream_drops,
+            "subscribers": len(self._subscribers),
+            "backlog": sum(s.queue.qsize() for s in self._subscribers),
+        }
+
+    def _run_feed(self) -> None:
+        next_at = monotonic()
+        for record in self.market:
+            # read every time so the rate can be changed while running
+            next_at += 1 / self.rate
+            delay = next_at - monotonic()
+            if delay > 0 and self._stopping.wait(delay):
+                return
+            if self._stopping.is_set():
+                return
+            self._replay(record)
+
+    def _replay(self, record: JournalRecord) -> None:
+        now = time_ns()
+        with self.api.lock:
+            self.events_replayed += 1
+            if record.event == "order":
+                product = record.payload["product"]
+                self._publish_trades(self.engine.replay_orderbook(record.payload, now))
+                self._publish_book(product)
+                self._tick_ns[product] = time_ns()
+            elif record.event == "trade":
+                for trade in record.payload:
+                    trades = self.engine.replay_trade(
+                        trade["product"], float(trade["price"]), trade["volume"], now
+                    )
+                    if trades:
+                        self._publish_trades(trades)
+                        self._publish_book(trade["product"])
+
+    def _publish_book(self, product: str) -> None:
+        # called with the api lock held, so books go out in engine order
+        event_id = next(self._event_ids)
+        encoded: dict[str, bytes] = {}
+        with self._subscribers_lock:
+            for subscriber in self._subscribers:
+                message = encoded.get(subscriber.user)
+                if message is None:
+                    depth = self.engine.depth(product, subscriber.user)
+                    message = encoded[subscriber.user] = _event(
+                        event_id, "order", depth
+                    )
+                subscriber.queue.put(message)
+        self.events_published += 1
+
+    def _publish_trades(self, trades: list[Trade]) -> None:
+        if not trades:
+            return
+        message = _event(
+            next(self._event_ids),
+            "trade",
+            [
+                {
+                    "timestamp": trade.timestamp,
+                    "product": trade.product,
+                    "buyer": trade.buyer,
+                    "seller": trade.seller,
+                    "volume": trade.volume,
+                    "price": trade.price,
+                }
+                for trade in trades
+            ],
+        )
+        with self._subscribers_lock:
+            for subscriber in self._subscribers:
+                subscriber.queue.put(message)
+        self.events_published += 1
+
+    def _on_order(self, product: str | None) -> None:
+        # only the first order after a tick is a reaction to it
+        tick_ns = self._tick_ns.pop(product, None)
+        if tick_ns is not None:
+            self.tick_to_order_ns.append(time_ns() - tick_ns)
+
+    def _subscribe(self, user: str) -> _Subscriber:
+        drop_at = None
+        if self.stream_drop_rate > 0:
+            drop_at = monotonic() + self._rng.expovariate(self.stream_drop_rate)
+        subscriber = _Subscriber(user, drop_at)
+        with self._subscribers_lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def _unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._subscribers_lock:
+            self._subscribers.remove(subscriber)
+
+    def _delay(self) -> float:
+        return self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: ThreadingHTTPServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/api/market/stream":
+            self._stream()
+        else:
+            self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _handle(self) -> None:
+        exchange: MockExchange = self.server.exchange
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        url = urlsplit(self.path)
+
+        if url.path == "/api/order" and self.command == "POST" and body:
+            exchange._on_order(body.get("product"))
+        if exchange.drop_probability and (
+            exchange._rng.random() < exchange.drop_probability
+        ):
+            exchange.requests_dropped += 1
+            self.close_connection = True
+            return
+        delay = exchange._delay()
+        if delay > 0:
+            sleep(delay)
+
+        status, payload, headers = exchange.api.handle(
+            self.command,
+            url.path,
+            dict(parse_qsl(url.query)),
+            body,
+            self.headers.get("Authorization"),
+        )
+        exchange.requests_served += 1
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self) -> None:
+        exchange: MockExchange = self.server.exchange
+        user = ExchangeAPI._user(self.headers.get("Authorization"))
+        if user is None:
+            self.send_error(401)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        subscriber = exchange._subscribe(user)
+        try:
+            while True:
+                if subscriber.drop_at is not None and monotonic() >= subscriber.drop_at:
+                    exchange.stream_drops += 1
+                    return
+                try:
+                    message = subscriber.queue.get(timeout=HEARTBEAT_INTERVAL)
+                except Empty:
+                    message = b": heartbeat\n\n"
+                if message is None:
+                    return
+                self.wfile.write(message)
+                exchange.events_sent += 1
+        except OSError:
+            # the client went away
+            pass
+        finally:
+            exchange._unsubscribe(subscriber)
+
+
+def _event(event_id: int, event: str, data: Any) -> bytes:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock CMI exchange")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drop-probability", type=float, default=0.0)
+    parser.add_argument("--stream-drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    exchange = MockExchange(
+        rate=args.rate,
+        latency=args.latency,
+        jitter=args.jitter,
+        drop_probability=args.drop_probability,
+        stream_drop_rate=args.stream_drop_rate,
+        seed=args.seed,
+        port=args.port,
+    )
+    print(f"Mock exchange listening on {exchange.start()}")
+    try:
+        while True:
+            sleep(10)
+            print(exchange.stats())
+    except KeyboardInterrupt:
+        exchange.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Append-only binary journal of the market stream.
+
+Every `order` and `trade` event is stored with the time it was received.
+JournalWriter only queues events on the reader thread; a background thread
+encodes them into memory-mapped segment files, so recording never blocks the
+stream on disk. JournalReader iterates the journal, or seeks to a point in
+time, by walking the record headers of the mapped segments instead of
+loading them.
+
+Segments are named by the timestamp of their first record and a sequence
+number, so a writer restarted into the same directory adds segments next to
+the existing ones. Layout, little-endian. A segment starts with a 16 byte file
+header (magic, timestamp of its first record) followed by records:
+
+    header  received_ns int64 | body length uint32 | kind uint8 | 3 pad
+    BOOK    tick_size float64 | bid count uint16 | ask count uint16 |
+            best bid, best ask in ticks int64 x2 | product length uint8 |
+            product | levels of (price delta in ticks int32,
+            volume uint32, own volume uint32), bids then asks
+    RAW     event length uint8 | event | data as received
+
+Book levels are stored best first, each price as the tick difference to the
+previous level of its side. Events that do not fit the BOOK encoding are
+stored RAW. A record's header is written after its body, so a zero kind
+marks the end of the data even if the writer died mid-record.
+"""
+
+import mmap
+import struct
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from threading import Thread
+from time import time_ns
+from traceback import format_exc
+from typing import Any, Iterator
+
+from imcity_types import json_loads
+
+MAGIC = b"IMCJRNL1"
+FILE_HEADER = struct.Struct("<8sq")
+RECORD_HEADER = struct.Struct("<qIB3x")
+BOOK_HEADER = struct.Struct("<dHHqqB")
+LEVEL = struct.Struct("<iII")
+
+KIND_BOOK = 1
+KIND_RAW = 2
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_SUFFIX = ".imj"
+
+_MAX_LEVELS = 0xFFFF
+_INT32 = 2**31
+
+
+@dataclass(frozen=True, slots=True)
+class JournalRecord:
+    """
+    A recorded event. `payload` is the decoded JSON data, or the data as a
+    string if it was not valid JSON.
+    """
+
+    received_ns: int
+    event: str
+    payload: Any
+
+
+def encode_book(orderbook: dict[str, Any]) -> bytes | None:
+    """
+    Packs an order book payload into a BOOK body, or None when it cannot be
+    represented exactly (prices off the tick grid, oversized values)
+    """
+    tick_size = float(orderbook["tickSize"])
+    product = orderbook["product"].encode()
+    if tick_size <= 0 or len(product) > 0xFF:
+        return None
+
+    bids = sorted(orderbook["buy"], key=_price, reverse=True)
+    asks = sorted(orderbook["sell"], key=_price)
+    if len(bids) > _MAX_LEVELS or len(asks) > _MAX_LEVELS:
+        return None
+
+    levels: list[int] = []
+    bases = []
+    for side in (bids, asks):
+        previous = None
+        for level in side:
+            ticks = round(level["price"] / tick_size)
+            if abs(ticks * tick_size - level["price"]) > tick_size * 1e-9:
+                return None
+            if previous is None:
+                bases.append(ticks)
+                delta = 0
+            else:
+                delta = ticks - previous
+            if not -_INT32 <= delta < _INT32:
+                return None
+            previous = ticks
+            levels += (delta, level["volume"], level.get("userOrderVolume", 0))
+        if previous is None:
+            bases.append(0)
+
+    try:
+        return b"".join(
+            (
+                BOOK_HEADER.pack(
+                    tick_size, len(bids), len(asks), bases[0], bases[1], len(product)
+                ),
+                product,
+                struct.pack("<" + "iII" * (len(levels) // 3), *levels),
+            )
+        )
+    except struct.error:
+        return None
+
+
+def decode_book(body: bytes) -> dict[str, Any]:
+    """
+    Rebuilds the order book payload from a BOOK body, best levels first
+    """
+    tick_size, n_bids, n_asks, bid_base, ask_base, product_length = (
+        BOOK_HEADER.unpack_from(body)
+    )
+    offset = BOOK_HEADER.size
+    product = body[offset : offset + product_length].decode()
+    offset += product_length
+
+    sides = []
+    for count, base in ((n_bids, bid_base), (n_asks, ask_base)):
+        ticks = base
+        side = []
+        for delta, volume, own_volume in LEVEL.iter_unpack(
+            body[offset : offset + count * LEVEL.size]
+        ):
+            ticks += delta
+            side.append(
+                {
+                    "price": _from_ticks(ticks, tick_size),
+                    "volume": volume,
+                    "userOrderVolume": own_volume,
+                }
+            )
+        offset += count * LEVEL.size
+        sides.append(side)
+
+    return {
+        "product": product,
+        "tickSize": _from_ticks(1, tick_size),
+        "buy": sides[0],
+        "sell": sides[1],
+    }
+
+
+class JournalWriter:
+    """
+    Records stream events into segment files under `directory`.
+
+    `record` is safe to call from the stream thread: it only timestamps and
+    queues the event. Segments roll over once `segment_size` bytes are used.
+    Events that could not be written are counted in `write_errors`, the first
+    error is kept in `error` and raised again by `close`.
+    """
+
+    directory: Path
+    segment_size: int
+    records_written: int
+    bytes_written: int
+    write_errors: int
+    error: Exception | None
+
+    def __init__(self, directory: str | Path, segment_size: int = SEGMENT_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.records_written = 0
+        self.bytes_written = 0
+        self.write_errors = 0
+        self.error = None
+        self._queue: SimpleQueue = SimpleQueue()
+        self._closed = False
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._offset = 0
+        self._last_ns = 0
+        self._sequence = 0
+
+        self._thread = Thread(target=self._run, name="JournalWriter", daemon=True)
+        self._thread.start()
+
+    def record(self, event: str, data: str, received_ns: int | None = None) -> None:
+        """
+        Queues a raw stream event, timestamped now unless `received_ns` is given
+        """
+        if not self._closed:
+            self._queue.put((received_ns or time_ns(), event, data))
+
+    def close(self) -> None:
+        """
+        Writes out everything queued so far and trims the open segment.
+        Raises a RuntimeError if any event could not be journaled.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(
+                f"{self.write_errors} events could not be journaled"
+            ) from self.error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            while item is not None:
+                try:
+                    self._write(*item)
+                except Exception as error:
+                    self.write_errors += 1
+                    self.error = self.error or error
+                    print(f"Failed to journal event:\n{format_exc()}")
+                try:
+                    item = self._queue.get_nowait()
+                except Empty:
+                    break
+            if item is None:
+                try:
+                    self._close_segment()
+                except Exception as error:
+                    self.error = self.error or error
+                    print(f"Failed to close journal segment:\n{format_exc()}")
+                return
+
+    def _write(self, received_ns: int, event: str, data: str) -> None:
+        # timestamps never go backwards so readers can seek by time
+        received_ns = self._last_ns = max(received_ns, self._last_ns)
+
+        body = None
+        if event == "order":
+            try:
+                body = encode_book(json_loads(data))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # malformed books are still kept, as received
+                pass
+        if body is not None:
+            kind = KIND_BOOK
+        else:
+            kind = KIND_RAW
+            name = event.encode()
+            body = b"".join((bytes((len(name),)), name, data.encode()))
+
+        size = RECORD_HEADER.size + len(body)
+        if self._map is None or self._offset + size > len(self._map):
+            self._open_segment(received_ns, size)
+
+        offset = self._offset
+        self._map[offset + RECORD_HEADER.size : offset + size] = body
+        RECORD_HEADER.pack_into(self._map, offset, received_ns, len(body), kind)
+        self._offset += size
+        self.records_written += 1
+        self.bytes_written += size
+
+    def _open_segment(self, first_ns: int, record_size: int) -> None:
+        self._close_segment()
+        size = max(self.segment_size, FILE_HEADER.size + record_size)
+        while True:
+            path = (
+                self.directory / f"{first_ns:020d}-{self._sequence:06d}{SEGMENT_SUFFIX}"
+            )
+            self._sequence += 1
+            try:
+                self._file = open(path, "x+b")
+                break
+            except FileExistsError:
+                # written by an earlier writer, never overwritten
+                continue
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        FILE_HEADER.pack_into(self._map, 0, MAGIC, first_ns)
+        self._offset = FILE_HEADER.size
+
+    def _close_segment(self) -> None:
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self._offset)
+        self._file.close()
+        self._map = self._file = None
+
+
+class JournalReader:
+    """
+    Reads the segments under `directory` in time order
+    """
+
+    directory: Path
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def segments(self) -> list[Path]:
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def __iter__(self) -> Iterator[JournalRecord]:
+        return self.read()
+
+    def read(
+        self, start_ns: int | None = None, end_ns: int | None = None
+    ) -> Iterator[JournalRecord]:
+        """
+        Yields the records received in [start_ns, end_ns), decoding only those
+        """
+        segments = self.segments()
+        if start_ns is not None:
+            # from the last segment starting before start_ns, which may end
+            # with records at start_ns if the next one starts there
+            firsts = [_first_ns(path) for path in segments]
+            segments = segments[max(bisect_left(firsts, start_ns) - 1, 0) :]
+
+        for path in segments:
+            if end_ns is not None and _first_ns(path) >= end_ns:
+                return
+            for received_ns, kind, body in _iter_segment(path, start_ns):
+                if end_ns is not None and received_ns >= end_ns:
+                    return
+                yield _decode_record(received_ns, kind, body)
+
+
+def _iter_segment(
+    path: Path, start_ns: int | None = None
+) -> Iterator[tuple[int, int, bytes]]:
+    """
+    Walks the record headers of a segment, copying out the bodies of records
+    received at or after `start_ns`
+    """
+    with open(path, "rb") as file:
+        if file.seek(0, 2) < FILE_HEADER.size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, _ = FILE_HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a market data journal")
+
+            offset = FILE_HEADER.size
+            end = len(mapped) - RECORD_HEADER.size
+            while offset <= end:
+                received_ns, length, kind = RECORD_HEADER.unpack_from(mapped, offset)
+                if kind == 0:
+                    return
+                start = offset + RECORD_HEADER.size
+                offset = start + length
+                if start_ns is None or received_ns >= start_ns:
+                    yield received_ns, kind, mapped[start:offset]
+
+
+def _first_ns(path: Path) -> int:
+    # <first_ns>-<sequence>, or just <first_ns> for segments without a sequence
+    return int(path.stem.partition("-")[0])
+
+
+def _decode_record(received_ns: int, kind: int, body: bytes) -> JournalRecord:
+    if kind == KIND_BOOK:
+        return JournalRecord(received_ns, "order", decode_book(body))
+    length = body[0]
+    event = body[1 : 1 + length].decode()
+    data = body[1 + length :]
+    try:
+        payload = json_loads(data)
+    except ValueError:
+        payload = data.decode()
+    return JournalRecord(received_ns, event, payload)
+
+
+def _price(level: dict[str, Any]) -> float:
+    return level["price"]
+
+
+def _from_ticks(ticks: int, tick_size: float) -> float | int:
+    price = ticks * tick_size
+    if price.is_integer():
+        return int(price)
+    # undo float noise such as 3 * 0.1 == 0.30000000000000004
+    return round(price, 12)
@@ -0,0 +1,222 @@
+"""
+Tick-to-trade latency instrumentation.
+
+Every order book event is stamped with the time its bytes arrived from the
+stream, and each stage of its path is recorded as an interval:
+
+    parse          arrival -> book snapshot built (SSE framing, JSON, book)
+    dispatch       snapshot built -> handler started on a dispatcher worker
+    strategy       handler start -> handler return
+    submit         arrival -> an order submitted while handling the event
+    response       order submitted -> exchange response received
+    tick_to_trade  arrival -> exchange response received
+
+The dispatcher makes the arrival time of the event being handled available
+to its worker thread, so orders submitted from a handler are attributed to
+the tick that caused them without threading timestamps through strategy code.
+
+Intervals go into log-bucketed histograms sharded per thread: recording is
+a bit_length, a shift and a few counter increments without any lock, cheap
+enough to leave on.
+"""
+
+from threading import Lock, local
+from typing import Any, Iterable
+
+PARSE = "parse"
+DISPATCH = "dispatch"
+STRATEGY = "strategy"
+SUBMIT = "submit"
+RESPONSE = "response"
+TICK_TO_TRADE = "tick_to_trade"
+
+STAGES = (PARSE, DISPATCH, STRATEGY, SUBMIT, RESPONSE, TICK_TO_TRADE)
+
+# 2**4 sub-buckets per power of two, values within 1/16 (6.25%) of exact
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_SHIFT_BASE = SUB_BUCKET_BITS + 1
+_MAX_VALUE = 2**63 - 1
+
+
+def _bucket(value: int) -> int:
+    shift = value.bit_length() - _SHIFT_BASE
+    if shift <= 0:
+        return value
+    return shift * _SUB_BUCKETS + (value >> shift)
+
+
+def _bucket_bounds(index: int) -> tuple[int, int]:
+    if index < 2 * _SUB_BUCKETS:
+        return index, index
+    shift, mantissa = divmod(index, _SUB_BUCKETS)
+    shift -= 1
+    mantissa += _SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+_BUCKETS = _bucket(_MAX_VALUE) + 1
+
+
+class _Shard:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class LatencyHistogram:
+    """
+    Counts of non-negative integer latencies (nanoseconds) in log buckets.
+    Count, total and max are exact; percentiles are accurate to the bucket
+    width.
+
+    Each recording thread writes to its own shard, so recording takes no
+    lock; readers merge the shards.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._local = local()
+        self._shards: list[_Shard] = []
+
+    def record(self, value: int) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        if value < 0:
+            value = 0
+        elif value > _MAX_VALUE:
+            value = _MAX_VALUE
+        # _bucket inlined, this runs several times per tick
+        shift = value.bit_length() - _SHIFT_BASE
+        index = value if shift <= 0 else shift * _SUB_BUCKETS + (value >> shift)
+        shard.counts[index] += 1
+        shard.count += 1
+        shard.total += value
+        if value > shard.max:
+            shard.max = value
+
+    @property
+    def count(self) -> int:
+        return sum(shard.count for shard in self._shards)
+
+    @property
+    def total(self) -> int:
+        return sum(shard.total for shard in self._shards)
+
+    @property
+    def max(self) -> int:
+        return max((shard.max for shard in self._shards), default=0)
+
+    def counts(self) -> list[int]:
+        """
+        Merged bucket counts
+        """
+        merged = [0] * _BUCKETS
+        for shard in list(self._shards):
+            for index, count in enumerate(shard.counts):
+                if count:
+                    merged[index] += count
+        return merged
+
+    def percentile(self, percent: float) -> int | None:
+        """
+        The upper end of the bucket holding the `percent`-th percentile
+        value, capped at the exact max
+        """
+        counts = self.counts()
+        total = sum(counts)
+        if not total:
+            return None
+        rank = max(1, round(total * percent / 100))
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def reset(self) -> None:
+        # recording threads start new shards; writes racing the reset are lost
+        with self._lock:
+            self._local = local()
+            self._shards = []
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Count plus mean, p50, p99, p99.9 and max, in microseconds
+        """
+        count = self.count
+        if not count:
+            return {"count": 0}
+        return {
+            "count": count,
+            "mean_us": self.total / count / 1e3,
+            "p50_us": self.percentile(50) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "p999_us": self.percentile(99.9) / 1e3,
+            "max_us": self.max / 1e3,
+        }
+
+
+class LatencyTracker:
+    """
+    One LatencyHistogram per stage, plus the arrival time of the tick the
+    current thread is handling
+    """
+
+    histograms: dict[str, LatencyHistogram]
+
+    def __init__(self, stages: Iterable[str] = STAGES):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+        self._context = local()
+
+    def record(self, stage: str, nanoseconds: int) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(nanoseconds)
+
+    def current_tick(self) -> int | None:
+        """
+        Arrival time of the event being handled on this thread, if any
+        """
+        return getattr(self._context, "tick_ns", None)
+
+    def set_current_tick(self, received_ns: int | None) -> None:
+        self._context.tick_ns = received_ns
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {
+            stage: histogram.summary() for stage, histogram in self.histograms.items()
+        }
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def report(self) -> str:
+        """
+        The per-stage summaries as a table, in microseconds
+        """
+        lines = [
+            f"{'stage':<14} {'count':>9} {'mean':>9} {'p50':>9} {'p99':>9}"
+            f" {'p99.9':>9} {'max':>9}"
+        ]
+        for stage, summary in self.snapshot().items():
+            if not summary["count"]:
+                lines.append(f"{stage:<14} {0:>9}")
+                continue
+            lines.append(
+                f"{stage:<14} {summary['count']:>9} {summary['mean_us']:>9.1f}"
+                f" {summary['p50_us']:>9.1f} {summary['p99_us']:>9.1f}"
+                f" {summary['p999_us']:>9.1f} {summary['max_us']:>9.1f}"
+            )
+        return "\n".join(lines)
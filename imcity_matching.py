@@ -0,0 +1,528 @@
+"""
+Price-time priority matching engine standing in for the exchange.
+
+Orders match against the opposite side best price first and, within a price
+level, in arrival order. Trades happen at the resting order's price. An order
+that would trade against a resting order of the same user cancels that
+resting order instead (self-trade prevention). Timestamps are supplied by
+the caller, so a replay through the engine is fully deterministic.
+"""
+
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import count
+from threading import RLock
+from time import time_ns
+from typing import Any, Callable, Iterable
+
+from imcity_types import Side, Trade
+
+# engine users standing in for everyone else in replayed market data
+MARKET_USER = "__market__"
+TAPE_USER = "__tape__"
+
+
+@dataclass(slots=True)
+class RestingOrder:
+    id: str
+    user: str
+    product: str
+    side: Side
+    price: float
+    volume: int
+    filled: int
+    timestamp_ns: int
+
+    @property
+    def remaining(self) -> int:
+        return self.volume - self.filled
+
+    @property
+    def status(self) -> str:
+        if self.filled == 0:
+            return "ACTIVE"
+        return "FILLED" if self.remaining == 0 else "PART_FILLED"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "product": self.product,
+            "side": str(self.side),
+            "price": self.price,
+            "volume": self.volume,
+            "filled": self.filled,
+            "user": self.user,
+            "timestamp": format_timestamp(self.timestamp_ns),
+            "targetUser": None,
+            "message": None,
+        }
+
+
+class ProductBook:
+    """
+    Resting orders for one product: a FIFO queue per price level plus a
+    sorted price ladder per side (bids negated, best level first)
+    """
+
+    product: str
+    tick_size: float
+
+    def __init__(self, product: str, tick_size: float):
+        self.product = product
+        self.tick_size = tick_size
+        self.levels: dict[Side, dict[float, deque[RestingOrder]]] = {
+            Side.BUY: {},
+            Side.SELL: {},
+        }
+        self.ladders: dict[Side, list[float]] = {Side.BUY: [], Side.SELL: []}
+
+    def best_price(self, side: Side) -> float | None:
+        ladder = self.ladders[side]
+        if not ladder:
+            return None
+        return -ladder[0] if side == Side.BUY else ladder[0]
+
+    def queue(self, side: Side, price: float) -> deque[RestingOrder] | None:
+        return self.levels[side].get(price)
+
+    def append(self, order: RestingOrder) -> None:
+        levels = self.levels[order.side]
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            key = -order.price if order.side == Side.BUY else order.price
+            insort(self.ladders[order.side], key)
+        queue.append(order)
+
+    def remove(self, order: RestingOrder) -> None:
+        queue = self.levels[order.side][order.price]
+        queue.remove(order)
+        if not queue:
+            self.drop_level(order.side, order.price)
+
+    def drop_level(self, side: Side, price: float) -> None:
+        del self.levels[side][price]
+        ladder = self.ladders[side]
+        del ladder[bisect_left(ladder, -price if side == Side.BUY else price)]
+
+    def depth(self, user: str | None = None) -> dict[str, Any]:
+        """
+        Aggregated levels in the exchange's order book payload format, with
+        `userOrderVolume` counting `user`'s orders
+        """
+        payload: dict[str, Any] = {"product": self.product, "tickSize": self.tick_size}
+        for side, key in ((Side.BUY, "buy"), (Side.SELL, "sell")):
+            sign = -1 if side == Side.BUY else 1
+            levels = self.levels[side]
+            payload[key] = [
+                {
+                    "price": sign * ladder_key,
+                    "volume": sum(
+                        order.remaining for order in levels[sign * ladder_key]
+                    ),
+                    "userOrderVolume": sum(
+                        order.remaining
+                        for order in levels[sign * ladder_key]
+                        if order.user == user
+                    ),
+                }
+                for ladder_key in self.ladders[side]
+            ]
+        return payload
+
+
+class MatchingEngine:
+    """
+    Continuous limit order books for any number of products, with positions
+    and cash per user
+    """
+
+    books: dict[str, ProductBook]
+    positions: dict[str, dict[str, int]]
+    cash: dict[str, float]
+
+    def __init__(self, tick_sizes: dict[str, float] | None = None):
+        self.books = {}
+        self.positions = defaultdict(lambda: defaultdict(int))
+        self.cash = defaultdict(float)
+        self._orders: dict[str, RestingOrder] = {}
+        # resting orders per (user, product), in arrival order
+        self._owned: dict[tuple[str, str], dict[str, RestingOrder]] = defaultdict(dict)
+        self._ids = count(1)
+        for product, tick_size in (tick_sizes or {}).items():
+            self.add_product(product, tick_size)
+
+    def add_product(self, product: str, tick_size: float = 1) -> ProductBook:
+        book = self.books.get(product)
+        if book is None:
+            book = self.books[product] = ProductBook(product, tick_size)
+        return book
+
+    def order(self, order_id: str) -> RestingOrder | None:
+        return self._orders.get(order_id)
+
+    def orders(self, user: str, product: str | None = None) -> list[RestingOrder]:
+        """
+        `user`'s resting orders, oldest first
+        """
+        if product is not None:
+            return list(self._owned.get((user, product), {}).values())
+        return [order for order in self._orders.values() if order.user == user]
+
+    def depth(self, product: str, user: str | None = None) -> dict[str, Any]:
+        return self.books[product].depth(user)
+
+    def submit(
+        self,
+        user: str,
+        product: str,
+        side: Side,
+        price: float,
+        volume: int,
+        timestamp_ns: int,
+        immediate_or_cancel: bool = False,
+    ) -> tuple[RestingOrder, list[Trade]]:
+        """
+        Matches a limit order and rests whatever is left of it (unless
+        `immediate_or_cancel`). Returns the order and the trades it caused.
+        Raises ValueError for unknown products, off-tick prices or
+        non-positive volumes.
+        """
+        book = self.books.get(product)
+        if book is None:
+            raise ValueError(f"Unknown product {product}")
+        side = Side(side)
+        price = float(price)
+        ticks = price / book.tick_size
+        if volume <= 0 or abs(ticks - round(ticks)) > 1e-9:
+            raise ValueError(f"Invalid order {side} {volume} @ {price} on {product}")
+
+        order = RestingOrder(
+            str(next(self._ids)), user, product, side, price, volume, 0, timestamp_ns
+        )
+        trades = self._match(book, order)
+        if order.remaining > 0 and not immediate_or_cancel:
+            book.append(order)
+            self._orders[order.id] = order
+            self._owned[(user, product)][order.id] = order
+        return order, trades
+
+    def cancel(self, order_id: str, user: str | None = None) -> RestingOrder | None:
+        """
+        Cancels a resting order, only if it belongs to `user` when one is given
+        """
+        order = self._orders.get(order_id)
+        if order is None or (user is not None and order.user != user):
+            return None
+        self._forget(order)
+        self.books[order.product].remove(order)
+        return order
+
+    def cancel_level(self, user: str, product: str, price: float) -> list[RestingOrder]:
+        """
+        Cancels all of `user`'s orders resting at `price`, on both sides
+        """
+        return [
+            self.cancel(order.id)
+            for order in self.orders(user, product)
+            if order.price == float(price)
+        ]
+
+    def set_liquidity(
+        self,
+        user: str,
+        product: str,
+        bids: dict[float, int],
+        asks: dict[float, int],
+        timestamp_ns: int,
+    ) -> list[Trade]:
+        """
+        Brings `user`'s resting volume per price level to the given targets.
+
+        Shrinking levels lose their newest orders first, so nobody queued
+        behind them moves up. Added volume joins the back of the queue and
+        may trade against other users' orders it crosses. All reductions
+        are made before any additions so one side's stale levels never cross
+        the other side's new ones.
+        """
+        self.add_product(product)
+        current: dict[tuple[Side, float], list[RestingOrder]] = defaultdict(list)
+        for order in self.orders(user, product):
+            current[(order.side, order.price)].append(order)
+
+        additions = []
+        for side, levels in ((Side.BUY, bids), (Side.SELL, asks)):
+            for price, volume in levels.items():
+                have = sum(order.remaining for order in current.get((side, price), ()))
+                if volume > have:
+                    additions.append((side, price, volume - have))
+
+        for (side, price), orders in current.items():
+            excess = sum(order.remaining for order in orders) - (
+                bids if side == Side.BUY else asks
+            ).get(price, 0)
+            for order in reversed(orders):
+                if excess <= 0:
+                    break
+                if order.remaining <= excess:
+                    excess -= order.remaining
+                    self.cancel(order.id)
+                else:
+                    order.volume -= excess
+                    excess = 0
+
+        trades = []
+        for side, price, volume in additions:
+            trades += self.submit(user, product, side, price, volume, timestamp_ns)[1]
+        return trades
+
+    def replay_orderbook(
+        self, orderbook: dict[str, Any], timestamp_ns: int
+    ) -> list[Trade]:
+        """
+        Makes MARKET_USER's resting volume match an order book payload seen
+        by another user (their own volume excluded). Returns the trades this
+        caused against other users' orders.
+        """
+        product = orderbook["product"]
+        self.add_product(product, orderbook.get("tickSize", 1))
+        return self.set_liquidity(
+            MARKET_USER,
+            product,
+            level_targets(orderbook["buy"]),
+            level_targets(orderbook["sell"]),
+            timestamp_ns,
+        )
+
+    def replay_trade(
+        self, product: str, price: float, volume: int, timestamp_ns: int
+    ) -> list[Trade]:
+        """
+        Replays a trade seen on the market as an immediate-or-cancel order of
+        TAPE_USER at the traded price, against whichever side of the book it
+        reaches. Orders queued ahead at that price fill; a trade inside the
+        spread fills nothing.
+        """
+        book = self.add_product(product)
+        best_bid = book.best_price(Side.BUY)
+        best_ask = book.best_price(Side.SELL)
+        if best_bid is not None and best_bid >= price:
+            side = Side.SELL
+        elif best_ask is not None and best_ask <= price:
+            side = Side.BUY
+        else:
+            return []
+        return self.submit(
+            TAPE_USER,
+            product,
+            side,
+            price,
+            volume,
+            timestamp_ns,
+            immediate_or_cancel=True,
+        )[1]
+
+    def _match(self, book: ProductBook, order: RestingOrder) -> list[Trade]:
+        opposite = Side.SELL if order.side == Side.BUY else Side.BUY
+        trades: list[Trade] = []
+        while order.remaining > 0:
+            best = book.best_price(opposite)
+            if best is None:
+                break
+            if (order.side == Side.BUY and best > order.price) or (
+                order.side == Side.SELL and best < order.price
+            ):
+                break
+
+            queue = book.queue(opposite, best)
+            resting = queue[0]
+            if resting.user == order.user:
+                self.cancel(resting.id)
+                continue
+
+            volume = min(order.remaining, resting.remaining)
+            order.filled += volume
+            resting.filled += volume
+            buyer, seller = (
+                (order.user, resting.user)
+                if order.side == Side.BUY
+                else (resting.user, order.user)
+            )
+            self._settle(book.product, buyer, seller, volume, best)
+            trades.append(
+                Trade(
+                    format_timestamp(order.timestamp_ns),
+                    book.product,
+                    buyer,
+                    seller,
+                    volume,
+                    best,
+                )
+            )
+            if resting.remaining == 0:
+                queue.popleft()
+                self._forget(resting)
+                if not queue:
+                    book.drop_level(opposite, best)
+        return trades
+
+    def _forget(self, order: RestingOrder) -> None:
+        del self._orders[order.id]
+        del self._owned[(order.user, order.product)][order.id]
+
+    def _settle(
+        self, product: str, buyer: str, seller: str, volume: int, price: float
+    ) -> None:
+        self.positions[buyer][product] += volume
+        self.positions[seller][product] -= volume
+        self.cash[buyer] -= volume * price
+        self.cash[seller] += volume * price
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    return (
+        datetime.fromtimestamp(timestamp_ns / 1e9, timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z")
+    )
+
+
+def level_targets(levels: Iterable[dict[str, Any]]) -> dict[float, int]:
+    """
+    Volume per price from payload levels, excluding the recording user's own
+    """
+    targets: dict[float, int] = {}
+    for level in levels:
+        volume = level["volume"] - level.get("userOrderVolume", 0)
+        if volume > 0:
+            price = float(level["price"])
+            targets[price] = targets.get(price, 0) + volume
+    return targets
+
+
+class ExchangeAPI:
+    """
+    Answers the exchange's REST endpoints from a MatchingEngine.
+
+    Users authenticate with any password and get `Bearer <username>` back.
+    `on_trades` is called with the trades every accepted order caused and
+    `on_book` with the product of every book an order or cancel changed,
+    both before the response is returned. Anything else touching the engine
+    must hold `lock`.
+    """
+
+    engine: MatchingEngine
+    lock: RLock
+
+    def __init__(
+        self,
+        engine: MatchingEngine,
+        clock: Callable[[], int] = time_ns,
+        on_trades: Callable[[list[Trade]], Any] | None = None,
+        on_book: Callable[[str], Any] | None = None,
+    ):
+        self.engine = engine
+        self._clock = clock
+        self._on_trades = on_trades
+        self._on_book = on_book
+        self.lock = RLock()
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, str] | None = None,
+        body: Any = None,
+        authorization: str | None = None,
+    ) -> tuple[int, Any, dict[str, str]]:
+        """
+        Returns (status, JSON body, extra headers) for one request
+        """
+        query = query or {}
+        parts = path.strip("/").split("/")
+        with self.lock:
+            if method == "POST" and path == "/api/user/authenticate":
+                return 200, {}, {"Authorization": f"Bearer {body['username']}"}
+
+            user = self._user(authorization)
+            if user is None:
+                return 401, {"message": "Unauthorized"}, {}
+            try:
+                return (*self._route(method, parts, query, body, user), {})
+            except (KeyError, TypeError, ValueError) as e:
+                return 400, {"message": str(e)}, {}
+
+    def _route(
+        self,
+        method: str,
+        parts: list[str],
+        query: dict[str, str],
+        body: Any,
+        user: str,
+    ) -> tuple[int, Any]:
+        engine = self.engine
+        if parts == ["api", "order"] and method == "POST":
+            order, trades = engine.submit(
+                user,
+                body["product"],
+                body["side"],
+                body["price"],
+                body["volume"],
+                self._clock(),
+            )
+            if trades and self._on_trades:
+                self._on_trades(trades)
+            self._book_changed(order.product)
+            return 200, order.to_dict()
+        if parts == ["api", "order"] and method == "DELETE":
+            cancelled = engine.cancel_level(user, query["product"], query["price"])
+            if cancelled:
+                self._book_changed(query["product"])
+            return 200, [order.id for order in cancelled]
+        if parts[:2] == ["api", "order"] and len(parts) == 3:
+            if parts[2] == "current-user" and method == "GET":
+                return 200, [order.to_dict() for order in engine.orders(user)]
+            if method == "DELETE":
+                order = engine.cancel(parts[2], user)
+                if order is None:
+                    return 404, {"message": f"No active order {parts[2]}"}
+                self._book_changed(order.product)
+                return 200, order.to_dict()
+        if parts == ["api", "product"] and method == "GET":
+            return 200, [
+                {
+                    "symbol": product,
+                    "tickSize": book.tick_size,
+                    "startingPrice": 0,
+                    "contractSize": 1,
+                }
+                for product, book in engine.books.items()
+            ]
+        if parts == ["api", "position", "current-user"] and method == "GET":
+            return 200, [
+                {"product": product, "volume": volume, "netPosition": volume}
+                for product, volume in engine.positions[user].items()
+            ]
+        if (
+            len(parts) == 5
+            and parts[:2] == ["api", "product"]
+            and parts[3:] == ["order-book", "current-user"]
+            and method == "GET"
+        ):
+            if parts[2] not in engine.books:
+                return 404, {"message": f"Unknown product {parts[2]}"}
+            return 200, engine.depth(parts[2], user)
+        return 404, {"message": f"No route for {method} /{'/'.join(parts)}"}
+
+    def _book_changed(self, product: str) -> None:
+        if self._on_book:
+            self._on_book(product)
+
+    @staticmethod
+    def _user(authorization: str | None) -> str | None:
+        if not authorization or not authorization.startswith("Bearer "):
+            return None
+        return authorization[len("Bearer ") :] or None
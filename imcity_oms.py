@@ -0,0 +1,220 @@
+"""
+Local order management: the bot's own view of its resting orders.
+
+Every order response, fill from the trade stream and cancel updates the
+OrderManager, so "what do I have resting" is a dictionary lookup instead of
+a REST round trip. The exchange stays the source of truth: the manager is
+reconciled against `request_all_orders` periodically or when drift is seen.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Any, Iterable
+
+from imcity_types import OrderResponse, Side, Trade
+
+LevelKey = tuple[Side, float]
+
+
+@dataclass
+class TrackedOrder:
+    id: str
+    product: str
+    side: Side
+    price: float
+    volume: int
+    filled: int
+    recorded_at: float
+
+    @property
+    def remaining(self) -> int:
+        return self.volume - self.filled
+
+    @property
+    def level(self) -> LevelKey:
+        return (self.side, self.price)
+
+
+class OrderManager:
+    """
+    Resting orders indexed by id and, per product, by (side, price) level,
+    with running open volume per (product, side). Looking up a level or all
+    of a product's orders never scans the other products.
+    """
+
+    drift_detected: bool
+    last_reconciled: float
+
+    def __init__(self):
+        self._orders: dict[str, TrackedOrder] = {}
+        # dicts keep insertion order, so each level is FIFO like the exchange queue
+        self._levels: dict[str, dict[LevelKey, dict[str, TrackedOrder]]] = {}
+        self._open: dict[tuple[str, Side], int] = defaultdict(int)
+        self._lock = Lock()
+        self.drift_detected = False
+        self.last_reconciled = monotonic()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._orders
+
+    def get(self, order_id: str) -> TrackedOrder | None:
+        return self._orders.get(order_id)
+
+    def orders(self, product: str | None = None) -> list[TrackedOrder]:
+        with self._lock:
+            if product is None:
+                return list(self._orders.values())
+            return [
+                order
+                for level in self._levels.get(product, {}).values()
+                for order in level.values()
+            ]
+
+    def level_ids(self, product: str, side: Side, price: float) -> list[str]:
+        """
+        Ids resting at a price level, oldest first
+        """
+        with self._lock:
+            return list(self._level(product, side, float(price)))
+
+    def levels(self, product: str) -> dict[tuple[Side, float], dict[str, int]]:
+        """
+        Remaining volume per order id for every level we rest on in `product`
+        """
+        with self._lock:
+            return {
+                level: {oid: order.remaining for oid, order in orders.items()}
+                for level, orders in self._levels.get(product, {}).items()
+            }
+
+    def open_volume(self, product: str, side: Side) -> int:
+        return self._open.get((product, side), 0)
+
+    def record(self, response: OrderResponse) -> None:
+        """
+        Registers an order the exchange accepted
+        """
+        order = TrackedOrder(
+            id=response.id,
+            product=response.product,
+            side=Side(response.side),
+            price=float(response.price),
+            volume=response.volume,
+            filled=response.filled,
+            recorded_at=monotonic(),
+        )
+        with self._lock:
+            if order.id in self._orders or order.remaining <= 0:
+                return
+            self._add(order)
+
+    def remove(self, order_id: str) -> TrackedOrder | None:
+        """
+        Forgets an order, e.g. after it was cancelled
+        """
+        with self._lock:
+            return self._discard(order_id)
+
+    def remove_level(self, product: str, side: Side, price: float) -> list[str]:
+        with self._lock:
+            ids = list(self._level(product, side, float(price)))
+            for order_id in ids:
+                self._discard(order_id)
+            return ids
+
+    def apply_trades(self, trades: Iterable[Trade], username: str) -> None:
+        """
+        Applies our own fills from the trade stream, oldest resting order first.
+        A fill on a level we have no order at means our view has drifted.
+        """
+        for trade in trades:
+            if trade["buyer"] == username:
+                side = Side.BUY
+            elif trade["seller"] == username:
+                side = Side.SELL
+            else:
+                continue
+            self._fill(trade["product"], side, float(trade["price"]), trade["volume"])
+
+    def reconcile(self, orders: list[dict[str, Any]], since: float) -> bool:
+        """
+        Replaces the local view with the exchange's order list, keeping orders
+        recorded after `since` (the time the list was requested) since the list
+        cannot contain them yet. Returns whether the views differed.
+        """
+        exchange = {
+            order["id"]: TrackedOrder(
+                id=order["id"],
+                product=order["product"],
+                side=Side(order["side"]),
+                price=float(order["price"]),
+                volume=order["volume"],
+                filled=order.get("filled", 0),
+                recorded_at=since,
+            )
+            for order in orders
+        }
+        with self._lock:
+            drift = any(
+                order.remaining > 0 and order_id not in self._orders
+                for order_id, order in exchange.items()
+            )
+            for order_id, order in list(self._orders.items()):
+                theirs = exchange.get(order_id)
+                if theirs is None and order.recorded_at > since:
+                    continue
+                if theirs is None or theirs.remaining != order.remaining:
+                    drift = True
+                self._discard(order_id)
+            for order in exchange.values():
+                if order.remaining > 0:
+                    self._add(order)
+            self.drift_detected = False
+            self.last_reconciled = monotonic()
+            return drift
+
+    def _add(self, order: TrackedOrder) -> None:
+        self._orders[order.id] = order
+        levels = self._levels.setdefault(order.product, {})
+        levels.setdefault(order.level, {})[order.id] = order
+        self._open[(order.product, order.side)] += order.remaining
+
+    def _discard(self, order_id: str) -> TrackedOrder | None:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        levels = self._levels[order.product]
+        level = levels[order.level]
+        del level[order_id]
+        if not level:
+            del levels[order.level]
+            if not levels:
+                del self._levels[order.product]
+        self._open[(order.product, order.side)] -= order.remaining
+        return order
+
+    def _level(self, product: str, side: Side, price: float) -> dict[str, TrackedOrder]:
+        return self._levels.get(product, {}).get((side, price), {})
+
+    def _fill(self, product: str, side: Side, price: float, volume: int) -> None:
+        with self._lock:
+            level = self._level(product, side, price)
+            if not level:
+                self.drift_detected = True
+                return
+            for order in list(level.values()):
+                filled = min(volume, order.remaining)
+                order.filled += filled
+                self._open[(product, side)] -= filled
+                volume -= filled
+                if order.remaining == 0:
+                    self._discard(order.id)
+                if volume == 0:
+                    break
+            if volume > 0:
+                self.drift_detected = True
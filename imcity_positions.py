@@ -0,0 +1,140 @@
+"""
+Event-sourced position ledger.
+
+Positions, average cost and realised PnL are updated from our own fills on
+the trade stream rather than by polling `/api/position/current-user`. Each
+product's state is an immutable Position swapped in on update, so strategy
+code can read it without taking a lock.
+"""
+
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Iterable
+
+from imcity_types import Trade
+
+
+@dataclass(frozen=True, slots=True)
+class Position:
+    product: str
+    volume: int = 0
+    avg_price: float = 0.0
+    realised_pnl: float = 0.0
+
+    def unrealised_pnl(self, mark_price: float) -> float:
+        return (mark_price - self.avg_price) * self.volume
+
+    def fill(self, volume: int, price: float) -> "Position":
+        """
+        Position after a fill of signed `volume` at `price`
+        """
+        current = self.volume
+        new_volume = current + volume
+        realised = self.realised_pnl
+        avg_price = self.avg_price
+
+        if current == 0 or (current > 0) == (volume > 0):
+            # opening or adding to the position
+            avg_price = (avg_price * abs(current) + price * abs(volume)) / abs(
+                new_volume
+            )
+        else:
+            closed = min(abs(volume), abs(current))
+            realised += (price - avg_price) * closed * (1 if current > 0 else -1)
+            if new_volume == 0:
+                avg_price = 0.0
+            elif (new_volume > 0) != (current > 0):
+                # flipped through flat, the remainder opens at the fill price
+                avg_price = price
+
+        return Position(self.product, new_volume, avg_price, realised)
+
+
+class PositionLedger:
+    """
+    Per-product positions maintained from the trade stream.
+
+    Reads go straight to a dict of immutable Positions; only writers lock.
+    """
+
+    def __init__(self, positions: dict[str, int] | None = None):
+        self._positions: dict[str, Position] = {}
+        # monotonic time of the last fill per product
+        self._filled_at: dict[str, float] = {}
+        self._lock = Lock()
+        if positions:
+            self.reset(positions)
+
+    def __getitem__(self, product: str) -> int:
+        return self.volume(product)
+
+    def get(self, product: str) -> Position:
+        return self._positions.get(product) or Position(product)
+
+    def volume(self, product: str) -> int:
+        position = self._positions.get(product)
+        return position.volume if position else 0
+
+    def volumes(self) -> dict[str, int]:
+        return {
+            product: position.volume for product, position in self._positions.items()
+        }
+
+    def realised_pnl(self) -> float:
+        return sum(position.realised_pnl for position in self._positions.values())
+
+    def apply_trades(self, trades: Iterable[Trade], username: str) -> None:
+        """
+        Applies our own fills; trades between other users are ignored
+        """
+        for trade in trades:
+            if trade["buyer"] == username:
+                volume = trade["volume"]
+            elif trade["seller"] == username:
+                volume = -trade["volume"]
+            else:
+                continue
+            self.apply_fill(trade["product"], volume, float(trade["price"]))
+
+    def apply_fill(self, product: str, volume: int, price: float) -> Position:
+        with self._lock:
+            position = self.get(product).fill(volume, price)
+            self._positions[product] = position
+            self._filled_at[product] = monotonic()
+            return position
+
+    def reset(self, positions: dict[str, int]) -> None:
+        """
+        Overwrites volumes, e.g. with the exchange's view at start-up
+        """
+        with self._lock:
+            self._reset(positions)
+
+    def reconcile(
+        self, positions: dict[str, int], since: float
+    ) -> dict[str, tuple[int, int]]:
+        """
+        Compares against the exchange's positions and adopts them, skipping
+        products filled after `since` (the monotonic time the positions were
+        requested) since the exchange's view may not contain that fill yet.
+        Returns {product: (local, exchange)} for every product that drifted.
+        """
+        with self._lock:
+            exchange = dict.fromkeys(self._positions, 0) | positions
+            drift = {
+                product: (self.volume(product), volume)
+                for product, volume in exchange.items()
+                if self.volume(product) != volume
+                and self._filled_at.get(product, since) <= since
+            }
+            self._reset({product: volume for product, (_, volume) in drift.items()})
+            return drift
+
+    def _reset(self, positions: dict[str, int]) -> None:
+        for product, volume in positions.items():
+            current = self.get(product)
+            avg_price = current.avg_price if volume else 0.0
+            self._positions[product] = Position(
+                product, volume, avg_price, current.realised_pnl
+            )
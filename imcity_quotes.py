@@ -0,0 +1,120 @@
+"""
+Diff-based quote reconciliation.
+
+Instead of cancelling everything and re-sending on every tick, the
+QuoteManager compares the quotes a strategy wants with the orders the bot's
+OrderManager knows are resting and only sends the cancels and new orders
+needed to close the gap. Unchanged levels keep their queue priority.
+
+Updates do not wait for the exchange, so they can run in market data
+handlers. While a product's requests are in flight its next update waits for
+them, since the diff is only right once the OrderManager has their results.
+"""
+
+from collections import defaultdict
+from concurrent.futures import Future
+from threading import RLock
+from typing import Iterable
+
+from imcity_template import BaseBot
+from imcity_types import OrderRequest, Side
+
+Level = tuple[Side, float]
+
+
+class QuoteManager:
+    """
+    Reconciles desired quotes against the bot's resting orders per product
+    """
+
+    bot: BaseBot
+    cancels_sent: int
+    orders_sent: int
+
+    def __init__(self, bot: BaseBot):
+        self.bot = bot
+        self.cancels_sent = 0
+        self.orders_sent = 0
+        self._lock = RLock()
+        self._inflight: dict[str, list[Future]] = {}
+        self._deferred: dict[str, list[OrderRequest]] = {}
+
+    def resting(self, product: str) -> dict[Level, int]:
+        """
+        Remaining resting volume per (side, price) level for a product
+        """
+        return {
+            level: sum(orders.values())
+            for level, orders in self.bot.oms.levels(product).items()
+        }
+
+    def diff(
+        self, product: str, desired: Iterable[OrderRequest]
+    ) -> tuple[list[str], list[OrderRequest]]:
+        """
+        Returns the order ids to cancel and the orders to send so that the
+        resting orders for `product` match `desired`.
+
+        A level that already rests the desired volume is left alone. A level
+        short of volume is topped up, one with too much is cancelled and re-sent.
+        """
+        wanted: dict[Level, int] = defaultdict(int)
+        for request in desired:
+            if request.volume > 0:
+                wanted[(request.side, float(request.price))] += request.volume
+
+        resting = self.bot.oms.levels(product)
+        cancels: list[str] = []
+        sends: list[OrderRequest] = []
+        for level, orders in resting.items():
+            if level not in wanted:
+                cancels.extend(orders)
+
+        for (side, price), volume in wanted.items():
+            orders = resting.get((side, price), {})
+            have = sum(orders.values())
+            if have == volume:
+                continue
+            if have < volume:
+                missing = volume - have
+            else:
+                cancels.extend(orders)
+                missing = volume
+            sends.append(OrderRequest(product, price, side, missing))
+
+        return cancels, sends
+
+    def update(self, product: str, desired: Iterable[OrderRequest]) -> list[Future]:
+        """
+        Reconciles the resting orders for `product` against `desired`, sending
+        only the difference without waiting for it. Returns the Futures of the
+        cancels and then of the new orders.
+
+        If requests of an earlier update are still in flight, nothing is sent
+        yet: `desired` replaces any update waiting for them and is reconciled
+        once they are done.
+        """
+        desired = list(desired)
+        with self._lock:
+            if not all(future.done() for future in self._inflight.get(product, ())):
+                self._deferred[product] = desired
+                return []
+            self._deferred.pop(product, None)
+            cancels, sends = self.diff(product, desired)
+            futures = self.bot.submit_cancels(cancels) + self.bot.submit_mass_orders(
+                sends
+            )
+            self._inflight[product] = futures
+            self.cancels_sent += len(cancels)
+            self.orders_sent += len(sends)
+        for future in futures:
+            future.add_done_callback(lambda _, product=product: self._resume(product))
+        return futures
+
+    def _resume(self, product: str) -> None:
+        with self._lock:
+            if not all(future.done() for future in self._inflight.get(product, ())):
+                return
+            desired = self._deferred.pop(product, None)
+        if desired is not None:
+            self.update(product, desired)
@@ -0,0 +1,238 @@
+"""
+Outbound request scheduling under the exchange rate limit.
+
+Every REST call is queued with a priority class and released by a background
+flusher as soon as the token bucket allows it. Cancels go out before new
+orders, new orders before queries. Requests queued under the same key are
+coalesced: an identical request joins the queued one and gets its result, a
+replacing one takes its place and the callers of the superseded one see their
+Futures cancelled.
+"""
+
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass, field
+from enum import IntEnum
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+
+class Priority(IntEnum):
+    CANCEL = 0
+    ORDER = 1
+    QUERY = 2
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`
+    """
+
+    rate: float
+    capacity: float
+    tokens: float
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = monotonic()
+
+    def delay(self, now: float | None = None) -> float:
+        """
+        Seconds until a token is available, 0 if one is available now
+        """
+        self._refill(monotonic() if now is None else now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+@dataclass
+class _ScheduledRequest:
+    fn: Callable[[], Any]
+    priority: Priority
+    key: Hashable | None
+    submitted_at: float
+    futures: list[Future] = field(default_factory=list)
+
+
+class RequestScheduler:
+    """
+    Priority queue of outbound requests drained by a background flusher at
+    the rate allowed by a token bucket.
+
+    With an `executor` the flusher only releases requests and the calls run on
+    the executor, so a slow response does not hold up the next token.
+    """
+
+    submitted: int
+    sent: int
+    coalesced: int
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 1,
+        history: int = 1024,
+        executor: Executor | None = None,
+    ):
+        self._bucket = TokenBucket(rate, burst)
+        self._executor = executor
+        self._queues: dict[Priority, deque[_ScheduledRequest]] = {
+            priority: deque() for priority in Priority
+        }
+        self._pending: dict[Hashable, _ScheduledRequest] = {}
+        self._waits: deque[float] = deque(maxlen=history)
+        self._condition = Condition()
+        self._closed = False
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+
+        self._thread = Thread(target=self._run, name="RequestScheduler", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        fn: Callable[[], Any],
+        priority: Priority = Priority.QUERY,
+        key: Hashable | None = None,
+        replace: bool = False,
+    ) -> Future:
+        """
+        Queues `fn` to be called once a token is available.
+
+        If a request with the same `key` is still queued, `fn` is taken to be
+        the same request and the caller receives the queued request's result.
+        With `replace` it supersedes the queued request instead, keeping its
+        place in the queue, and the Futures of the superseded request are
+        cancelled. Requests without a key are never coalesced.
+        """
+        future = Future()
+        superseded: list[Future] = []
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            self.submitted += 1
+
+            queued = self._pending.get(key) if key is not None else None
+            if queued is None:
+                request = _ScheduledRequest(fn, priority, key, monotonic(), [future])
+                self._queues[priority].append(request)
+                if key is not None:
+                    self._pending[key] = request
+                self._condition.notify()
+            elif replace:
+                superseded = queued.futures
+                queued.fn = fn
+                queued.futures = [future]
+                self.coalesced += 1
+            else:
+                queued.futures.append(future)
+                self.coalesced += 1
+        # outside the lock, cancelling runs the callers' callbacks
+        for stale in superseded:
+            stale.cancel()
+        return future
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def queue_depth(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                priority.name: len(queue) for priority, queue in self._queues.items()
+            }
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Queue depth per priority class, counters and recent queue wait times
+        """
+        with self._condition:
+            waits = sorted(self._waits)
+            depth = {
+                priority.name: len(queue) for priority, queue in self._queues.items()
+            }
+        return {
+            "queue_depth": depth,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "wait_ms": {
+                "mean": 1000 * sum(waits) / len(waits) if waits else 0.0,
+                "p50": 1000 * waits[len(waits) // 2] if waits else 0.0,
+                "p99": 1000 * waits[int(len(waits) * 0.99)] if waits else 0.0,
+                "max": 1000 * waits[-1] if waits else 0.0,
+            },
+        }
+
+    def close(self) -> None:
+        """
+        Stops the flusher; queued requests are cancelled
+        """
+        with self._condition:
+            self._closed = True
+            for queue in self._queues.values():
+                for request in queue:
+                    for future in request.futures:
+                        future.cancel()
+                queue.clear()
+            self._pending.clear()
+            self._condition.notify()
+        self._thread.join()
+
+    def _next_request(self) -> _ScheduledRequest | None:
+        with self._condition:
+            while not self._closed:
+                if not any(self._queues.values()):
+                    self._condition.wait()
+                    continue
+                delay = self._bucket.delay()
+                if delay > 0:
+                    # a higher priority request may arrive while we wait
+                    self._condition.wait(delay)
+                    continue
+
+                queue = next(q for q in self._queues.values() if q)
+                request = queue.popleft()
+                if request.key is not None:
+                    del self._pending[request.key]
+                request.futures = [
+                    future
+                    for future in request.futures
+                    if future.set_running_or_notify_cancel()
+                ]
+                if not request.futures:
+                    continue
+                self._bucket.take()
+                self._waits.append(monotonic() - request.submitted_at)
+                self.sent += 1
+                return request
+        return None
+
+    def _run(self) -> None:
+        while (request := self._next_request()) is not None:
+            if self._executor is None:
+                self._execute(request)
+            else:
+                self._executor.submit(self._execute, request)
+
+    def _execute(self, request: _ScheduledRequest) -> None:
+        try:
+            result = request.fn()
+        except BaseException as exc:
+            for future in request.futures:
+                future.set_exception(exc)
+        else:
+            for future in request.futures:
+                future.set_result(result)
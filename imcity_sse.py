@@ -0,0 +1,186 @@
+"""
+Server-sent events support for the market stream.
+
+SSEParser is an incremental, byte-level parser: chunks are appended to one
+reusable buffer and only complete lines are split off and decoded. It
+handles multi-line `data:` fields, comments, `retry:` and keeps the last
+`id:` so a reconnect can resume with `Last-Event-ID`.
+
+Backoff gives jittered exponential reconnect delays so a flapping connection
+neither spins the CPU nor floods stdout.
+"""
+
+import random
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Iterable, Iterator
+
+READ_SIZE = 64 * 1024
+
+_BOM = b"\xef\xbb\xbf"
+
+
+class ConnectionState(StrEnum):
+    CONNECTING = "CONNECTING"
+    CONNECTED = "CONNECTED"
+    DISCONNECTED = "DISCONNECTED"
+    CLOSED = "CLOSED"
+
+
+@dataclass(frozen=True, slots=True)
+class ServerSentEvent:
+    event: str
+    data: str
+    id: str | None = None
+
+
+class SSEParser:
+    """
+    Turns a stream of byte chunks into ServerSentEvents.
+
+    `last_event_id` and `retry` (milliseconds) survive `reset()`, so one parser
+    can follow a stream across reconnects.
+    """
+
+    last_event_id: str | None
+    retry: int | None
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._event = b""
+        self._data: list[bytes] = []
+        self._pending_cr = False
+        self._started = False
+        self.last_event_id = None
+        self.retry = None
+
+    def reset(self) -> None:
+        """
+        Drops any partially received event, e.g. after the connection broke
+        """
+        del self._buffer[:]
+        self._event = b""
+        self._data = []
+        self._pending_cr = False
+        self._started = False
+
+    def feed(self, chunk: bytes) -> list[ServerSentEvent]:
+        """
+        Appends `chunk` and returns the events it completed
+        """
+        buffer = self._buffer
+        buffer += chunk
+        if not self._started:
+            if len(buffer) < len(_BOM) and _BOM.startswith(buffer):
+                return []
+            if buffer.startswith(_BOM):
+                del buffer[: len(_BOM)]
+            self._started = True
+        if self._pending_cr or b"\r" in chunk:
+            self._normalise_line_endings()
+
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = bytes(buffer[:end]).split(b"\n")
+        del buffer[: end + 1]
+
+        events: list[ServerSentEvent] = []
+        data = self._data
+        for line in lines:
+            if not line:
+                if data:
+                    events.append(
+                        ServerSentEvent(
+                            self._event.decode() if self._event else "message",
+                            b"\n".join(data).decode(),
+                            self.last_event_id,
+                        )
+                    )
+                    data = self._data = []
+                self._event = b""
+                continue
+
+            field, _, value = line.partition(b":")
+            if value[:1] == b" ":
+                value = value[1:]
+            if field == b"data":
+                data.append(value)
+            elif field == b"event":
+                self._event = value
+            elif field == b"id":
+                if b"\0" not in value:
+                    self.last_event_id = value.decode()
+            elif field == b"retry":
+                if value.isdigit():
+                    self.retry = int(value)
+            # empty field names are comments, unknown fields are ignored
+        return events
+
+    def events(self, chunks: Iterable[bytes]) -> Iterator[ServerSentEvent]:
+        for chunk in chunks:
+            yield from self.feed(chunk)
+
+    def _normalise_line_endings(self) -> None:
+        # a trailing CR may be the first half of a CRLF split across chunks
+        buffer = self._buffer
+        self._pending_cr = buffer.endswith(b"\r")
+        body = buffer[:-1] if self._pending_cr else buffer
+        buffer[:] = body.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        if self._pending_cr:
+            buffer += b"\r"
+
+
+class Backoff:
+    """
+    Exponential reconnect delays with jitter.
+
+    The n-th consecutive delay is drawn from [cap / 2, cap] where
+    cap = min(maximum, initial * multiplier ** n).
+    """
+
+    initial: float
+    maximum: float
+    multiplier: float
+    attempts: int
+
+    def __init__(
+        self,
+        initial: float = 0.5,
+        maximum: float = 30.0,
+        multiplier: float = 2.0,
+        rng: random.Random | None = None,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.attempts = 0
+        self._rng = rng or random.Random()
+
+    def next_delay(self) -> float:
+        cap = min(self.maximum, self.initial * self.multiplier**self.attempts)
+        self.attempts += 1
+        return self._rng.uniform(cap / 2, cap)
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+
+def iter_chunks(response, size: int = READ_SIZE) -> Iterator[bytes]:
+    """
+    Yields the body of a streaming `requests` response as soon as bytes
+    arrive, up to `size` bytes per read. Reads go to the urllib3 response
+    directly, so they decode any Content-Encoding themselves; the stream is
+    requested with `Accept-Encoding: identity` so there is normally none.
+    """
+    raw = response.raw
+    read1 = getattr(raw, "read1", None)
+    if read1 is None:
+        # urllib3 < 2 has no read1; fall back to small fixed-size reads
+        yield from response.iter_content(chunk_size=512)
+        return
+    while True:
+        chunk = read1(size, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
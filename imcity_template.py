@@ -1,154 +1,94 @@
 import json
-from dataclasses import dataclass, asdict
-from enum import StrEnum
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
 from functools import cached_property
-from threading import Thread
-from typing import Any, Callable, Literal
+from threading import Event, Lock, Thread
+from time import monotonic, time_ns
+from typing import Any, Callable, Hashable, Iterable
 from abc import ABC, abstractmethod
 from traceback import format_exc
-from collections.abc import Mapping
 
 import requests
-import sseclient
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import Retry
+
+from imcity_book import BookManager
+from imcity_dispatch import EventDispatcher
+from imcity_journal import JournalWriter
+from imcity_latency import PARSE, RESPONSE, SUBMIT, TICK_TO_TRADE, LatencyTracker
+from imcity_oms import OrderManager
+from imcity_positions import PositionLedger
+from imcity_scheduler import Priority, RequestScheduler
+from imcity_sse import Backoff, ConnectionState, SSEParser, iter_chunks
+from imcity_types import (
+    DictLikeFrozenDataclassMapping,
+    Product,
+    Trade,
+    Order,
+    OrderBook,
+    Side,
+    OrderRequest,
+    OrderResponse,
+    decode_orderbook,
+    decode_trades,
+    json_loads,
+    parse_orderbook,
+    parse_trades,
+)
 
+STANDARD_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+DEFAULT_TIMEOUT = 5.0
+HOUSEKEEPING_INTERVAL = 1.0
 
-def check_if_right_sse_used():
-    # I don't have a better way to define if it is sseclient or sseclient-py
-    if "maxime.petazzoni" in sseclient.__email__:
-        return
-
-    print(
-        """
-It looks like you have installed the wrong SSE client library.
-Please ensure you have installed `sseclient-py` and not `sseclient`.
-
-To fix this, follow these steps:
-
-1. If you have installed `sseclient`, uninstall it:
-    ```
-    pip uninstall sseclient
-    ```
-
-2. Install `sseclient-py`:
-    ```
-    pip install sseclient-py
-    ```
-
-To avoid such issues, it's recommended to use a virtual environment and install dependencies from `requirements.txt`.
 
-Here's how you can set up a virtual environment and install the correct dependencies:
+def create_session(
+    pool_size: int = 4, retries: int = 2, backoff_factor: float = 0.1
+) -> requests.Session:
+    """
+    Creates a keep-alive session backed by a bounded connection pool.
 
-```
-python3 -m venv .
-source ./bin/activate
-pip3 install -r ./requirements.txt
-```
-"""
+    Connection errors are retried for every method since the request never
+    reached the exchange. Read errors and 5xx responses are only retried for
+    GET/DELETE so an order is never sent twice.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "DELETE"}),
+        raise_on_status=False,
     )
-    quit(1)
-
-
-check_if_right_sse_used()
-
-
-STANDARD_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
-class DictLikeFrozenDataclassMapping(Mapping):
+class SSEThread(Thread):
     """
-    Mixin class to allow frozen dataclasses behave like a dict
+    Reads the market event stream, reconnecting with jittered exponential
+    backoff and resuming from the last event id the server sent
     """
 
-    def __getitem__(self, key: str) -> Any:
-        return getattr(self, key)
-
-    def __iter__(self):
-        return iter(self.__annotations__)
-
-    def __len__(self) -> int:
-        return len(self.__annotations__)
-
-    def to_dict(self) -> dict:
-        return asdict(self)
-
-    def keys(self):
-        return self.__annotations__.keys()
-
-    def values(self):
-        return [getattr(self, k) for k in self.keys()]
-
-    def items(self):
-        return [(k, getattr(self, k)) for k in self.keys()]
-
-
-@dataclass(frozen=True)
-class Product(DictLikeFrozenDataclassMapping):
-    symbol: str
-    tickSize: float
-    startingPrice: int
-    contractSize: int
-
-
-@dataclass(frozen=True)
-class Trade(DictLikeFrozenDataclassMapping):
-    timestamp: str
-    product: str
-    buyer: str
-    seller: str
-    volume: int
-    price: float
-
-
-@dataclass(frozen=True)
-class Order(DictLikeFrozenDataclassMapping):
-    price: float
-    volume: int
-    own_volume: int
-
-
-@dataclass(frozen=True)
-class OrderBook(DictLikeFrozenDataclassMapping):
-    product: str
-    tick_size: float
-    buy_orders: list[Order]
-    sell_orders: list[Order]
-
-
-class Side(StrEnum):
-    BUY = "BUY"
-    SELL = "SELL"
-
-
-@dataclass(frozen=True)
-class OrderRequest:
-    product: str
-    price: float
-    side: Side
-    volume: int
-
-
-@dataclass(frozen=True)
-class OrderResponse:
-    id: str
-    status: Literal["ACTIVE", "PART_FILLED"]
-    product: str
-    side: Side
-    price: float
-    volume: int
-    filled: int
-    user: str
-    timestamp: str
-    targetUser: str | None
-    message: str | None
-
-
-class SSEThread(Thread):
     bearer: str
     url: str
     _handle_orderbook: Callable[[OrderBook], Any]
     _handle_trade_event: Callable[[Trade], Any]
+    _on_state: Callable[[ConnectionState], Any] | None
+    books: BookManager
+    parser: SSEParser
+    backoff: Backoff
+    state: ConnectionState
+    recorder: JournalWriter | None
+    latency: LatencyTracker | None
     _http_stream: requests.Response | None = None
-    _client: sseclient.SSEClient | None = None
     _closed: bool = False
 
     def __init__(
@@ -157,6 +97,10 @@ class SSEThread(Thread):
         url: str,
         handle_orderbook: Callable[[OrderBook], Any],
         handle_trade_event: Callable[[Trade], Any],
+        on_state: Callable[[ConnectionState], Any] | None = None,
+        backoff: Backoff | None = None,
+        recorder: JournalWriter | None = None,
+        latency: LatencyTracker | None = None,
     ):
         super().__init__()
 
@@ -164,73 +108,136 @@ class SSEThread(Thread):
         self.url = url
         self._handle_orderbook = handle_orderbook
         self._handle_trade_event = handle_trade_event
+        self._on_state = on_state
+        self.books = BookManager()
+        self._books_lock = Lock()
+        self.parser = SSEParser()
+        self.backoff = backoff or Backoff()
+        self.state = ConnectionState.DISCONNECTED
+        self.recorder = recorder
+        self.latency = latency
+        self._wakeup = Event()
 
     def run(self):
         while not self._closed:
+            self._set_state(ConnectionState.CONNECTING)
             try:
                 self._start_sse_client()
+                reason = "stream ended"
+            except (requests.RequestException, Urllib3Error, OSError) as e:
+                reason = repr(e)
             except Exception:
+                reason = "unexpected error"
                 if not self._closed:
-                    print("Encountered an error. Trying to restart SSE client...")
                     print(format_exc())
+            if self._closed:
+                break
+
+            self._set_state(ConnectionState.DISCONNECTED)
+            if self.parser.retry is not None:
+                self.backoff.initial = self.parser.retry / 1000
+            delay = self.backoff.next_delay()
+            print(f"SSE connection lost ({reason}). Reconnecting in {delay:.1f}s...")
+            self._wakeup.wait(delay)
+        self._set_state(ConnectionState.CLOSED)
 
     def close(self):
         self._closed = True
+        self._wakeup.set()
         if self._http_stream:
             self._http_stream.close()
-        if self._client:
-            self._client.close()
 
-    def _handle_orderbook_change(self, orderbook: dict[str, Any]):
-        buy_orders = sorted(
-            [
-                {
-                    "price": float(order["price"]),
-                    "volume": order["volume"],
-                    "own_volume": order["userOrderVolume"],
-                }
-                for order in orderbook["buy"]
-            ],
-            key=lambda d: -d["price"],
-        )
-        sell_orders = sorted(
-            [
-                {
-                    "price": float(order["price"]),
-                    "volume": order["volume"],
-                    "own_volume": order["userOrderVolume"],
-                }
-                for order in orderbook["sell"]
-            ],
-            key=lambda d: d["price"],
-        )
+    def _set_state(self, state: ConnectionState) -> None:
+        self.state = state
+        if self._on_state:
+            try:
+                self._on_state(state)
+            except Exception:
+                print(format_exc())
 
-        self._handle_orderbook(
-            OrderBook(
-                orderbook["product"],
-                orderbook["tickSize"],
-                list(map(lambda order: Order(**order), buy_orders)),
-                list(map(lambda order: Order(**order), sell_orders)),
-            )
-        )
+    def _handle_orderbook_change(self, orderbook: dict[str, Any]):
+        with self._books_lock:
+            snapshot = self.books.apply(orderbook)
+            if snapshot is not None:
+                if self.latency is not None:
+                    self.latency.record(PARSE, time_ns() - self.latency.current_tick())
+                # under the lock, so a resync cannot hand over an older book after it
+                self._handle_orderbook(snapshot)
+
+    def products(self) -> list[str]:
+        with self._books_lock:
+            return list(self.books.books)
+
+    def book_version(self, product: str) -> int:
+        with self._books_lock:
+            return self.books.version(product)
+
+    def resync_orderbook(
+        self, orderbook: OrderBook, version: int | None = None
+    ) -> OrderBook | None:
+        """
+        Applies a REST snapshot to the local book and hands the new snapshot to
+        the order book handler if anything changed (see `BookManager.resync`).
+        Safe to call from any thread.
+        """
+        with self._books_lock:
+            snapshot = self.books.resync(orderbook, version)
+            if snapshot is not None:
+                # under the lock, so a newer stream book cannot be handed over first
+                self._handle_orderbook(snapshot)
+        return snapshot
+
+    def republish_orderbook(self, product: str) -> OrderBook | None:
+        """
+        Hands the current local book of `product` to the order book handler
+        again and returns it, or None if the stream has not seen `product`.
+        Safe to call from any thread.
+        """
+        with self._books_lock:
+            if product not in self.books:
+                return None
+            snapshot = self.books[product].snapshot()
+            # under the lock, so a newer book cannot be handed over first
+            self._handle_orderbook(snapshot)
+        return snapshot
 
     def _start_sse_client(self):
         headers = {
             "Authorization": self.bearer,
             "Accept": "text/event-stream; charset=utf-8",
+            # compression would hold events back until a block fills up
+            "Accept-Encoding": "identity",
         }
+        if self.parser.last_event_id is not None:
+            headers["Last-Event-ID"] = self.parser.last_event_id
 
+        self.parser.reset()
         self._http_stream = requests.get(
             self.url, stream=True, headers=headers, timeout=30
         )
-        self._client = sseclient.SSEClient(self._http_stream)
-
-        for event in self._client.events():
-            if event.event == "order":
-                # self._handle_orderbook_change(json.loads(event.data))
-                pass
-            elif event.event == "trade":
-                self._handle_trade_event(json.loads(event.data))
+        self._http_stream.raise_for_status()
+        self._set_state(ConnectionState.CONNECTED)
+
+        feed = self.parser.feed
+        recorder = self.recorder
+        latency = self.latency
+        for chunk in iter_chunks(self._http_stream):
+            received_ns = time_ns()
+            events = feed(chunk)
+            if not events:
+                continue
+            self.backoff.reset()
+            if latency is not None:
+                latency.set_current_tick(received_ns)
+            for event in events:
+                if event.event == "order":
+                    if recorder is not None:
+                        recorder.record(event.event, event.data, received_ns)
+                    self._handle_orderbook_change(json_loads(event.data))
+                elif event.event == "trade":
+                    if recorder is not None:
+                        recorder.record(event.event, event.data, received_ns)
+                    self._handle_trade_event(decode_trades(event.data))
 
 
 class BaseBot(ABC):
@@ -238,11 +245,72 @@ class BaseBot(ABC):
     _password: str
     _cmi_url: str
     _sse_thread: SSEThread = None
+    _session: requests.Session
+    _timeout: float
+    scheduler: RequestScheduler | None
+    _executor: ThreadPoolExecutor
+    _requests_closed: bool = False
+    oms: OrderManager
+    ledger: PositionLedger
+    reconcile_interval: float
+    position_reconcile_interval: float
+    dispatch_workers: int
+    dispatcher: EventDispatcher | None = None
+    journal_dir: str | None
+    recorder: JournalWriter | None = None
+    latency: LatencyTracker
+    latency_report_interval: float | None
+    _housekeeping_thread: Thread | None = None
 
-    def __init__(self, cmi_url: str, username: str, password: str):
+    def __init__(
+        self,
+        cmi_url: str,
+        username: str,
+        password: str,
+        pool_size: int = 4,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = 2,
+        rate_limit: float | None = 1.0,
+        burst: int = 4,
+        reconcile_interval: float = 30.0,
+        position_reconcile_interval: float = 60.0,
+        dispatch_workers: int = 2,
+        journal_dir: str | None = None,
+        latency_report_interval: float | None = None,
+    ):
         self._cmi_url = cmi_url
         self.username = username
         self._password = password
+        self._session = create_session(pool_size=pool_size, retries=retries)
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._rate_limit = rate_limit
+        self._burst = burst
+        self._open_requests()
+        self.oms = OrderManager()
+        self.ledger = PositionLedger()
+        self.reconcile_interval = reconcile_interval
+        self.position_reconcile_interval = position_reconcile_interval
+        self._positions_reconciled = monotonic()
+        self.dispatch_workers = dispatch_workers
+        self.journal_dir = journal_dir
+        self.latency = LatencyTracker()
+        self.latency_report_interval = latency_report_interval
+        self._latency_reported = monotonic()
+        self._stopping = Event()
+
+    def _open_requests(self) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._pool_size, thread_name_prefix="BaseBot"
+        )
+        # the default burst covers a requote of both sides, two cancels and
+        # two new orders, without waiting for tokens
+        self.scheduler = (
+            RequestScheduler(self._rate_limit, self._burst, executor=self._executor)
+            if self._rate_limit
+            else None
+        )
+        self._requests_closed = False
 
     @cached_property
     def auth_token(self):
@@ -252,34 +320,134 @@ class BaseBot(ABC):
         self, on_orderbook: Callable | None = None, on_trades: Callable | None = None
     ) -> None:
         """
-        Creates SSE thread to handle market events
+        Creates SSE thread to read market events and the dispatcher that runs
+        the handlers for them. With `journal_dir` set, every event is also
+        recorded to a market data journal there. Stage latencies of every
+        order book event are kept in `self.latency`, and printed every
+        `latency_report_interval` seconds when that is set.
         """
         if self._sse_thread:
             raise Exception(
                 "Bot already running. Please use the `stop()` method before trying again."
             )
 
+        if self._requests_closed:
+            # stopped before
+            self._open_requests()
+        self.dispatcher = EventDispatcher(
+            handle_orderbook=on_orderbook or self.on_orderbook,
+            handle_trades=on_trades or self.on_trades,
+            workers=self.dispatch_workers,
+            latency=self.latency,
+        )
+        if self.journal_dir:
+            self.recorder = JournalWriter(self.journal_dir)
         self._sse_thread = SSEThread(
             bearer=self.auth_token,
             url=f"{self._cmi_url}/api/market/stream",
-            handle_orderbook=on_orderbook or self.on_orderbook,
-            handle_trade_event=on_trades or self.on_trades,
+            handle_orderbook=self.dispatcher.publish_orderbook,
+            handle_trade_event=self._handle_trades,
+            on_state=self._on_stream_state,
+            recorder=self.recorder,
+            latency=self.latency,
         )
 
         print("Starting SSEThread...")
         self._sse_thread.start()
         print("SSEThread started.")
 
+        self._stopping.clear()
+        self._housekeeping_thread = Thread(
+            target=self._housekeeping_loop, name="BaseBotHousekeeping", daemon=True
+        )
+        self._housekeeping_thread.start()
+
     def stop(self) -> None:
         """
-        Closes SSE thread
+        Closes SSE thread, then the request scheduler and worker pool:
+        requests still waiting for the rate limit are cancelled, those already
+        sent are waited for
         """
         print("Closing SSE Thread...")
+        self._stopping.set()
         self._sse_thread.close()
         self._sse_thread.join()
         self._sse_thread = None
+        if self.recorder:
+            try:
+                self.recorder.close()
+            except RuntimeError:
+                print(f"Market data journal incomplete:\n{format_exc()}")
+            self.recorder = None
+        self.dispatcher.close()
+        self.dispatcher = None
+        self._housekeeping_thread.join()
+        self._housekeeping_thread = None
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self._executor.shutdown(wait=True)
+        self._requests_closed = True
         print("SSE Thread closed")
 
+    def _handle_trades(self, trades: list[Trade]) -> None:
+        self.oms.apply_trades(trades, self.username)
+        self.ledger.apply_trades(trades, self.username)
+        self.dispatcher.publish_trades(trades)
+
+    def _housekeeping_loop(self) -> None:
+        while not self._stopping.wait(HOUSEKEEPING_INTERVAL):
+            try:
+                self._housekeeping()
+            except Exception:
+                print(f"Housekeeping failed:\n{format_exc()}")
+
+    def _housekeeping(self) -> None:
+        """
+        Periodic background maintenance, runs every HOUSEKEEPING_INTERVAL seconds
+        """
+        if (
+            self.oms.drift_detected
+            or monotonic() - self.oms.last_reconciled > self.reconcile_interval
+        ):
+            self.reconcile_orders()
+        if monotonic() - self._positions_reconciled > self.position_reconcile_interval:
+            self.reconcile_positions()
+        if (
+            self.latency_report_interval
+            and monotonic() - self._latency_reported > self.latency_report_interval
+        ):
+            self._latency_reported = monotonic()
+            print(f"Tick-to-trade latency (us):\n{self.latency.report()}")
+
+    def reconcile_orders(self) -> bool | None:
+        """
+        Resyncs the local order manager with the exchange's list of our orders.
+        Returns whether the local view had drifted, None if the request failed.
+        """
+        since = monotonic()
+        orders = self.request_all_orders()
+        if orders is None:
+            return None
+        drift = self.oms.reconcile(orders, since)
+        if drift:
+            print("Local order state drifted from the exchange, resynced.")
+        return drift
+
+    def reconcile_positions(self) -> dict[str, tuple[int, int]] | None:
+        """
+        Checks the trade-stream position ledger against the exchange and adopts
+        the exchange's positions. Returns {product: (local, exchange)} for every
+        product that drifted, None if the request failed.
+        """
+        since = self._positions_reconciled = monotonic()
+        positions = self.request_positions()
+        if positions is None:
+            return None
+        drift = self.ledger.reconcile(positions, since)
+        for product, (local, exchange) in drift.items():
+            print(f"Position drift on {product}: local {local}, exchange {exchange}")
+        return drift
+
     @abstractmethod
     def on_orderbook(self, orderbook: OrderBook):
         raise NotImplementedError("You must implement the on_orderbook method!")
@@ -288,74 +456,286 @@ class BaseBot(ABC):
     def on_trades(self, trades: list[Trade]):
         raise NotImplementedError("You must implement the on_trades method!")
 
+    def _on_stream_state(self, state: ConnectionState) -> None:
+        if state == ConnectionState.CONNECTED:
+            # anything missed while disconnected is only visible in a snapshot
+            self.resync_books()
+        self.on_connection_state(state)
+
+    def on_connection_state(self, state: ConnectionState) -> None:
+        """
+        Called on the SSE thread whenever the market stream connects,
+        drops or closes
+        """
+
     def _get_headers(self) -> dict[str, str]:
         return {**STANDARD_HEADERS, "Authorization": self.auth_token}
 
+    def _submit_request(
+        self,
+        method: str,
+        url: str,
+        priority: Priority = Priority.QUERY,
+        key: Hashable | None = None,
+        timeout: float | None = None,
+        replace: bool = False,
+        **kwargs,
+    ) -> Future:
+        """
+        Queues a request on the shared keep-alive session without waiting for it.
+        Goes through the rate limit scheduler when one is configured, otherwise
+        straight to the bot's worker pool. See `RequestScheduler.submit` for
+        `key` and `replace`.
+        """
+
+        def send() -> requests.Response:
+            return self._session.request(
+                method, url, timeout=timeout or self._timeout, **kwargs
+            )
+
+        if self.scheduler is None:
+            return self._executor.submit(send)
+        return self.scheduler.submit(send, priority, key, replace)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        priority: Priority = Priority.QUERY,
+        key: Hashable | None = None,
+        timeout: float | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Sends a request and waits for the response
+        """
+        if self.scheduler is None:
+            return self._session.request(
+                method, url, timeout=timeout or self._timeout, **kwargs
+            )
+        return self._submit_request(
+            method, url, priority, key, timeout, **kwargs
+        ).result()
+
     def send_order(self, order_request: OrderRequest) -> OrderResponse | None:
+        """
+        Sends an order and waits for its OrderResponse (None if the exchange
+        rejected it). Without a rate limit the request is made on the calling
+        thread, like `_request`.
+        """
+        if self.scheduler is not None:
+            return self.submit_order(order_request).result()
+        tick_ns, submitted_ns = self._order_submitted()
+        try:
+            response = self._request(
+                "POST",
+                f"{self._cmi_url}/api/order",
+                json=asdict(order_request),
+                headers=self._get_headers(),
+            )
+        finally:
+            self._order_responded(tick_ns, submitted_ns)
+        return self._order_result(order_request, response)
+
+    def submit_order(
+        self,
+        order_request: OrderRequest,
+        callback: Callable[[OrderRequest, OrderResponse | None], Any] | None = None,
+        key: Hashable | None = None,
+    ) -> Future:
+        """
+        Sends an order without blocking and returns a Future of its OrderResponse
+        (None if the exchange rejected it).
+
+        An order with a `key` replaces the order submitted under the same key
+        if that one is still waiting for the rate limit: only the newest is
+        sent, and the Futures of the ones it replaced are cancelled without
+        their callbacks running. Orders without a key are always sent.
+
+        `callback` runs on a worker thread once the response is in. It must not
+        wait on other bot requests, use `submit_order` from there instead.
+        """
+        tick_ns, submitted_ns = self._order_submitted()
         payload = asdict(order_request)
         url = f"{self._cmi_url}/api/order"
-        response = requests.post(url, json=payload, headers=self._get_headers())
-        if response.status_code == 200:
-            return OrderResponse(**response.json())
-        else:
+        response_future = self._submit_request(
+            "POST",
+            url,
+            priority=Priority.ORDER,
+            key=None if key is None else ("order", key),
+            replace=True,
+            json=payload,
+            headers=self._get_headers(),
+        )
+        order_future = Future()
+
+        def done(future: Future) -> None:
+            if future.cancelled():
+                # replaced before it was sent
+                order_future.cancel()
+                return
+            self._order_responded(tick_ns, submitted_ns)
+            try:
+                result = self._order_result(order_request, future.result())
+            except BaseException as exc:
+                order_future.set_exception(exc)
+                return
+
+            order_future.set_result(result)
+            if callback is not None:
+                try:
+                    callback(order_request, result)
+                except Exception:
+                    print(f"Order callback failed:\n{format_exc()}")
+
+        response_future.add_done_callback(done)
+        return order_future
+
+    def _order_submitted(self) -> tuple[int | None, int]:
+        tick_ns = self.latency.current_tick()
+        submitted_ns = time_ns()
+        if tick_ns is not None:
+            self.latency.record(SUBMIT, submitted_ns - tick_ns)
+        return tick_ns, submitted_ns
+
+    def _order_responded(self, tick_ns: int | None, submitted_ns: int) -> None:
+        responded_ns = time_ns()
+        self.latency.record(RESPONSE, responded_ns - submitted_ns)
+        if tick_ns is not None:
+            self.latency.record(TICK_TO_TRADE, responded_ns - tick_ns)
+
+    def _order_result(
+        self, order_request: OrderRequest, response: requests.Response
+    ) -> OrderResponse | None:
+        if response.status_code != 200:
             print(
                 f"Failed to send order, {order_request}, with response {response.content}"
             )
+            return None
+        result = OrderResponse(**response.json())
+        self.oms.record(result)
+        return result
 
-    def send_mass_orders(
-        self, order_requests: list[OrderRequest]
-    ) -> list[OrderResponse]:
-        responses = []
-
-        def worker(order_request, response_list):
-            response = self.send_order(order_request)
-            response_list.append(response)
-
-        threads = []
-        for order_request in order_requests:
-            thread = Thread(target=worker, args=(order_request, responses))
-            threads.append(thread)
-            thread.start()
+    def submit_mass_orders(
+        self,
+        order_requests: list[OrderRequest],
+        callback: Callable[[OrderRequest, OrderResponse | None], Any] | None = None,
+    ) -> list[Future]:
+        """
+        Sends all orders without blocking and returns their Futures in request
+        order, see `submit_order`
+        """
+        return [self.submit_order(request, callback) for request in order_requests]
 
-        for thread in threads:
-            thread.join()
+    def send_mass_orders(
+        self,
+        order_requests: list[OrderRequest],
+        callback: Callable[[OrderRequest, OrderResponse | None], Any] | None = None,
+    ) -> list[OrderResponse | None]:
+        """
+        Sends all orders through the worker pool and returns the responses in
+        request order.
 
-        return responses
+        Waits for every order to pass the rate limit, which with a scheduler
+        takes 1 / `rate_limit` seconds per order beyond the burst. Handlers
+        should use `submit_mass_orders` instead so they do not hold up the
+        dispatcher.
+        """
+        futures = self.submit_mass_orders(order_requests, callback)
+        return [future.result() for future in futures]
 
     def request_all_orders(self) -> list[dict] | None:
         url = f"{self._cmi_url}/api/order/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._request("GET", url, key=url, headers=self._get_headers())
         if response.status_code == 200:
             return response.json()
         else:
             print(f"Failed to get all orders: {response.content}")
 
     def cancel_order_by_id(self, order_id: str) -> dict | None:
+        return self.submit_cancel(order_id).result()
+
+    def submit_cancel(self, order_id: str) -> Future:
+        """
+        Cancels an order without blocking and returns a Future of the
+        exchange's response (None if the cancel failed). The order manager is
+        updated before the Future resolves.
+        """
         url = f"{self._cmi_url}/api/order/{order_id}"
-        response = requests.delete(url, headers=self._get_headers())
-        if response.status_code == 200:
-            return response.json()
+        response_future = self._submit_request(
+            "DELETE",
+            url,
+            priority=Priority.CANCEL,
+            key=url,
+            headers=self._get_headers(),
+        )
+        cancel_future = Future()
 
-        print(f"Failed to cancel order: {response.content}")
+        def done(future: Future) -> None:
+            try:
+                response = future.result()
+                if response.status_code == 200:
+                    self.oms.remove(order_id)
+                    result = response.json()
+                else:
+                    # the order may have been filled or cancelled behind our back
+                    self.oms.drift_detected = True
+                    result = None
+                    print(f"Failed to cancel order: {response.content}")
+            except BaseException as exc:
+                cancel_future.set_exception(exc)
+                return
+            cancel_future.set_result(result)
+
+        response_future.add_done_callback(done)
+        return cancel_future
+
+    def submit_cancels(self, order_ids: list[str]) -> list[Future]:
+        """
+        Cancels the given orders without blocking, see `submit_cancel`
+        """
+        return [self.submit_cancel(order_id) for order_id in order_ids]
 
     def cancel_order(self, product: str, price: float) -> dict | None:
         url = f"{self._cmi_url}/api/order?product={product}&price={price}"
-        response = requests.delete(url, headers=self._get_headers())
+        response = self._request(
+            "DELETE",
+            url,
+            priority=Priority.CANCEL,
+            key=url,
+            headers=self._get_headers(),
+        )
         if response.status_code == 200:
+            self.oms.remove_level(product, Side.BUY, price)
+            self.oms.remove_level(product, Side.SELL, price)
             return response.json()
         else:
             print(f"Failed to cancel order: {response.content}")
 
-    def cancel_all_orders(self) -> None:
-        for order in self.request_all_orders():
-            url = f"{self._cmi_url}/api/order/{order['id']}"
-            response = requests.delete(url, headers=self._get_headers())
-            if response.status_code != 200:
-                print(f"Failed to cancel order: {response.content}")
+    def cancel_level(self, product: str, side: Side, price: float) -> None:
+        """
+        Cancels our orders resting at one price level, looked up locally
+        """
+        self.cancel_orders(self.oms.level_ids(product, side, price))
+
+    def cancel_all_orders(self, product: str | None = None) -> None:
+        """
+        Cancels every order we have resting (optionally for one product),
+        looked up locally instead of asking the exchange
+        """
+        self.cancel_orders([order.id for order in self.oms.orders(product)])
+
+    def cancel_orders(self, order_ids: list[str]) -> None:
+        """
+        Cancels the given orders concurrently and waits for all of them.
+        Handlers should use `submit_cancels` instead, like `send_mass_orders`.
+        """
+        for future in self.submit_cancels(order_ids):
+            future.result()
 
     def request_all_products(self) -> list[Product] | None:
         url = f"{self._cmi_url}/api/product"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._request("GET", url, key=url, headers=self._get_headers())
         if response.status_code == 200:
             return list(map(lambda prod: Product(**prod), json.loads(response.text)))
         else:
@@ -363,7 +743,7 @@ class BaseBot(ABC):
 
     def request_positions(self) -> dict[str, int] | None:
         url = f"{self._cmi_url}/api/position/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._request("GET", url, key=url, headers=self._get_headers())
         if response.status_code == 200:
             return {
                 position["product"]: position["volume"] for position in response.json()
@@ -373,7 +753,7 @@ class BaseBot(ABC):
 
     def request_net_positions(self) -> dict[str, int] | None:
         url = f"{self._cmi_url}/api/position/current-user"
-        response = requests.get(url, headers=self._get_headers())
+        response = self._request("GET", url, key=url, headers=self._get_headers())
         if response.status_code == 200:
             return {
                 position["product"]: position["netPosition"]
@@ -383,37 +763,107 @@ class BaseBot(ABC):
             print(f"Failed to get net positions for user: {response.content}")
 
     def request_order_book_per_product(self, product: str) -> OrderBook | None:
-        url = f"{self._cmi_url}/api/product/{product}/order-book/current-user?sessionId=CRAB"
-        response = requests.get(url, headers=self._get_headers())
-        if response.status_code == 200:
-            self._sse_thread._handle_orderbook_change(json.loads(response.text))
-            return True
-        #     orderbook_data = response.json()
-        #     buy_orders = list(
-        #         map(
-        #             lambda order: Order(**order),
-        #             orderbook_data["buy"],
-        #         )
-        #     )
-        #     sell_orders = list(
-        #         map(
-        #             lambda order: Order(**order),
-        #             orderbook_data["sell"],
-        #         )
-        #     )
-        #     return OrderBook(
-        #         product=orderbook_data["product"],
-        #         tick_size=orderbook_data["tickSize"],
-        #         buy_orders=buy_orders,
-        #         sell_orders=sell_orders,
-        #     )
-        # else:
-        #     print(f"Failed to get order book for {product}: {response.content}")
+        return self.submit_order_book_request(product).result()
+
+    def submit_order_book_request(self, product: str) -> Future:
+        """
+        Requests the current order book for `product` without blocking and
+        returns a Future of the OrderBook (None if the request failed)
+        """
+        url = f"{self._cmi_url}/api/product/{product}/order-book/current-user"
+        response_future = self._submit_request(
+            "GET", url, key=url, headers=self._get_headers()
+        )
+        orderbook_future = Future()
+
+        def done(future: Future) -> None:
+            try:
+                response = future.result()
+                if response.status_code == 200:
+                    result = decode_orderbook(response.content)
+                else:
+                    result = None
+                    print(f"Failed to get order book for {product}: {response.content}")
+            except BaseException as exc:
+                orderbook_future.set_exception(exc)
+                return
+            orderbook_future.set_result(result)
+
+        response_future.add_done_callback(done)
+        return orderbook_future
+
+    def request_order_books(self, products: Iterable[str]) -> dict[str, OrderBook]:
+        """
+        Fetches the order books of several products concurrently, paced by the
+        request scheduler. Products whose request failed are left out.
+        """
+        futures = {
+            product: self.submit_order_book_request(product) for product in products
+        }
+        orderbooks = {}
+        for product, future in futures.items():
+            try:
+                orderbook = future.result()
+            except Exception as e:
+                print(f"Failed to get order book for {product}: {e!r}")
+                continue
+            if orderbook is not None:
+                orderbooks[product] = orderbook
+        return orderbooks
+
+    def resync_books(self, products: Iterable[str] | None = None) -> list[Future]:
+        """
+        Refreshes the stream's local books from REST snapshots without blocking.
+
+        Defaults to every product the stream has seen. Each snapshot is applied
+        once it arrives; books whose levels are unchanged, or that the
+        stream updated while the snapshot was in flight, are skipped, the rest
+        go to `on_orderbook` like a stream update. Returns one Future per
+        product resolving to the applied OrderBook, or None if it was skipped.
+        """
+        sse_thread = self._sse_thread
+        if sse_thread is None:
+            raise Exception("Bot not running. Please use the `start()` method first.")
+
+        if products is None:
+            products = sse_thread.products()
+        return [self._resync_book(sse_thread, product) for product in products]
+
+    def replay_orderbook(self, product: str) -> OrderBook | None:
+        """
+        Runs `on_orderbook` for the current book of `product` again, through
+        the dispatcher like a stream update, for when something other than the
+        book changed what the strategy would do, e.g. its fair value. Returns
+        the book, or None if the stream has not seen `product` yet.
+        """
+        sse_thread = self._sse_thread
+        if sse_thread is None:
+            raise Exception("Bot not running. Please use the `start()` method first.")
+        return sse_thread.republish_orderbook(product)
+
+    def _resync_book(self, sse_thread: SSEThread, product: str) -> Future:
+        version = sse_thread.book_version(product)
+        resync_future = Future()
+
+        def done(future: Future) -> None:
+            try:
+                orderbook = future.result()
+                applied = None
+                if orderbook is not None:
+                    applied = sse_thread.resync_orderbook(orderbook, version)
+            except BaseException as exc:
+                print(f"Failed to resync order book for {product}: {exc!r}")
+                resync_future.set_exception(exc)
+                return
+            resync_future.set_result(applied)
+
+        self.submit_order_book_request(product).add_done_callback(done)
+        return resync_future
 
     def _authenticate(self) -> str:
         auth = {"username": self.username, "password": self._password}
         url = f"{self._cmi_url}/api/user/authenticate"
-        response = requests.post(url, headers=STANDARD_HEADERS, json=auth)
+        response = self._request("POST", url, headers=STANDARD_HEADERS, json=auth)
         response.raise_for_status()
 
         return response.headers["Authorization"]
@@ -0,0 +1,180 @@
+"""
+Market data and order types shared by the exchange clients
+"""
+
+import json
+from dataclasses import dataclass, asdict
+from enum import StrEnum
+from operator import attrgetter
+from typing import Any, Callable, Literal
+from collections.abc import Mapping, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson decodes several times faster and accepts both str and bytes
+json_loads: Callable[[str | bytes], Any] = orjson.loads if orjson else json.loads
+
+_VALUE_GETTERS: dict[type, attrgetter] = {}
+
+
+class DictLikeFrozenDataclassMapping(Mapping):
+    """
+    Mixin class to allow frozen dataclasses behave like a dict
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__match_args__)
+
+    def __len__(self) -> int:
+        return len(self.__match_args__)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def keys(self):
+        return self.__match_args__
+
+    def values(self):
+        getter = _VALUE_GETTERS.get(type(self))
+        if getter is None:
+            getter = _VALUE_GETTERS[type(self)] = attrgetter(*self.__match_args__)
+        return getter(self)
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.__match_args__]
+
+
+@dataclass(frozen=True, slots=True)
+class Product(DictLikeFrozenDataclassMapping):
+    symbol: str
+    tickSize: float
+    startingPrice: int
+    contractSize: int
+
+
+@dataclass(frozen=True, slots=True)
+class Trade(DictLikeFrozenDataclassMapping):
+    timestamp: str
+    product: str
+    buyer: str
+    seller: str
+    volume: int
+    price: float
+
+
+@dataclass(frozen=True, slots=True)
+class Order(DictLikeFrozenDataclassMapping):
+    price: float
+    volume: int
+    own_volume: int
+
+
+@dataclass(frozen=True, slots=True)
+class OrderBook(DictLikeFrozenDataclassMapping):
+    product: str
+    tick_size: float
+    # lists when parsed from a payload, tuples in local book snapshots
+    buy_orders: Sequence[Order]
+    sell_orders: Sequence[Order]
+
+    def same_content(self, other: "OrderBook") -> bool:
+        """
+        Whether both books hold the same levels, whatever sequence types
+        their sides are
+        """
+        return (
+            self.product == other.product
+            and float(self.tick_size) == float(other.tick_size)
+            and tuple(self.buy_orders) == tuple(other.buy_orders)
+            and tuple(self.sell_orders) == tuple(other.sell_orders)
+        )
+
+
+class Side(StrEnum):
+    BUY = "BUY"
+    SELL = "SELL"
+
+
+@dataclass(frozen=True, slots=True)
+class OrderRequest:
+    product: str
+    price: float
+    side: Side
+    volume: int
+
+
+@dataclass(frozen=True, slots=True)
+class OrderResponse:
+    id: str
+    status: Literal["ACTIVE", "PART_FILLED"]
+    product: str
+    side: Side
+    price: float
+    volume: int
+    filled: int
+    user: str
+    timestamp: str
+    targetUser: str | None
+    message: str | None
+
+
+def parse_orderbook(orderbook: dict[str, Any]) -> OrderBook:
+    """
+    Builds an OrderBook from an exchange order book payload, best levels first
+    """
+    buy_orders = [
+        Order(float(order["price"]), order["volume"], order["userOrderVolume"])
+        for order in orderbook["buy"]
+    ]
+    sell_orders = [
+        Order(float(order["price"]), order["volume"], order["userOrderVolume"])
+        for order in orderbook["sell"]
+    ]
+    buy_orders.sort(key=_by_price, reverse=True)
+    sell_orders.sort(key=_by_price)
+
+    return OrderBook(
+        orderbook["product"], orderbook["tickSize"], buy_orders, sell_orders
+    )
+
+
+def decode_orderbook(raw: str | bytes) -> OrderBook:
+    """
+    Decodes an order book event or REST body straight into an OrderBook
+    """
+    return parse_orderbook(json_loads(raw))
+
+
+def parse_trades(trades: list[dict[str, Any]]) -> list[Trade]:
+    """
+    Builds Trades from an exchange trade event payload
+    """
+    return [
+        Trade(
+            trade.get("timestamp"),
+            trade["product"],
+            trade["buyer"],
+            trade["seller"],
+            trade["volume"],
+            trade["price"],
+        )
+        for trade in trades
+    ]
+
+
+def decode_trades(raw: str | bytes) -> list[Trade]:
+    """
+    Decodes a trade event straight into Trade objects
+    """
+    return parse_trades(json_loads(raw))
+
+
+_by_price = attrgetter("price")
@@ -0,0 +1,171 @@
+"""
+The loop implementations the settlement formulas of estimates.markets used
+before they were vectorized, random inputs for them and the parity check
+between the two, shared by the tests and benchmarks.
+"""
+
+import numpy as np
+import pandas as pd
+
+from estimates import markets
+
+# --- reference --------------------------------------------------------------
+
+
+def reference_1(flow_rate, water_level):
+    return round(flow_rate * water_level)
+
+
+def reference_2(flow_rates, water_levels, strike=5000):
+    settlement = round(
+        (max(water_levels) - max(flow_rates)) * (min(water_levels) - min(flow_rates))
+    )
+    return max(0.0, settlement - strike)
+
+
+def reference_3(temps, humidities):
+    return abs(sum(t * 2 + h for t, h in zip(temps, humidities)))
+
+
+def reference_4(temps, humidities):
+    total = 0
+    for (T, medT, meanT), (H, medH, meanH) in zip(temps, humidities):
+        total += (T + H) * (meanT - medT) * (meanH - medH)
+    return abs(round(total))
+
+
+def reference_5(arrivals, departures):
+    return 3 * (arrivals.to_numpy().sum() + departures.to_numpy().sum())
+
+
+def reference_6(arrivals, departures):
+    return abs(
+        int(sum(markets.airport_metric(a, d) for a, d in zip(arrivals, departures)))
+    )
+
+
+def reference_7(flow_rate, water_level, temperature, humidity, airport_metric_sum):
+    return abs(
+        0.3 * flow_rate
+        + 0.1 * water_level
+        + 0.2 * temperature
+        + 0.1 * humidity
+        + 0.3 * airport_metric_sum
+    )
+
+
+# --- inputs -----------------------------------------------------------------
+
+
+def scenarios(rng: np.random.Generator, count: int, intervals: int) -> dict:
+    def triplets(low, high):
+        values = rng.uniform(low, high, (count, intervals, 3))
+        # medians and means close to each other, like the rolling ones
+        values[..., 2] = values[..., 1] + rng.normal(0, 1, (count, intervals))
+        return values
+
+    return {
+        "flow": rng.uniform(15, 35, (count, intervals)),
+        "level": rng.uniform(125, 150, (count, intervals)),
+        "temp": rng.uniform(25, 50, (count, intervals)),
+        "hum": rng.uniform(40, 100, (count, intervals)),
+        "temp3": triplets(25, 50),
+        "hum3": triplets(40, 100),
+        # counts with zero-traffic intervals, where airport_metric is 0
+        "arr": rng.integers(0, 4, (count, intervals)),
+        "dep": rng.integers(0, 4, (count, intervals)),
+        "metric": rng.normal(0, 40, count),
+    }
+
+
+def check_parity(data: dict) -> None:
+    for i in range(len(data["flow"])):
+        flow, level = data["flow"][i], data["level"][i]
+        temp, hum = data["temp"][i], data["hum"][i]
+        temp3 = [tuple(row) for row in data["temp3"][i].tolist()]
+        hum3 = [tuple(row) for row in data["hum3"][i].tolist()]
+        arr, dep = data["arr"][i].tolist(), data["dep"][i].tolist()
+        x = (flow[-1], level[-1], temp[-1], hum[-1], data["metric"][i])
+
+        pairs = [
+            (markets.market_1_settlement(x[0], x[1]), reference_1(x[0], x[1])),
+            (
+                markets.market_2_call_value(flow.tolist(), level.tolist(), 0),
+                reference_2(flow.tolist(), level.tolist(), 0),
+            ),
+            (
+                markets.market_3_settlement(temp.tolist(), hum.tolist()),
+                reference_3(temp.tolist(), hum.tolist()),
+            ),
+            (markets.market_4_settlement(temp3, hum3), reference_4(temp3, hum3)),
+            (
+                markets.market_5_settlement(pd.Series(arr), pd.Series(dep)),
+                reference_5(pd.Series(arr), pd.Series(dep)),
+            ),
+            (markets.market_6_settlement(arr, dep), reference_6(arr, dep)),
+            (
+                markets.market_7_etf_settlement(*(float(v) for v in x)),
+                reference_7(*(float(v) for v in x)),
+            ),
+        ]
+        for market, (value, expected) in enumerate(pairs, 1):
+            assert (
+                value == expected
+            ), f"market {market}, scenario {i}: {value} != {expected}"
+
+    batch = batches(data)
+    for name, (batch_fn, scalar_fn, args) in batch.items():
+        settlements = batch_fn(*args)
+        assert settlements.shape == (len(data["flow"]),), name
+        for i, settlement in enumerate(settlements):
+            expected = scalar_fn(*(arg[i] for arg in args))
+            assert (
+                settlement == expected
+            ), f"{name}, row {i}: {settlement} != {expected}"
+
+
+def batches(data: dict) -> dict:
+    # batch function, scalar function, batch arguments
+    return {
+        "market_1": (
+            markets.market_1_settlement_batch,
+            markets.market_1_settlement,
+            (data["flow"][:, -1], data["level"][:, -1]),
+        ),
+        "market_2": (
+            markets.market_2_call_value_batch,
+            markets.market_2_call_value,
+            (data["flow"], data["level"]),
+        ),
+        "market_3": (
+            markets.market_3_settlement_batch,
+            markets.market_3_settlement,
+            (data["temp"], data["hum"]),
+        ),
+        "market_4": (
+            markets.market_4_settlement_batch,
+            markets.market_4_settlement,
+            (data["temp3"], data["hum3"]),
+        ),
+        "market_5": (
+            markets.market_5_settlement_batch,
+            markets.market_5_settlement,
+            (data["arr"], data["dep"]),
+        ),
+        "market_6": (
+            markets.market_6_settlement_batch,
+            markets.market_6_settlement,
+            (data["arr"], data["dep"]),
+        ),
+        "market_7": (
+            markets.market_7_etf_settlement_batch,
+            markets.market_7_etf_settlement,
+            (
+                data["flow"][:, -1],
+                data["level"][:, -1],
+                data["temp"][:, -1],
+                data["hum"][:, -1],
+                data["metric"],
+            ),
+        ),
+    }
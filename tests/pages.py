@@ -0,0 +1,63 @@
+"""
+Saved scraper pages in tests/fixtures and helpers to hand them to the
+parsers of estimates.past_data_scraper, shared by the tests and benchmarks.
+"""
+
+import re
+from pathlib import Path
+
+import requests
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# the html_tables backend every other backend must match
+REFERENCE = "bs4"
+
+PARSERS = {
+    "parse_waterflow": "hnd_waterflow.html",
+    "parse_waterlevel": "hnd_waterlevel.html",
+    "parse_weather_df": "timeanddate_weather.html",
+}
+
+# (table_class, section, cell_tags, strip) as the parsers call table_rows
+HND = ("tblsort", "tbody", ("td",), False)
+WEATHER = (None, None, ("td", "th"), True)
+
+
+def response(html: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = html
+    response.encoding = "utf-8"
+    return response
+
+
+def page(fixture: str) -> requests.Response:
+    return response((FIXTURES / fixture).read_bytes())
+
+
+def variants(html: str) -> dict[str, str]:
+    """
+    Variants of a saved page that stress the tokenizer: upper case tags,
+    comments and scripts holding table markup, quoted `>` in attributes,
+    entities and inline markup in cells
+    """
+    # only well-formed ones, html.parser nests cells without end tags
+    return {
+        "as saved": html,
+        "upper case tags": re.sub(
+            r"</?(table|tbody|thead|tr|td|th)\b",
+            lambda m: m.group(0).upper(),
+            html,
+        ),
+        "comments": html.replace(
+            "</tr>", "</tr><!-- <tr><td>01.01.2000 00:00</td><td>1</td></tr> -->", 25
+        ),
+        "script": html.replace(
+            "<tbody>",
+            "<tbody><script>document.write('<tr><td>x</td></tr>')</script>",
+        ),
+        "quoted >": html.replace("<td", '<td title="a > b"', 50),
+        "entities": html.replace("<td>", "<td>&#32;&nbsp;", 40),
+        "inline markup": html.replace("<td>", "<td><span> <b></b></span>\n", 40),
+    }
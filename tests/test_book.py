@@ -0,0 +1,78 @@
+from imcity_book import BookManager, LocalOrderBook
+from imcity_types import Order, OrderBook, Side
+
+
+def payload(buy: list[tuple], sell: list[tuple], product: str = "P") -> dict:
+    def levels(side):
+        return [
+            {"price": price, "volume": volume, "userOrderVolume": own}
+            for price, volume, own in side
+        ]
+
+    return {"product": product, "tickSize": 1, "buy": levels(buy), "sell": levels(sell)}
+
+
+def test_levels_stay_sorted_best_first():
+    book = LocalOrderBook("P", 1)
+    for price in (99, 101, 100):
+        book.update_level(Side.BUY, price, 1)
+    for price in (104, 102, 103):
+        book.update_level(Side.SELL, price, 1)
+    snapshot = book.snapshot()
+    assert [order.price for order in snapshot.buy_orders] == [101, 100, 99]
+    assert [order.price for order in snapshot.sell_orders] == [102, 103, 104]
+    assert book.best_bid.price == 101 and book.best_ask.price == 102
+
+
+def test_update_level_reports_changes():
+    book = LocalOrderBook("P", 1)
+    assert book.update_level(Side.BUY, 100, 5)
+    assert not book.update_level(Side.BUY, 100, 5)
+    assert book.update_level(Side.BUY, 100, 5, own_volume=2)
+    assert book.update_level(Side.BUY, 100, 0)
+    assert not book.update_level(Side.BUY, 100, 0)
+    assert len(book) == 0
+
+
+def test_snapshot_is_cached_until_the_book_changes():
+    book = LocalOrderBook("P", 1)
+    book.update_level(Side.SELL, 101, 1)
+    first = book.snapshot()
+    assert book.snapshot() is first
+    book.update_level(Side.SELL, 101, 2)
+    assert book.snapshot() is not first
+    assert book.snapshot().sell_orders == (Order(101, 2, 0),)
+
+
+def test_apply_diffs_full_payloads():
+    books = BookManager()
+    first = books.apply(payload([(100, 1, 0), (99, 2, 0)], [(101, 1, 0)]))
+    assert first.buy_orders == (Order(100, 1, 0), Order(99, 2, 0))
+    assert books.apply(payload([(100, 1, 0), (99, 2, 0)], [(101, 1, 0)])) is None
+    second = books.apply(payload([(99, 3, 1)], [(101, 1, 0)]))
+    assert second.buy_orders == (Order(99, 3, 1),)
+
+
+def test_same_content_ignores_sequence_types():
+    book = OrderBook("P", 1, [Order(100.0, 1, 0)], [Order(101.0, 2, 0)])
+    assert book.same_content(
+        OrderBook("P", 1.0, (Order(100.0, 1, 0),), (Order(101.0, 2, 0),))
+    )
+    assert not book.same_content(
+        OrderBook("P", 1, [Order(100.0, 1, 0)], [Order(101.0, 3, 0)])
+    )
+
+
+def test_resync_skips_unchanged_and_stale_snapshots():
+    books = BookManager()
+    books.apply(payload([(100, 1, 0)], [(101, 1, 0)]))
+    same = OrderBook("P", 1, [Order(100.0, 1, 0)], [Order(101.0, 1, 0)])
+    assert books.resync(same) is None
+
+    version = books.version("P")
+    newer = OrderBook("P", 1, [Order(100.0, 4, 0)], [Order(101.0, 1, 0)])
+    books.apply(payload([(100, 2, 0)], [(101, 1, 0)]))
+    assert books.resync(newer, version) is None
+
+    applied = books.resync(newer, books.version("P"))
+    assert applied.buy_orders == (Order(100.0, 4, 0),)
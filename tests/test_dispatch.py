@@ -0,0 +1,102 @@
+from threading import Event, Lock
+
+from imcity_dispatch import EventDispatcher
+from imcity_types import Order, OrderBook
+
+
+def book(product: str, version: int) -> OrderBook:
+    # the bid price stands in for the book's version
+    return OrderBook(product, 1, (Order(version, 1, 0),), ())
+
+
+def version(orderbook: OrderBook) -> int:
+    return orderbook.buy_orders[0].price
+
+
+def test_only_the_newest_book_per_product_is_delivered():
+    delivered = {"P": [], "Q": []}
+    started = {"P": Event(), "Q": Event()}
+    release = Event()
+
+    def handle(orderbook):
+        started[orderbook.product].set()
+        release.wait(5)
+        delivered[orderbook.product].append(version(orderbook))
+
+    dispatcher = EventDispatcher(handle, lambda trades: None, workers=2)
+    dispatcher.publish_orderbook(book("P", 0))
+    dispatcher.publish_orderbook(book("Q", 0))
+    assert started["P"].wait(5) and started["Q"].wait(5)
+
+    # both workers are busy, so every book but the last of each burst is stale
+    for v in range(1, 51):
+        dispatcher.publish_orderbook(book("P", v))
+        dispatcher.publish_orderbook(book("Q", 100 + v))
+    release.set()
+    dispatcher.close()
+
+    assert delivered == {"P": [0, 50], "Q": [0, 150]}
+    stats = dispatcher.stats()
+    assert stats["books_published"] == 102 and stats["books_coalesced"] == 98
+
+
+def test_trades_are_delivered_in_order():
+    delivered = []
+    release = Event()
+
+    def handle_trades(trades):
+        release.wait(5)
+        delivered.extend(trades)
+
+    dispatcher = EventDispatcher(lambda book: None, handle_trades, workers=3)
+    batches = [[{"n": 2 * i}, {"n": 2 * i + 1}] for i in range(100)]
+    for batch in batches:
+        dispatcher.publish_trades(batch)
+        dispatcher.publish_orderbook(book("P", 0))
+    release.set()
+    dispatcher.close()
+
+    assert [trade["n"] for trade in delivered] == list(range(200))
+    assert dispatcher.stats()["trades_published"] == 200
+
+
+def test_handlers_of_one_product_never_overlap():
+    lock = Lock()
+    active = {"P": 0, "Q": 0}
+    overlaps = []
+
+    def handle(orderbook):
+        with lock:
+            active[orderbook.product] += 1
+            overlaps.append(active[orderbook.product] > 1)
+        for _ in range(1000):
+            pass
+        with lock:
+            active[orderbook.product] -= 1
+
+    dispatcher = EventDispatcher(handle, lambda trades: None, workers=4)
+    for v in range(500):
+        dispatcher.publish_orderbook(book("P" if v % 2 else "Q", v))
+    dispatcher.close()
+    assert overlaps and not any(overlaps)
+
+
+def test_failing_handler_does_not_stop_other_events():
+    delivered = []
+
+    def handle(orderbook):
+        if orderbook.product == "bad":
+            raise ValueError("strategy bug")
+        delivered.append(orderbook.product)
+
+    def handle_trades(trades):
+        raise ValueError("strategy bug")
+
+    dispatcher = EventDispatcher(handle, handle_trades, workers=1)
+    dispatcher.publish_orderbook(book("bad", 0))
+    dispatcher.publish_trades([{"n": 0}])
+    dispatcher.publish_orderbook(book("P", 0))
+    dispatcher.close()
+
+    assert delivered == ["P"]
+    assert dispatcher.stats()["handler_errors"] == 2
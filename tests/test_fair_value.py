@@ -0,0 +1,117 @@
+from threading import Event
+
+import pandas as pd
+
+from estimates.fair_value import FairValueService
+from estimates.refresh import Node, RefreshGraph
+
+
+def graph(sources: dict) -> tuple[RefreshGraph, list[str]]:
+    """
+    a, b -> sum -> doubled, b -> clipped; calls collects the computed nodes
+    """
+    calls = []
+
+    def node(name, fn):
+        def compute(*args):
+            calls.append(name)
+            return fn(*args)
+
+        return compute
+
+    graph = RefreshGraph()
+    graph.add("a", lambda: sources["a"])
+    graph.add("b", lambda: sources["b"])
+    graph.add("sum", node("sum", lambda a, b: a + b), ["a", "b"])
+    graph.add("doubled", node("doubled", lambda total: 2 * total), ["sum"])
+    graph.add("clipped", node("clipped", lambda b: min(b, 10)), ["b"])
+    return graph, calls
+
+
+def loaded(sources: dict) -> tuple[FairValueService, list[str], list[str]]:
+    refresh_graph, calls = graph(sources)
+    service = FairValueService(refresh_graph)
+    service.load(refresh_graph.run())
+    calls.clear()
+    notified = []
+    service.subscribe(lambda fair_value: notified.append(fair_value.name))
+    return service, calls, notified
+
+
+def test_publish_recomputes_only_dependents():
+    service, calls, notified = loaded({"a": 1, "b": 20})
+    changed = service.publish("a", 2)
+    assert [fair_value.name for fair_value in changed] == ["a", "sum", "doubled"]
+    assert notified == ["a", "sum", "doubled"]
+    assert calls == ["sum", "doubled"]
+    assert service.value("doubled").value == 44
+
+
+def test_unchanged_values_stop_the_update():
+    service, calls, notified = loaded({"a": 1, "b": 20})
+    assert service.publish("a", 1) == []
+    # clipped stays at 10, sum changes
+    changed = service.publish("b", 30)
+    assert [fair_value.name for fair_value in changed] == ["b", "sum", "doubled"]
+    assert calls == ["sum", "doubled", "clipped"]
+
+
+def test_equal_pandas_values_are_not_changes():
+    series = pd.Series([1.0, 2.0])
+    service, calls, notified = loaded({"a": series, "b": 0})
+    assert service.publish("a", series.copy()) == []
+    assert calls == notified == []
+
+
+def test_poll_publishes_changed_sources():
+    sources = {"a": 1, "b": 20}
+    service, calls, notified = loaded(sources)
+    assert service.poll() == []
+    sources["b"] = 5
+    changed = service.poll()
+    assert [fair_value.name for fair_value in changed] == [
+        "b",
+        "sum",
+        "doubled",
+        "clipped",
+    ]
+    assert service.value("clipped").value == 5
+
+
+def test_failing_node_keeps_its_last_value():
+    service, calls, notified = loaded({"a": 1, "b": 2})
+    service.publish("a", "text")
+    assert "sum" in service.errors
+    assert service.value("sum").value == 3
+    service.publish("a", 4)
+    assert "sum" not in service.errors
+    assert service.value("doubled").value == 12
+
+
+def test_failing_fetch_is_recorded():
+    def fail():
+        raise OSError("offline")
+
+    refresh_graph, _ = graph({"a": 1, "b": 2})
+    service = FairValueService(refresh_graph)
+    service.load(refresh_graph.run())
+    refresh_graph.nodes["a"] = Node("a", fail)
+    assert service.poll(["a"]) == []
+    assert isinstance(service.errors["a"], OSError)
+    assert service.value("a").value == 1
+
+
+def test_background_polling():
+    sources = {"a": 1, "b": 2}
+    service, calls, notified = loaded(sources)
+    updated = Event()
+    service.subscribe(lambda fair_value: fair_value.name == "doubled" and updated.set())
+    service._intervals["a"] = 0.01
+    sources["a"] = 7
+    service.start()
+    try:
+        assert updated.wait(5)
+    finally:
+        service.stop()
+    assert service.value("doubled").value == 18
+    assert not service._inflight
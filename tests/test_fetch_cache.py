@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+
+import pytest
+import requests
+
+from estimates.fetch_cache import FetchCache
+
+URL = "https://example.com/page"
+
+
+def response(status: int, body: bytes = b"", **headers: str) -> requests.Response:
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    result.headers.update(headers)
+    return result
+
+
+class Session:
+    """
+    Answers every GET with the next queued response, recording the headers
+    """
+
+    def __init__(self, *responses: requests.Response, gate: Event | None = None):
+        self.responses = list(responses)
+        self.requests: list[dict] = []
+        self.gate = gate
+
+    def get(self, url, headers=None, timeout=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def cache(session: Session, clock: Clock | None = None) -> FetchCache:
+    return FetchCache(default_ttl=10, session=session, clock=clock or Clock())
+
+
+def test_fresh_responses_come_from_the_cache():
+    clock = Clock()
+    fetches = cache(Session(response(200, b"a"), response(200, b"b")), clock)
+    assert fetches.get(URL).content == b"a"
+    clock.now = 9
+    assert fetches.get(URL).content == b"a"
+    clock.now = 10
+    assert fetches.get(URL).content == b"b"
+    assert fetches.stats()["hits"] == 1 and fetches.stats()["fetches"] == 2
+
+
+def test_stale_response_is_revalidated_and_keeps_its_parse():
+    clock = Clock()
+    session = Session(
+        response(200, b"a", ETag='"1"', **{"Last-Modified": "yesterday"}),
+        response(304),
+        response(200, b"b", ETag='"2"'),
+    )
+    fetches = cache(session, clock)
+    parse = lambda r: r.content.decode()
+    assert fetches.parsed(URL, parse) == "a"
+
+    clock.now = 20
+    assert fetches.parsed(URL, parse) == "a"
+    assert session.requests[1] == {
+        "If-None-Match": '"1"',
+        "If-Modified-Since": "yesterday",
+    }
+    assert fetches.stats()["revalidated"] == 1
+
+    clock.now = 40
+    assert fetches.parsed(URL, parse) == "b"
+    assert session.requests[2] == {
+        "If-None-Match": '"1"',
+        "If-Modified-Since": "yesterday",
+    }
+    assert fetches.stats()["parses"] == 2
+
+
+def test_identical_body_counts_as_unchanged():
+    clock = Clock()
+    fetches = cache(Session(response(200, b"a"), response(200, b"a")), clock)
+    parse = lambda r: object()
+    first = fetches.parsed(URL, parse)
+    clock.now = 20
+    assert fetches.parsed(URL, parse) is first
+    assert fetches.stats()["revalidated"] == 1
+
+
+def test_errors_are_not_cached():
+    fetches = cache(Session(response(503), response(200, b"a")))
+    with pytest.raises(requests.HTTPError):
+        fetches.parsed(URL, lambda r: r.content)
+    assert fetches.parsed(URL, lambda r: r.content) == b"a"
+
+
+def test_concurrent_fetches_share_one_request():
+    gate = Event()
+    session = Session(response(200, b"a"), gate=gate)
+    fetches = cache(session)
+    with ThreadPoolExecutor(4) as pool:
+        results = [pool.submit(fetches.get, URL) for _ in range(4)]
+        while fetches.stats()["coalesced"] < 3:
+            sleep(0.001)
+        gate.set()
+        assert {result.result().content for result in results} == {b"a"}
+    assert len(session.requests) == 1
+
+
+def test_failed_fetch_reaches_every_waiter():
+    gate = Event()
+
+    class Failing(Session):
+        def get(self, url, headers=None, timeout=None):
+            gate.wait(5)
+            raise requests.ConnectionError("down")
+
+    fetches = cache(Failing())
+    with ThreadPoolExecutor(2) as pool:
+        results = [pool.submit(fetches.get, URL) for _ in range(2)]
+        while fetches.stats()["coalesced"] < 1:
+            sleep(0.001)
+        gate.set()
+        for result in results:
+            with pytest.raises(requests.ConnectionError):
+                result.result()
+    # nothing is left in flight, so the next call fetches again
+    fetches.session = Session(response(200, b"a"))
+    assert fetches.get(URL).content == b"a"
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("bs4")
+
+import pandas as pd
+
+import estimates.past_data_scraper as scraper
+from estimates.html_tables import table_rows
+from tests.pages import FIXTURES, HND, PARSERS, REFERENCE, WEATHER, page, variants
+
+BACKENDS = ["tokenizer", "lxml"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    return request.param
+
+
+@pytest.mark.parametrize("function", PARSERS)
+def test_parsers_match_the_reference(backend, function):
+    parse = getattr(scraper, function)
+    fetched = page(PARSERS[function])
+    fetched.headers["Date"] = "Sat, 22 Nov 2025 12:00:00 GMT"
+    expected = parse(fetched, backend=REFERENCE)
+    assert expected is not None and len(expected)
+    pd.testing.assert_frame_equal(parse(fetched, backend=backend), expected)
+
+
+@pytest.mark.parametrize("fixture", PARSERS.values())
+def test_table_rows_match_the_reference_on_variants(backend, fixture):
+    arguments = WEATHER if "weather" in fixture else HND
+    html = (FIXTURES / fixture).read_text(encoding="utf-8")
+    for variant, text in variants(html).items():
+        expected = table_rows(text, *arguments, backend=REFERENCE)
+        rows = table_rows(text, *arguments, backend=backend)
+        assert rows == expected, variant
+
+
+def test_missing_table_or_section(backend):
+    html = "<table class='x'><tr><td>1</td></tr></table>"
+    assert table_rows(html, "y", backend=backend) is None
+    assert table_rows(html, "x", "tbody", backend=backend) is None
+    assert table_rows(html, "x", backend=backend) == [["1"]]
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from imcity_journal import JournalReader, JournalWriter, decode_book, encode_book
+
+BOOK = {
+    "product": "1_Eisbach",
+    "tickSize": 0.5,
+    "buy": [
+        {"price": 100.5, "volume": 3, "userOrderVolume": 1},
+        {"price": 99, "volume": 2, "userOrderVolume": 0},
+    ],
+    "sell": [{"price": 101, "volume": 4, "userOrderVolume": 0}],
+}
+TRADES = [
+    {
+        "timestamp": "2025-11-22T10:00:00Z",
+        "product": "1_Eisbach",
+        "buyer": "a",
+        "seller": "b",
+        "volume": 1,
+        "price": 100.5,
+    }
+]
+
+
+def record(writer: JournalWriter, events: list[tuple[str, object, int]]) -> None:
+    for event, payload, received_ns in events:
+        writer.record(event, json.dumps(payload), received_ns)
+
+
+def test_book_round_trip():
+    assert decode_book(encode_book(BOOK)) == BOOK
+
+
+def test_books_off_the_tick_grid_are_not_encoded():
+    off_grid = {**BOOK, "sell": [{"price": 101.2, "volume": 1}]}
+    assert encode_book(off_grid) is None
+
+
+def test_round_trip(tmp_path):
+    writer = JournalWriter(tmp_path)
+    events = [("order", BOOK, 10), ("trade", TRADES, 20), ("order", BOOK, 30)]
+    record(writer, events)
+    writer.record("order", "not json", 40)
+    writer.close()
+
+    records = list(JournalReader(tmp_path))
+    assert [(r.event, r.payload, r.received_ns) for r in records] == events + [
+        ("order", "not json", 40)
+    ]
+    assert writer.records_written == 4 and writer.write_errors == 0
+
+
+def test_read_seeks_by_time_across_segments(tmp_path):
+    writer = JournalWriter(tmp_path, segment_size=256)
+    record(writer, [("trade", TRADES, ns) for ns in range(100, 110)])
+    writer.close()
+
+    reader = JournalReader(tmp_path)
+    assert len(reader.segments()) > 1
+    assert [r.received_ns for r in reader.read(103, 107)] == [103, 104, 105, 106]
+
+
+def test_restart_into_the_same_directory_keeps_both_runs(tmp_path):
+    for _ in range(2):
+        writer = JournalWriter(tmp_path)
+        record(writer, [("trade", TRADES, 100)])
+        writer.close()
+
+    assert len(JournalReader(tmp_path).segments()) == 2
+    assert [r.received_ns for r in JournalReader(tmp_path)] == [100, 100]
+
+
+def test_close_raises_when_events_were_lost(tmp_path):
+    writer = JournalWriter(tmp_path)
+    # the directory disappearing is one way opening a segment fails
+    writer.directory = tmp_path / "missing"
+    writer.record("trade", "[]", 1)
+    with pytest.raises(RuntimeError):
+        writer.close()
+    assert writer.write_errors == 1
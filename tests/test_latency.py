@@ -0,0 +1,93 @@
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from imcity_latency import (
+    SUB_BUCKET_BITS,
+    LatencyHistogram,
+    LatencyTracker,
+    _bucket,
+    _bucket_bounds,
+)
+
+ERROR = 1 / (1 << SUB_BUCKET_BITS)
+
+
+def test_buckets_hold_their_values_within_the_bucket_error():
+    values = list(range(5000))
+    for power in range(6, 63):
+        values += [2**power - 1, 2**power, 2**power + 1, 3 * 2 ** (power - 1)]
+    previous = -1
+    for value in sorted(values):
+        index = _bucket(value)
+        low, high = _bucket_bounds(index)
+        assert low <= value <= high
+        assert high - low <= low * ERROR
+        assert index >= previous
+        previous = index
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in (0, 1, 5, 31, -3):
+        histogram.record(value)
+    assert histogram.percentile(0) == 0
+    assert histogram.percentile(60) == 1
+    assert histogram.percentile(80) == 5
+    assert histogram.percentile(100) == 31
+    assert histogram.count == 5 and histogram.total == 37
+
+
+@pytest.mark.parametrize("percent", [1, 50, 90, 99, 99.9])
+def test_percentiles_match_numpy_within_the_bucket_error(percent):
+    values = np.random.default_rng(0).lognormal(12, 1.5, 200_000).astype(np.int64)
+    histogram = LatencyHistogram()
+    for value in values.tolist():
+        histogram.record(value)
+    expected = np.percentile(values, percent)
+    assert expected * (1 - 1e-3) <= histogram.percentile(percent)
+    assert histogram.percentile(percent) <= expected * (1 + ERROR) * (1 + 1e-3)
+    assert histogram.max == values.max()
+
+
+def test_shards_of_all_threads_are_merged():
+    histogram = LatencyHistogram()
+
+    def record(offset):
+        for value in range(offset, offset + 1000):
+            histogram.record(value)
+
+    threads = [Thread(target=record, args=(1000 * i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(histogram._shards) == 4
+    assert histogram.count == 4000 == sum(histogram.counts())
+    assert histogram.total == sum(range(4000))
+    assert histogram.max == 3999
+    assert 1999 <= histogram.percentile(50) <= 1999 * (1 + ERROR)
+
+    histogram.reset()
+    assert histogram.count == 0 and histogram.percentile(50) is None
+    histogram.record(7)
+    assert histogram.count == 1
+
+
+def test_tracker_stages_and_current_tick():
+    tracker = LatencyTracker()
+    tracker.record("parse", 2000)
+    tracker.record("custom", 1000)
+    assert tracker.snapshot()["parse"]["p50_us"] == 2
+    assert tracker.snapshot()["custom"]["count"] == 1
+    assert tracker.snapshot()["response"] == {"count": 0}
+    assert "parse" in tracker.report()
+
+    tracker.set_current_tick(5)
+    seen = []
+    thread = Thread(target=lambda: seen.append(tracker.current_tick()))
+    thread.start()
+    thread.join()
+    assert tracker.current_tick() == 5 and seen == [None]
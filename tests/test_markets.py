@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from estimates import markets
+from tests.market_references import check_parity, reference_2, scenarios
+
+
+@pytest.mark.parametrize("intervals", [1, 2, 96])
+def test_scalar_and_batch_match_the_reference(intervals):
+    # scalar against the loop reference, every batch row against the scalar
+    check_parity(scenarios(np.random.default_rng(intervals), 50, intervals))
+
+
+def test_rounding_halves_like_the_builtin():
+    flow = np.array([0.5, 1.5, 2.5, -0.5])
+    assert markets.market_1_settlement_batch(flow, 1).tolist() == [
+        round(value) for value in flow.tolist()
+    ]
+
+
+def test_call_value_applies_the_strike():
+    flows, levels = [1.0, 3.0], [100.0, 120.0]
+    for strike in (0, 5000, 10000, 20000):
+        assert markets.market_2_call_value(flows, levels, strike) == reference_2(
+            flows, levels, strike
+        )
+
+
+def test_invalid_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        markets.market_2_settlement([], [1.0])
+    with pytest.raises(ValueError):
+        markets.market_3_settlement([1.0, 2.0], [1.0])
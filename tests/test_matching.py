@@ -0,0 +1,125 @@
+import pytest
+
+from imcity_matching import MARKET_USER, ExchangeAPI, MatchingEngine
+from imcity_types import Side
+
+
+def engine() -> MatchingEngine:
+    return MatchingEngine({"P": 0.5})
+
+
+def test_price_then_time_priority():
+    market = engine()
+    first, _ = market.submit("a", "P", Side.SELL, 101, 2, 1)
+    second, _ = market.submit("b", "P", Side.SELL, 101, 2, 2)
+    market.submit("c", "P", Side.SELL, 100.5, 1, 3)
+
+    order, trades = market.submit("x", "P", Side.BUY, 101, 4, 4)
+    assert [(t.seller, t.volume, t.price) for t in trades] == [
+        ("c", 1, 100.5),
+        ("a", 2, 101),
+        ("b", 1, 101),
+    ]
+    assert order.remaining == 0 and market.order(order.id) is None
+    assert market.order(first.id) is None
+    assert market.order(second.id).remaining == 1
+    assert market.positions["x"]["P"] == 4
+    assert market.cash["x"] == -(100.5 + 3 * 101)
+
+
+def test_remainder_rests_unless_immediate_or_cancel():
+    market = engine()
+    market.submit("a", "P", Side.SELL, 101, 1, 1)
+    order, trades = market.submit("x", "P", Side.BUY, 101, 3, 2)
+    assert len(trades) == 1
+    assert market.order(order.id).status == "PART_FILLED"
+    assert market.books["P"].best_price(Side.BUY) == 101
+
+    ioc, _ = market.submit("y", "P", Side.BUY, 100, 5, 3, immediate_or_cancel=True)
+    assert market.order(ioc.id) is None
+    assert market.depth("P")["buy"] == [
+        {"price": 101, "volume": 2, "userOrderVolume": 0}
+    ]
+
+
+def test_self_trade_cancels_the_resting_order():
+    market = engine()
+    own, _ = market.submit("a", "P", Side.SELL, 101, 1, 1)
+    market.submit("b", "P", Side.SELL, 101.5, 1, 2)
+    _, trades = market.submit("a", "P", Side.BUY, 101.5, 1, 3)
+    assert market.order(own.id) is None
+    assert [(t.seller, t.price) for t in trades] == [("b", 101.5)]
+
+
+def test_invalid_orders_are_rejected():
+    market = engine()
+    with pytest.raises(ValueError):
+        market.submit("a", "Q", Side.BUY, 100, 1, 1)
+    with pytest.raises(ValueError):
+        market.submit("a", "P", Side.BUY, 100.25, 1, 1)
+    with pytest.raises(ValueError):
+        market.submit("a", "P", Side.BUY, 100, 0, 1)
+
+
+def test_cancel_only_own_orders():
+    market = engine()
+    order, _ = market.submit("a", "P", Side.BUY, 100, 1, 1)
+    assert market.cancel(order.id, "b") is None
+    assert market.cancel(order.id, "a") is order
+    assert market.depth("P")["buy"] == []
+
+
+def test_set_liquidity_shrinks_newest_orders_first():
+    market = engine()
+    market.set_liquidity("m", "P", {100: 2}, {}, 1)
+    market.set_liquidity("m", "P", {100: 5}, {}, 2)
+    older, newer = market.orders("m", "P")
+    market.set_liquidity("m", "P", {100: 3}, {101: 1}, 3)
+    assert [o.remaining for o in market.orders("m", "P")] == [2, 1, 1]
+    assert market.orders("m", "P")[:2] == [older, newer]
+
+
+def test_replay_excludes_own_volume_and_tape_fills_queue():
+    market = engine()
+    market.submit("me", "P", Side.BUY, 100, 1, 1)
+    book = {
+        "product": "P",
+        "tickSize": 0.5,
+        "buy": [{"price": 100, "volume": 4, "userOrderVolume": 1}],
+        "sell": [{"price": 101, "volume": 2, "userOrderVolume": 0}],
+    }
+    market.replay_orderbook(book, 2)
+    assert market.depth("P", "me")["buy"] == [
+        {"price": 100, "volume": 4, "userOrderVolume": 1}
+    ]
+    assert sum(o.remaining for o in market.orders(MARKET_USER, "P")) == 5
+
+    # our order is first in the queue at 100, so a trade there fills it
+    trades = market.replay_trade("P", 100, 2, 3)
+    assert [(t.buyer, t.volume) for t in trades] == [("me", 1), (MARKET_USER, 1)]
+    assert market.replay_trade("P", 100.5, 1, 4) == []
+
+
+def test_exchange_api_routes():
+    books = []
+    api = ExchangeAPI(engine(), clock=lambda: 0, on_book=books.append)
+    status, _, headers = api.handle(
+        "POST", "/api/user/authenticate", body={"username": "a", "password": ""}
+    )
+    token = headers["Authorization"]
+    assert status == 200 and token == "Bearer a"
+    assert api.handle("GET", "/api/order/current-user")[0] == 401
+
+    order = {"product": "P", "side": "BUY", "price": 100, "volume": 1}
+    status, body, _ = api.handle("POST", "/api/order", body=order, authorization=token)
+    assert status == 200 and body["status"] == "ACTIVE" and books == ["P"]
+    status, body, _ = api.handle(
+        "POST", "/api/order", body={**order, "price": 100.1}, authorization=token
+    )
+    assert status == 400
+
+    status, body, _ = api.handle(
+        "DELETE", "/api/order", {"product": "P", "price": "100"}, authorization=token
+    )
+    assert status == 200 and len(body) == 1
+    assert api.handle("DELETE", "/api/order/1", authorization=token)[0] == 404
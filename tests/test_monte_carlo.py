@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from estimates import safety_net
+from estimates.monte_carlo import (
+    AirportModel,
+    MonteCarloEngine,
+    RiverModel,
+    SettlementModel,
+    WeatherModel,
+    simulate,
+)
+from estimates.refresh import SETTLEMENT_PRODUCTS
+
+
+def model() -> SettlementModel:
+    bins = 48
+    return SettlementModel(
+        flow=RiverModel(np.full(6, 24.0), 24.0, 23.0, 0.02, 18),
+        level=RiverModel(np.full(6, 137.0), 137.0, 138.0, 0.01, 18),
+        weather=WeatherModel(np.linspace(40, 50, bins), np.full(bins, 70.0), 12),
+        airport=AirportModel(np.full(bins, 3), np.full(bins, 2), 12),
+    )
+
+
+def test_seeded_runs_match_in_process_and_on_workers():
+    expected = simulate(model(), 4000, seed=7, chunk_size=1000)
+    with MonteCarloEngine(workers=2, chunk_size=1000) as engine:
+        pooled = engine.run(model(), 4000, seed=7)
+    assert set(pooled) == set(expected) == set(SETTLEMENT_PRODUCTS)
+    for product, distribution in expected.items():
+        assert pooled[product].mean == distribution.mean, product
+        assert pooled[product].stdev == distribution.stdev, product
+        assert np.array_equal(pooled[product].percentiles, distribution.percentiles)
+        assert pooled[product].paths == 4000
+
+
+def test_seeds_change_the_paths():
+    first = simulate(model(), 1000, seed=1, chunk_size=250)["1_Eisbach"]
+    second = simulate(model(), 1000, seed=2, chunk_size=250)["1_Eisbach"]
+    assert first.mean != second.mean
+
+
+def test_call_value_is_simulated_once_per_gauge_snapshot(monkeypatch):
+    index = pd.date_range("2025-11-22 10:00", periods=24, freq="15min")
+    flow = pd.Series(np.linspace(20, 26, 24), index=index)
+    level = pd.Series(np.linspace(130, 140, 24), index=index)
+    runs = []
+
+    def counting(*args, **kwargs):
+        runs.append(args)
+        return simulate(*args, **kwargs)
+
+    monkeypatch.setattr(safety_net, "simulate", counting)
+    monkeypatch.setattr(safety_net, "_call_value", None)
+    with ThreadPoolExecutor(4) as pool:
+        values = list(
+            pool.map(lambda _: safety_net.predict_market_2(flow, level, 6), range(8))
+        )
+    assert len(runs) == 1 and len(set(values)) == 1
+
+    assert safety_net.predict_market_2(flow.copy(), level, 6) == values[0]
+    assert len(runs) == 1
+    safety_net.predict_market_2(flow, level, 7)
+    assert len(runs) == 2
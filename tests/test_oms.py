@@ -0,0 +1,121 @@
+from time import monotonic
+
+from imcity_oms import OrderManager
+from imcity_types import OrderResponse, Side
+
+
+def accepted(
+    order_id: str,
+    side: Side = Side.BUY,
+    price: float = 100,
+    volume: int = 5,
+    filled: int = 0,
+    product: str = "P",
+) -> OrderResponse:
+    return OrderResponse(
+        order_id, "ACTIVE", product, side, price, volume, filled, "me", "", None, None
+    )
+
+
+def trade(side: Side, volume: int, price: float = 100, product: str = "P") -> dict:
+    buyer, seller = ("me", "them") if side == Side.BUY else ("them", "me")
+    return {
+        "product": product,
+        "buyer": buyer,
+        "seller": seller,
+        "volume": volume,
+        "price": price,
+    }
+
+
+def exchange_order(order_id: str, volume: int = 5, filled: int = 0) -> dict:
+    return {
+        "id": order_id,
+        "product": "P",
+        "side": "BUY",
+        "price": 100,
+        "volume": volume,
+        "filled": filled,
+    }
+
+
+def test_levels_are_indexed_per_product():
+    oms = OrderManager()
+    oms.record(accepted("1"))
+    oms.record(accepted("2", volume=3))
+    oms.record(accepted("3", Side.SELL, 101))
+    oms.record(accepted("4", product="Q"))
+    oms.record(accepted("5", volume=2, filled=2))
+
+    assert oms.levels("P") == {
+        (Side.BUY, 100.0): {"1": 5, "2": 3},
+        (Side.SELL, 101.0): {"3": 5},
+    }
+    assert [order.id for order in oms.orders("Q")] == ["4"]
+    assert len(oms.orders()) == 4 and "5" not in oms
+    assert oms.level_ids("P", Side.BUY, 100) == ["1", "2"]
+    assert oms.open_volume("P", Side.BUY) == 8
+
+    assert oms.remove_level("P", Side.BUY, 100) == ["1", "2"]
+    assert oms.levels("P") == {(Side.SELL, 101.0): {"3": 5}}
+    assert oms.remove("3").id == "3"
+    assert oms.levels("P") == {} and oms.orders("P") == []
+    assert oms.open_volume("P", Side.BUY) == 0
+
+
+def test_fills_take_the_oldest_order_first():
+    oms = OrderManager()
+    oms.record(accepted("1", volume=2))
+    oms.record(accepted("2", volume=3))
+
+    oms.apply_trades([trade(Side.BUY, 1)], "me")
+    assert oms.levels("P") == {(Side.BUY, 100.0): {"1": 1, "2": 3}}
+
+    oms.apply_trades([trade(Side.BUY, 2)], "me")
+    assert "1" not in oms and oms.get("2").remaining == 2
+    assert oms.open_volume("P", Side.BUY) == 2
+    assert not oms.drift_detected
+
+    oms.apply_trades([trade(Side.BUY, 2)], "me")
+    assert len(oms) == 0 and oms.levels("P") == {}
+
+
+def test_fills_the_view_cannot_explain_flag_drift():
+    oms = OrderManager()
+    oms.record(accepted("1", volume=1))
+    oms.apply_trades([trade(Side.BUY, 2)], "me")
+    assert oms.drift_detected
+
+    oms = OrderManager()
+    oms.apply_trades([trade(Side.SELL, 1)], "me")
+    assert oms.drift_detected
+
+    oms = OrderManager()
+    oms.apply_trades([{**trade(Side.BUY, 1), "buyer": "else"}], "me")
+    assert not oms.drift_detected
+
+
+def test_reconcile_replaces_the_view():
+    oms = OrderManager()
+    oms.record(accepted("gone"))
+    oms.record(accepted("kept", volume=5))
+    since = monotonic()
+    oms.drift_detected = True
+
+    drift = oms.reconcile([exchange_order("kept", 5, 1), exchange_order("new")], since)
+    assert drift and not oms.drift_detected
+    assert oms.levels("P") == {(Side.BUY, 100.0): {"kept": 4, "new": 5}}
+    assert oms.open_volume("P", Side.BUY) == 9
+
+    assert not oms.reconcile([exchange_order("kept", 5, 1), exchange_order("new")], 0)
+
+
+def test_reconcile_keeps_orders_newer_than_the_list():
+    oms = OrderManager()
+    since = monotonic()
+    oms.record(accepted("racing"))
+    assert not oms.reconcile([], since)
+    assert "racing" in oms
+
+    assert oms.reconcile([], monotonic())
+    assert "racing" not in oms
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from estimates.past_data_scraper import parse_weather_df, weather_timestamps
+from tests.pages import page
+
+
+def test_weather_rows_without_a_readable_time_are_skipped():
+    df = parse_weather_df(
+        page("timeanddate_weather.html"), now=datetime(2025, 11, 22, 12)
+    )
+
+    # the fixture ends with a note and a label with a German date, both dropped
+    assert len(df) == 48
+    assert not any(label.startswith("Note") for label in df.index)
+    assert df["timestamp"].max() == datetime(2025, 11, 22, 23, 50)
+
+
+def test_weather_timestamps_carry_the_date_forward():
+    labels = ["11:50 pmWed, 31 Dec", "12:20 amThu, 1 Jan", "12:50 am", "13:20"]
+    assert weather_timestamps(labels, datetime(2026, 1, 1, 2)) == [
+        datetime(2025, 12, 31, 23, 50),
+        datetime(2026, 1, 1, 0, 20),
+        datetime(2026, 1, 1, 0, 50),
+        datetime(2026, 1, 1, 13, 20),
+    ]
+
+
+@pytest.mark.parametrize("label", ["Note: offline", "13:20 pm", "12:20 amSamstag"])
+def test_weather_timestamps_reject_other_labels(label):
+    with pytest.raises(ValueError):
+        weather_timestamps([label], datetime(2026, 1, 1))
@@ -0,0 +1,66 @@
+from time import monotonic
+
+import pytest
+
+from imcity_positions import Position, PositionLedger
+
+
+def trade(buyer: str, seller: str, volume: int, price: float) -> dict:
+    return {
+        "product": "P",
+        "buyer": buyer,
+        "seller": seller,
+        "volume": volume,
+        "price": price,
+    }
+
+
+def test_fill_adds_at_average_price():
+    position = Position("P").fill(2, 100).fill(2, 110)
+    assert position.volume == 4
+    assert position.avg_price == pytest.approx(105)
+    assert position.realised_pnl == 0
+
+
+def test_fill_closing_realises_pnl():
+    position = Position("P").fill(4, 100).fill(-3, 110)
+    assert position.volume == 1
+    assert position.avg_price == 100
+    assert position.realised_pnl == pytest.approx(30)
+
+
+def test_fill_flipping_through_flat_reopens_at_fill_price():
+    position = Position("P").fill(-2, 100).fill(5, 90)
+    assert position.volume == 3
+    assert position.avg_price == 90
+    assert position.realised_pnl == pytest.approx(20)
+    assert position.unrealised_pnl(95) == pytest.approx(15)
+
+
+def test_apply_trades_keeps_only_own_fills():
+    ledger = PositionLedger()
+    ledger.apply_trades(
+        [trade("me", "other", 3, 10), trade("other", "me", 1, 12), trade("a", "b", 9, 1)],
+        "me",
+    )
+    assert ledger["P"] == 2
+    assert ledger.get("P").realised_pnl == pytest.approx(2)
+    assert ledger.volumes() == {"P": 2}
+
+
+def test_reconcile_adopts_exchange_positions():
+    ledger = PositionLedger({"P": 3, "Q": 1})
+    drift = ledger.reconcile({"P": 5}, monotonic())
+    assert drift == {"P": (3, 5), "Q": (1, 0)}
+    assert ledger.volumes() == {"P": 5, "Q": 0}
+    assert ledger.reconcile({"P": 5}, monotonic()) == {}
+
+
+def test_reconcile_skips_products_filled_after_the_request():
+    ledger = PositionLedger({"P": 3, "Q": 1})
+    since = monotonic()
+    # fills while the position request is in flight
+    ledger.apply_fill("P", 2, 100)
+    drift = ledger.reconcile({"P": 3, "Q": 2}, since)
+    assert drift == {"Q": (1, 2)}
+    assert ledger["P"] == 5
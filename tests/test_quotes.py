@@ -0,0 +1,129 @@
+from concurrent.futures import Future
+
+from imcity_oms import OrderManager
+from imcity_quotes import QuoteManager
+from imcity_types import OrderRequest, OrderResponse, Side
+
+
+class Submitter:
+    """
+    Stands in for the bot: records what the QuoteManager sends and hands out
+    Futures the test resolves
+    """
+
+    def __init__(self):
+        self.oms = OrderManager()
+        self.cancels: list[str] = []
+        self.sends: list[OrderRequest] = []
+        self.futures: list[Future] = []
+
+    def submit_cancels(self, order_ids: list[str]) -> list[Future]:
+        self.cancels += order_ids
+        return self._futures(len(order_ids))
+
+    def submit_mass_orders(self, requests: list[OrderRequest]) -> list[Future]:
+        self.sends += requests
+        return self._futures(len(requests))
+
+    def rest(self, order_id: str, side: Side, price: float, volume: int) -> None:
+        self.oms.record(
+            OrderResponse(
+                order_id, "ACTIVE", "P", side, price, volume, 0, "me", "", None, None
+            )
+        )
+
+    def _futures(self, count: int) -> list[Future]:
+        futures = [Future() for _ in range(count)]
+        self.futures += futures
+        return futures
+
+
+def quote(side: Side, price: float, volume: int) -> OrderRequest:
+    return OrderRequest("P", price, side, volume)
+
+
+def test_diff_keeps_tops_up_and_replaces_levels():
+    bot = Submitter()
+    bot.rest("kept", Side.BUY, 99, 5)
+    bot.rest("short", Side.SELL, 101, 2)
+    bot.rest("excess", Side.SELL, 102, 8)
+    bot.rest("stale", Side.BUY, 98, 1)
+    quotes = QuoteManager(bot)
+
+    cancels, sends = quotes.diff(
+        "P",
+        [
+            quote(Side.BUY, 99, 5),
+            quote(Side.SELL, 101, 3),
+            quote(Side.SELL, 101, 2),
+            quote(Side.SELL, 102, 4),
+            quote(Side.BUY, 97, 1),
+            quote(Side.BUY, 96, 0),
+        ],
+    )
+    assert sorted(cancels) == ["excess", "stale"]
+    assert sends == [
+        quote(Side.SELL, 101, 3),
+        quote(Side.SELL, 102, 4),
+        quote(Side.BUY, 97, 1),
+    ]
+    assert quotes.resting("P") == {
+        (Side.BUY, 99.0): 5,
+        (Side.SELL, 101.0): 2,
+        (Side.SELL, 102.0): 8,
+        (Side.BUY, 98.0): 1,
+    }
+
+
+def test_unchanged_quotes_send_nothing():
+    bot = Submitter()
+    bot.rest("1", Side.BUY, 99, 5)
+    quotes = QuoteManager(bot)
+    assert quotes.update("P", [quote(Side.BUY, 99, 5)]) == []
+    assert bot.cancels == [] and bot.sends == []
+
+
+def test_update_defers_while_requests_are_in_flight():
+    bot = Submitter()
+    bot.rest("1", Side.BUY, 99, 5)
+    quotes = QuoteManager(bot)
+
+    futures = quotes.update("P", [quote(Side.BUY, 100, 5)])
+    assert len(futures) == 2 and bot.cancels == ["1"]
+
+    # the next two updates wait, and only the newest is reconciled
+    assert quotes.update("P", [quote(Side.BUY, 101, 5)]) == []
+    assert quotes.update("P", [quote(Side.BUY, 102, 5)]) == []
+    assert len(bot.sends) == 1
+
+    bot.oms.remove("1")
+    futures[0].set_result({})
+    assert len(bot.sends) == 1
+    bot.rest("2", Side.BUY, 100, 5)
+    futures[1].set_result(None)
+    assert bot.sends[-1] == quote(Side.BUY, 102, 5)
+    assert bot.cancels == ["1", "2"]
+    assert (quotes.cancels_sent, quotes.orders_sent) == (2, 2)
+
+
+def test_failed_request_still_resumes_the_deferred_update():
+    bot = Submitter()
+    quotes = QuoteManager(bot)
+    (future,) = quotes.update("P", [quote(Side.SELL, 101, 1)])
+    assert quotes.update("P", [quote(Side.SELL, 102, 1)]) == []
+
+    future.set_exception(ConnectionError("down"))
+    # the deferred quotes go out even though the order in flight failed
+    assert bot.sends == [quote(Side.SELL, 101, 1), quote(Side.SELL, 102, 1)]
+
+    bot.futures[-1].cancel()
+    assert len(quotes.update("P", [quote(Side.SELL, 103, 1)])) == 1
+
+
+def test_products_are_independent():
+    bot = Submitter()
+    quotes = QuoteManager(bot)
+    quotes.update("P", [quote(Side.BUY, 99, 1)])
+    request = OrderRequest("Q", 10, Side.BUY, 1)
+    assert len(quotes.update("Q", [request])) == 1
+    assert bot.sends[-1] == request
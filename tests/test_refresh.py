@@ -0,0 +1,131 @@
+from threading import Barrier, Lock
+from time import sleep, time
+
+import pytest
+
+from estimates.fair_value import FairValueService
+from estimates.refresh import (
+    SETTLEMENT_PRODUCTS,
+    SOURCE_INTERVALS,
+    DependencyError,
+    RefreshGraph,
+    settlement_graph,
+)
+
+
+def test_nodes_run_after_their_dependencies_with_their_results():
+    order = []
+    lock = Lock()
+
+    def node(name, fn):
+        def run(*args):
+            with lock:
+                order.append(name)
+            return fn(*args)
+
+        return run
+
+    graph = RefreshGraph()
+    graph.add("a", node("a", lambda: 2))
+    graph.add("b", node("b", lambda: 3))
+    graph.add("ab", node("ab", lambda a, b: f"{a}-{b}"), ["a", "b"])
+    graph.add("ba", node("ba", lambda b, a: f"{b}-{a}"), ["b", "a"])
+    graph.add("last", node("last", lambda ab, ba: ab + ba), ["ab", "ba"])
+    result = graph.run()
+
+    assert result.values["last"] == "2-33-2"
+    assert not result.errors
+    for name, deps in {
+        "ab": ["a", "b"],
+        "ba": ["a", "b"],
+        "last": ["ab", "ba"],
+    }.items():
+        assert all(order.index(dep) < order.index(name) for dep in deps)
+    assert set(result.timings) == set(graph.nodes)
+
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    graph = RefreshGraph()
+    graph.add("a", lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add("b", lambda c: c, ["c"])
+    with pytest.raises(ValueError):
+        graph.add("self", lambda x: x, ["self"])
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: 2)
+    # a node can only depend on nodes added before it, so no cycle can form
+    assert list(graph.nodes) == ["a"]
+
+
+def test_failed_node_skips_its_dependents_only():
+    ran = []
+    graph = RefreshGraph()
+    graph.add("ok", lambda: 1)
+    graph.add("broken", lambda: 1 / 0)
+    graph.add("child", lambda x: ran.append("child"), ["broken"])
+    graph.add("grandchild", lambda x, y: ran.append("grandchild"), ["child", "ok"])
+    graph.add("sibling", lambda x: x + 1, ["ok"])
+    result = graph.run()
+
+    assert ran == []
+    assert result.values == {"ok": 1, "sibling": 2}
+    assert isinstance(result.errors["broken"], ZeroDivisionError)
+    assert isinstance(result.errors["child"], DependencyError)
+    assert isinstance(result.errors["grandchild"], DependencyError)
+    assert "grandchild" not in result.timings
+    assert "skipped" in result.report()
+
+
+def test_independent_nodes_run_concurrently():
+    # would deadlock if the three sources ran one after another
+    barrier = Barrier(3, timeout=5)
+    graph = RefreshGraph()
+    for name in "abc":
+        graph.add(name, barrier.wait)
+    result = graph.run()
+    assert not result.errors and len(result.values) == 3
+
+
+def test_derived_values_are_as_old_as_their_newest_source():
+    graph = RefreshGraph()
+    graph.add("old", lambda: 1)
+    graph.add("new", lambda: 2)
+    graph.add("sum", lambda a, b: a + b, ["old", "new"])
+    service = FairValueService(graph)
+    service.publish("old", 1, as_of=time() - 600)
+    service.publish("new", 2, as_of=time() - 60)
+
+    total = service.value("sum")
+    assert total.value == 3
+    assert total.as_of == service.value("new").as_of
+    assert 59 < total.age < 61
+    assert service.value("old").age > 599
+
+
+def test_sources_are_polled_on_their_own_intervals():
+    polls = {"fast": 0, "slow": 0}
+
+    def source(name):
+        def fetch():
+            polls[name] += 1
+            return polls[name]
+
+        return fetch
+
+    graph = RefreshGraph()
+    graph.add("fast", source("fast"))
+    graph.add("slow", source("slow"))
+    service = FairValueService(graph, {"fast": 0.02}, default_interval=10)
+    service.start()
+    sleep(0.3)
+    service.stop()
+
+    assert polls["fast"] >= 5 and polls["slow"] == 0
+    assert service.value("fast").value == polls["fast"]
+
+
+def test_settlement_graph_sources_have_intervals():
+    graph = settlement_graph()
+    sources = {name for name, node in graph.nodes.items() if not node.deps}
+    assert sources == set(SOURCE_INTERVALS)
+    assert set(SETTLEMENT_PRODUCTS) <= set(graph.nodes)
@@ -0,0 +1,124 @@
+from threading import Event, Thread
+from time import sleep
+
+import pytest
+
+from imcity_scheduler import Priority, RequestScheduler, TokenBucket
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RequestScheduler(rate=1000, burst=100)
+    yield scheduler
+    scheduler.close()
+
+
+def hold(scheduler: RequestScheduler) -> Event:
+    """
+    Keeps the flusher busy until the returned event is set, so that requests
+    submitted meanwhile queue up
+    """
+    started, release = Event(), Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(blocker)
+    assert started.wait(5)
+    return release
+
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(rate=2, capacity=1)
+    now = bucket._last
+    assert bucket.delay(now) == 0
+    bucket.take()
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.5) == 0
+
+
+def test_priority_order(scheduler):
+    sent = []
+    release = hold(scheduler)
+    futures = [
+        scheduler.submit(lambda: sent.append("query"), Priority.QUERY),
+        scheduler.submit(lambda: sent.append("order"), Priority.ORDER),
+        scheduler.submit(lambda: sent.append("cancel"), Priority.CANCEL),
+        scheduler.submit(lambda: sent.append("order 2"), Priority.ORDER),
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert sent == ["cancel", "order", "order 2", "query"]
+
+
+def test_same_key_shares_result(scheduler):
+    calls = []
+    release = hold(scheduler)
+    first = scheduler.submit(lambda: calls.append(1) or "first", key="url")
+    second = scheduler.submit(lambda: calls.append(2) or "second", key="url")
+    release.set()
+    assert first.result(5) == second.result(5) == "first"
+    assert calls == [1]
+    assert scheduler.coalesced == 1
+
+
+def test_replace_cancels_superseded(scheduler):
+    release = hold(scheduler)
+    first = scheduler.submit(lambda: 10, Priority.ORDER, key="quote", replace=True)
+    second = scheduler.submit(lambda: 9, Priority.ORDER, key="quote", replace=True)
+    third = scheduler.submit(lambda: 8, Priority.ORDER, key="quote", replace=True)
+    release.set()
+    assert third.result(5) == 8
+    assert first.cancelled() and second.cancelled()
+    assert scheduler.stats()["sent"] == 2
+
+
+def test_requests_without_key_are_never_coalesced(scheduler):
+    release = hold(scheduler)
+    futures = [scheduler.submit(lambda price=price: price) for price in (10, 9, 8)]
+    release.set()
+    assert [future.result(5) for future in futures] == [10, 9, 8]
+    assert scheduler.coalesced == 0
+
+
+def test_exceptions_reach_every_caller(scheduler):
+    def fail():
+        raise ValueError("rejected")
+
+    release = hold(scheduler)
+    futures = [scheduler.submit(fail, key="url") for _ in range(2)]
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(5)
+
+
+def test_close_cancels_queued_requests():
+    scheduler = RequestScheduler(rate=1000, burst=100)
+    release = hold(scheduler)
+    queued = scheduler.submit(lambda: None)
+    # close cancels the queue before it waits for the busy flusher
+    closing = Thread(target=scheduler.close)
+    closing.start()
+    while not scheduler.closed:
+        sleep(0.001)
+    release.set()
+    closing.join(5)
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
+
+
+def test_rate_limit_paces_requests():
+    scheduler = RequestScheduler(rate=1000, burst=1)
+    try:
+        futures = [scheduler.submit(lambda: None) for _ in range(20)]
+        for future in futures:
+            future.result(5)
+        stats = scheduler.stats()
+    finally:
+        scheduler.close()
+    assert stats["sent"] == 20
+    assert stats["wait_ms"]["max"] >= 10
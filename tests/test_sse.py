@@ -0,0 +1,86 @@
+import gzip
+import io
+from types import SimpleNamespace
+
+from urllib3.response import HTTPResponse
+
+from imcity_sse import Backoff, ServerSentEvent, SSEParser, iter_chunks
+
+STREAM = (
+    b"\xef\xbb\xbf: keep-alive\n"
+    b"retry: 2500\n"
+    b"event: order\n"
+    b"id: 7\n"
+    b'data: {"a": 1}\n'
+    b"\n"
+    b"data: first\r\n"
+    b"data:second\r\n"
+    b"\r\n"
+    b"event: trade\r"
+    b"data: x\r"
+    b"\r\n"
+)
+
+EVENTS = [
+    ServerSentEvent("order", '{"a": 1}', "7"),
+    ServerSentEvent("message", "first\nsecond", "7"),
+    ServerSentEvent("trade", "x", "7"),
+]
+
+
+def test_whole_stream():
+    parser = SSEParser()
+    assert parser.feed(STREAM) == EVENTS
+    assert parser.retry == 2500
+    assert parser.last_event_id == "7"
+
+
+def test_any_chunking_gives_the_same_events():
+    for size in (1, 2, 3, 5, 16):
+        parser = SSEParser()
+        chunks = [STREAM[i : i + size] for i in range(0, len(STREAM), size)]
+        assert list(parser.events(chunks)) == EVENTS, size
+
+
+def test_incomplete_event_is_held_back():
+    parser = SSEParser()
+    assert parser.feed(b"event: order\ndata: 1\n") == []
+    assert parser.feed(b"\n") == [ServerSentEvent("order", "1")]
+    # a trailing CR may still turn out to be half of a CRLF
+    assert parser.feed(b"data: 2\r\r") == []
+    assert parser.feed(b"\n") == [ServerSentEvent("message", "2")]
+
+
+def test_reset_drops_partial_event_but_keeps_the_id():
+    parser = SSEParser()
+    parser.feed(b"id: 3\ndata: done\n\nevent: order\ndata: half")
+    parser.reset()
+    assert parser.last_event_id == "3"
+    assert parser.feed(b"data: new\n\n") == [ServerSentEvent("message", "new", "3")]
+
+
+def test_ignored_fields():
+    parser = SSEParser()
+    events = parser.feed(b"id: a\0b\nretry: soon\nfoo: bar\n: note\ndata: 1\n\n")
+    assert events == [ServerSentEvent("message", "1")]
+    assert parser.last_event_id is None and parser.retry is None
+
+
+def test_iter_chunks_decodes_compressed_bodies():
+    raw = HTTPResponse(
+        io.BufferedReader(io.BytesIO(gzip.compress(STREAM))),
+        headers={"content-encoding": "gzip"},
+        preload_content=False,
+        decode_content=False,
+    )
+    chunks = iter_chunks(SimpleNamespace(raw=raw), size=8)
+    assert list(SSEParser().events(chunks)) == EVENTS
+
+
+def test_backoff_grows_within_bounds():
+    backoff = Backoff(initial=1, maximum=8, multiplier=2)
+    delays = [backoff.next_delay() for _ in range(6)]
+    for delay, cap in zip(delays, (1, 2, 4, 8, 8, 8)):
+        assert cap / 2 <= delay <= cap
+    backoff.reset()
+    assert backoff.next_delay() <= 1
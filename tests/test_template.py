@@ -0,0 +1,41 @@
+from threading import Event, Thread
+
+from imcity_template import SSEThread
+from imcity_types import Order, OrderBook
+
+
+def payload(bid: float) -> dict:
+    return {
+        "product": "P",
+        "tickSize": 1,
+        "buy": [{"price": bid, "volume": 1, "userOrderVolume": 0}],
+        "sell": [],
+    }
+
+
+def test_resync_racing_a_stream_update_publishes_the_newest_book_last():
+    published = []
+    stream_applied = Event()
+
+    def handle(snapshot):
+        version = thread.books["P"].version
+        if snapshot.buy_orders[0].price == 99:
+            # the stream delivers a newer book while the resync is publishing;
+            # it has to wait for the publish, so this times out
+            Thread(target=stream_update, daemon=True).start()
+            stream_applied.wait(0.2)
+        published.append((version, snapshot))
+
+    def stream_update():
+        thread._handle_orderbook_change(payload(101))
+        stream_applied.set()
+
+    thread = SSEThread("Bearer x", "http://localhost", handle, lambda trades: None)
+    thread._handle_orderbook_change(payload(100))
+    thread.resync_orderbook(OrderBook("P", 1, (Order(99, 1, 0),), ()))
+    assert stream_applied.wait(5)
+
+    versions = [version for version, _ in published]
+    assert versions == sorted(versions)
+    assert versions[-1] == thread.books["P"].version
+    assert published[-1][1].buy_orders[0].price == 101
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from estimates.timeseries import TIMESTAMP_FILE, TimeSeriesStore
+
+
+def stamps(*hours: int) -> np.ndarray:
+    return np.array([f"2025-11-22T{hour:02d}:00" for hour in hours], "datetime64[ns]")
+
+
+def test_append_keeps_only_new_rows_in_order(tmp_path):
+    series = TimeSeriesStore(tmp_path).series("flow")
+    assert series.append(stamps(2, 1, 2, 3), value=[2, 1, 2.5, 3]) == 3
+    assert series.append(stamps(3, 4, 0), value=[30, 4, 0]) == 1
+    assert series.append(stamps(), value=[]) == 0
+
+    timestamps, columns = series.range()
+    assert list(timestamps) == list(stamps(1, 2, 3, 4))
+    assert list(columns["value"]) == [1, 2, 3, 4]
+    assert series.last_timestamp() == stamps(4)[0]
+
+
+def test_range_and_last(tmp_path):
+    series = TimeSeriesStore(tmp_path).series("weather", ("temp", "humidity"))
+    series.append(stamps(0, 6, 12, 18), temp=[1, 2, 3, 4], humidity=[5, 6, 7, 8])
+
+    timestamps, columns = series.range("2025-11-22 06:00", "2025-11-22 18:00")
+    assert list(timestamps) == list(stamps(6, 12))
+    assert list(columns["humidity"]) == [6, 7]
+
+    timestamps, columns = series.last("12h")
+    assert list(timestamps) == list(stamps(12, 18))
+    assert not columns["temp"].flags.writeable
+
+    frame = series.frame(start="2025-11-22 12:00")
+    assert list(frame["temp"]) == [3, 4]
+
+
+def test_history_survives_reopening(tmp_path):
+    TimeSeriesStore(tmp_path).series("flow").append(stamps(1, 2), value=[1, 2])
+    store = TimeSeriesStore(tmp_path)
+    assert store.names() == ["flow"]
+    series = store.series("flow")
+    assert len(series) == 2
+    assert series.append(stamps(2, 3), value=[2, 3]) == 1
+    assert len(TimeSeriesStore(tmp_path).series("flow")) == 3
+
+
+def test_torn_append_is_cut_off(tmp_path):
+    TimeSeriesStore(tmp_path).series("flow").append(stamps(1, 2), value=[1, 2])
+    # values are written first, a crash before the timestamps leaves them behind
+    with open(tmp_path / "flow" / "value.f8", "ab") as file:
+        file.write(np.array([3.0]).tobytes())
+    series = TimeSeriesStore(tmp_path).series("flow")
+    assert len(series) == 2
+    assert series.append(stamps(3), value=[30]) == 1
+    assert list(series.range()[1]["value"]) == [1, 2, 30]
+    assert (tmp_path / "flow" / TIMESTAMP_FILE).stat().st_size == 3 * 8
+
+
+def test_columns_must_match(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    series = store.series("weather", ("temp", "humidity"))
+    with pytest.raises(ValueError):
+        series.append(stamps(1), temp=[1])
+    with pytest.raises(ValueError):
+        series.append(stamps(1, 2), temp=[1], humidity=[1])
+    with pytest.raises(ValueError):
+        store.series("weather", ("temp",))
+    with pytest.raises(ValueError):
+        TimeSeriesStore(tmp_path).series("weather", ("temp",))